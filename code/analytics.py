@@ -0,0 +1,139 @@
+# Import the required packages/modules
+
+from store import to_typed
+import numpy as np
+import pandas as pd
+
+# Set the dimensions which the statistics can be broken down by
+DIMENSIONS = ('statute', 'title', 'court', 'month')
+
+# Set the list column which is exploded for each listed dimension
+LIST_DIMENSIONS = {'statute': 'possible_statutes', 'title': 'possible_titles'}
+
+# Create a class for the aggregate statistics of the database
+class Analytics:
+
+    def __init__(self, database_df):
+        """
+        Builds the aggregate statistics of `database_df`, a database in the .csv layout, where each row is a row id.
+        The statutes and offence titles are exploded into one row per judgment and value, and every dimension is
+        stored as a categorical column so that filters and breakdowns are grouped without per-row Python.
+        """
+        typed = to_typed(database_df.reset_index(drop=True))
+
+        # Create the table of judgments with the flags and the court and month of each judgment
+        self.judgments = pd.DataFrame({
+            'court': typed['tribunal/court'].astype('category'),
+            'month': typed['decision_date'].dt.to_period('M'),
+            'mitigation': typed['mitigation_discussed'].to_numpy(),
+            'aggravation': typed['aggravation_discussed'].to_numpy(),
+        })
+
+        # Create the exploded table of each listed dimension, with one row for each distinct value of each judgment
+        self.exploded = {}
+        for dimension, column in LIST_DIMENSIONS.items():
+            values = typed[column].explode().dropna()
+            table = pd.DataFrame({'row': values.index.to_numpy(), dimension: values.to_numpy()}).drop_duplicates()
+            table[dimension] = table[dimension].astype('category')
+            self.exploded[dimension] = table.reset_index(drop=True)
+
+        # Precompute the breakdowns of the whole database
+        self.counts = {}
+        for dimension in DIMENSIONS:
+            self.counts[dimension] = self.breakdown(dimension)
+
+    def __len__(self):
+        return len(self.judgments)
+
+    def mask(self, rows=None, statute=None, title=None, court=None, start=None, end=None):
+        """
+        Returns a boolean array of the judgments which match every filter given:
+        `rows` (row ids, e.g. of a search result), `statute`, `title` and `court` (a value or a list of values),
+        and `start` and `end` (months such as "2021-01", inclusive).
+        """
+        mask = np.ones(len(self.judgments), dtype=bool)
+
+        # Keep the given rows
+        if rows is not None:
+            selected = np.zeros(len(self.judgments), dtype=bool)
+            selected[np.asarray(rows, dtype=np.int64)] = True
+            mask &= selected
+
+        # Keep the judgments with any of the given statutes or offence titles
+        for dimension, values in (('statute', statute), ('title', title)):
+            if values is not None:
+                table = self.exploded[dimension]
+                selected = np.zeros(len(self.judgments), dtype=bool)
+                selected[table.loc[table[dimension].isin(_as_list(values)), 'row'].to_numpy()] = True
+                mask &= selected
+
+        # Keep the judgments of any of the given courts
+        if court is not None:
+            mask &= self.judgments['court'].isin(_as_list(court)).to_numpy()
+
+        # Keep the judgments decided within the given months
+        if start is not None:
+            mask &= (self.judgments['month'] >= pd.Period(start, 'M')).to_numpy()
+        if end is not None:
+            mask &= (self.judgments['month'] <= pd.Period(end, 'M')).to_numpy()
+
+        return mask
+
+    def rates(self, **filters):
+        """
+        Returns the number of judgments matching `filters` (see `mask`) and the rates at which they discussed
+        mitigating and aggravating factors.
+        """
+        matched = self.judgments[self.mask(**filters)]
+        return {'judgments': len(matched),
+                'mitigation_rate': matched['mitigation'].mean(),
+                'aggravation_rate': matched['aggravation'].mean()}
+
+    def breakdown(self, by, **filters):
+        """
+        Returns the number of judgments and the mitigation and aggravation rates for each value of the dimension `by`
+        ("statute", "title", "court" or "month"), counting only the judgments matching `filters` (see `mask`).
+        Listed dimensions count a judgment once under each of its values.
+        """
+        # Return the precomputed breakdown if there are no filters
+        if not filters and by in self.counts:
+            return self.counts[by]
+
+        if by not in DIMENSIONS:
+            raise ValueError(f'Unknown dimension {by!r}, use one of {", ".join(DIMENSIONS)}')
+
+        mask = self.mask(**filters)
+
+        # Join the flags of each judgment to its values of a listed dimension
+        if by in LIST_DIMENSIONS:
+            table = self.exploded[by]
+            table = table[mask[table['row'].to_numpy()]]
+            frame = pd.DataFrame({by: table[by].array,
+                                  'mitigation': self.judgments['mitigation'].to_numpy()[table['row'].to_numpy()],
+                                  'aggravation': self.judgments['aggravation'].to_numpy()[table['row'].to_numpy()]})
+        else:
+            frame = self.judgments.loc[mask, [by, 'mitigation', 'aggravation']]
+
+        # Count the judgments and average the flags of each value
+        grouped = frame.groupby(by, observed=True)
+        result = pd.DataFrame({'judgments': grouped.size(),
+                               'mitigation_rate': grouped['mitigation'].mean(),
+                               'aggravation_rate': grouped['aggravation'].mean()})
+
+        # Sort months in order and the other dimensions from the most to the least judgments
+        if by == 'month':
+            return result.sort_index()
+        return result.sort_values('judgments', ascending=False, kind='stable')
+
+    def trend(self, **filters):
+        """
+        Returns the number of judgments and the mitigation and aggravation rates of each month,
+        counting only the judgments matching `filters` (see `mask`).
+        """
+        return self.breakdown('month', **filters)
+
+def _as_list(values):
+    """
+    Returns a single value as a list, or a list of values as is.
+    """
+    return [values] if isinstance(values, str) else list(values)
@@ -0,0 +1,79 @@
+# Import the required packages/modules
+
+from datetime import datetime
+import json
+import os
+import threading
+import time
+import requests
+
+# Create a class for archiving judgments
+class Archiver:
+
+    def __init__(self, fetcher, archive, manifest='manifest.jsonl'):
+        """
+        Creates an archiver which downloads judgments into the judgment `archive` (see judgmentarchive.py) using the requests `fetcher`.
+        The politeness budget is the rate limit of the `fetcher`, which is shared by all of its workers.
+        Judgments which are already in the archive are skipped, so that an interrupted run can be resumed.
+        The outcome of each download is appended to a manifest file within the archive's directory, which is only a log
+        of the downloads and their errors: it is never read back, as the archive itself records what was archived.
+        """
+        # Set the archive and the path of the download log
+        self.archive = archive
+        self.fetcher = fetcher
+        self.manifest_path = os.path.join(archive.directory, manifest)
+
+        # Lock the manifest so that workers do not interleave their lines
+        self.__lock = threading.Lock()
+
+    def __record(self, entry):
+        """
+        Appends an entry to the manifest.
+        """
+        with self.__lock:
+            with open(self.manifest_path, 'a', encoding='utf_8') as file:
+                file.write(json.dumps(entry) + '\n')
+
+    def is_archived(self, link):
+        """
+        Checks if `link` is in the archive.
+        """
+        return link in self.archive
+
+    def __download(self, link):
+        """
+        Streams the judgment at `link` into the archive and returns the manifest entry.
+        """
+        # Create the manifest entry for this judgment
+        entry = {'link': link, 'status': 'done', 'bytes': 0, 'time': str(datetime.today())}
+
+        try:
+            # Stream the raw bytes into the archive, which only keeps the judgment once it is complete
+            start = time.perf_counter()
+            with self.fetcher.get(link, stream=True) as response:
+                entry['bytes'] = self.archive.write(link, response.iter_content(chunk_size=65536))
+
+            # Record the time and size of the whole download
+            seconds = time.perf_counter() - start
+            self.fetcher.metrics.observe('archive_download', seconds)
+            self.fetcher.metrics.count('http_bytes', entry['bytes'])
+            self.fetcher.metrics.event('archive_download', url=link, seconds=seconds, bytes=entry['bytes'])
+
+        except (requests.RequestException, OSError) as error:
+            # Record the error, where the judgment is retried on the next run as it is not in the archive
+            entry['status'] = 'error'
+            entry['error'] = repr(error)
+
+        self.__record(entry)
+        return entry
+
+    def run(self, links):
+        """
+        Archives each of `links` and skips those already in the archive.
+        Yields the manifest entry of each judgment as it is archived.
+        """
+        # Filter to the judgments which have not been archived yet
+        pending = [link for link in links if not self.is_archived(link)]
+
+        # Download the remaining judgments through the fetcher's worker pool
+        yield from self.fetcher.map(self.__download, pending)
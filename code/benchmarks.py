@@ -0,0 +1,904 @@
+# Import the required packages/modules
+
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+from time import perf_counter
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import tracemalloc
+import itertools
+import random
+import re
+import subprocess
+import sys
+import pandas as pd
+from analytics import Analytics
+from charts import ChartCache
+from citations import CitationResolver, name_variants
+from corpus import StubServer, SyntheticCorpus
+from criminalcasedatabase import Court, Database
+from extractors import CASE_NAME_PATTERN, COLUMNS, extract_judgment, JudgmentSource, PARSERS, scan_judgment, STATUTE_PATTERN, StatuteIndex
+from fulltext import FullTextIndex, term_counts
+from judgmentarchive import FileArchive, PackArchive, read_judgment
+from linkindex import LinkIndex
+from metrics import Metrics
+from progress import NullProgress
+from search import classify_search, QueryCache, SearchIndex, SearchResult
+from snapshot import publish_snapshot, Snapshot
+from store import ColumnarStore
+
+# Keep the results which the benchmarks record, so that they can be saved and compared between versions
+RESULTS = []
+
+def record(benchmark, case, seconds, **details):
+    """
+    Records the `seconds` which the `case` of `benchmark` took, with any `details` (e.g. the number of judgments).
+    """
+    RESULTS.append({'benchmark': benchmark, 'case': case, 'seconds': seconds, **details})
+
+def synthetic_links(size):
+    """
+    Returns `size` synthetic Lawnet judgment links.
+    """
+    return [f'https://www.lawnet.sg/lawnet/web/lawnet/free-resources?_freeresources_WAR_lawnet3baseportlet_docId=/Judgment/{n}-SSP.xml'
+            for n in range(size)]
+
+def bench_archive_planning(sizes=(10000, 30000, 100000), new=1000):
+    """
+    Times the planning of file names for the `new` latest links of a compiled court csv of each size,
+    using the previous list scan and the link index.
+    """
+    for size in sizes:
+        links = synthetic_links(size)
+        new_links = links[-new:]
+
+        # Time the previous lookup, which rebuilds two lists and scans them for every link
+        court_link_dict = dict(enumerate(links))
+        start = perf_counter()
+        for value in new_links:
+            list(court_link_dict.keys())[list(court_link_dict.values()).index(value)]
+        list_scan = perf_counter() - start
+
+        # Time the link index, including building it once from the compiled links
+        with tempfile.TemporaryDirectory() as directory:
+            start = perf_counter()
+            link_index = LinkIndex(os.path.join(directory, 'index.csv'))
+            link_index.add(links)
+            build = perf_counter() - start
+
+            start = perf_counter()
+            for value in new_links:
+                link_index[value]
+            lookup = perf_counter() - start
+
+        print(f'{size:>7} links, {new} new: list scan {list_scan*1000:9.1f} ms | '
+              f'index build {build*1000:7.1f} ms + lookups {lookup*1000:6.3f} ms')
+
+def bench_statute_lookup(sections=60, statutes=20, repeat=5):
+    """
+    Times the lookup of the cartesian product of `sections` section numbers and `statutes` statutes,
+    as in the text fallback of a long judgment, using the previous dataframe scan and the statute index.
+    """
+    statutes_df = pd.read_csv('../data/statutes_crimes.csv')
+
+    # Mix section numbers and statute names from the database with ones which are not in it
+    section_numbers = list(statutes_df['section'].astype(str).unique()[:sections // 2]) + [str(n) for n in range(1000, 1000 + sections // 2)]
+    statute_names = list(statutes_df['statute'].unique()[:statutes // 2]) + [f'Unknown {n} Act' for n in range(statutes // 2)]
+    candidates = [' '.join(pair) for pair in itertools.product(section_numbers, statute_names)]
+
+    # Time the previous lookup, which scans the section_statute column and filters it again for the title
+    start = perf_counter()
+    for _ in range(repeat):
+        offences = []
+        for value in candidates:
+            if value in statutes_df['section_statute'].values:
+                index = statutes_df[statutes_df['section_statute'] == value].index
+                offences.append([statutes_df.iloc[index].values[0][1], value])
+            else:
+                offences.append(['Not in database', value])
+    scan = (perf_counter() - start) / repeat
+
+    # Time the statute index, including building it once
+    start = perf_counter()
+    statute_index = StatuteIndex(statutes_df)
+    build = perf_counter() - start
+
+    start = perf_counter()
+    for _ in range(repeat):
+        indexed = statute_index.lookup_many(candidates)
+    lookup = (perf_counter() - start) / repeat
+
+    # Check that both lookups agree
+    assert indexed == offences
+
+    print(f'{len(candidates):>6} candidates against {len(statutes_df)} statutes: dataframe scan {scan*1000:8.1f} ms | '
+          f'index build {build*1000:5.2f} ms + batch lookup {lookup*1000:6.3f} ms')
+
+def synthetic_text(paragraphs=3000, seed=0):
+    """
+    Returns the text of a long synthetic judgment with case citations, sections and statutes drawn from the datasets.
+    """
+    rng = random.Random(seed)
+    statutes_df = pd.read_csv('../data/statutes_crimes.csv')
+    cases = [case for citations in pd.read_csv('../data/database.csv')['citations'].dropna() for case in citations.split(',')]
+    words = 'the accused was found to have in his possession and the court considered whether this was a case where'.split()
+
+    # Build each paragraph from filler words with some of the patterns the extractors look for
+    text = []
+    for _ in range(paragraphs):
+        draw = rng.random()
+        paragraph = ' '.join(rng.choices(words, k=rng.randint(5, 30)))
+        if draw < 0.3:
+            paragraph += f' In {rng.choice(cases)} [2015] SGHC 10,'
+        if draw > 0.5:
+            paragraph += f' section {rng.choice(statutes_df["section"])} of the {rng.choice(statutes_df["statute"])}'
+        if draw > 0.9:
+            paragraph += ' mitigating'
+        if 0.8 < draw < 0.85:
+            paragraph += ' aggravated\xa0factors'
+        text.append(paragraph + '.')
+
+    return ' '.join(text)
+
+def bench_text_scan(paragraphs=(300, 3000), repeat=5):
+    """
+    Times the regex cost of the text extractors on synthetic judgments, using the previous separate scans
+    (sections, statutes, case names re-searched per match, and mitigation and aggravation) and the single-pass scanner.
+    """
+    for size in paragraphs:
+        text = synthetic_text(size)
+
+        # Time the previous scans, which compile from the pattern cache on every call
+        start = perf_counter()
+        for _ in range(repeat):
+            spaced = text.replace('\xa0', ' ')
+            re.findall('( [Ss](ection|)(s|) \\d+)', spaced)
+            re.findall(STATUTE_PATTERN, spaced)
+            joined = text.replace('\xa0', '')
+            for item in re.findall('(' + CASE_NAME_PATTERN + ')', joined):
+                re.search(CASE_NAME_PATTERN, str(item))
+            re.search(r'[mM]itigation|[mM]itigating', joined)
+            re.search(r'[aA]ggravating|[aA]ggravated', joined)
+        separate = (perf_counter() - start) / repeat
+
+        # Time the single-pass scanner
+        start = perf_counter()
+        for _ in range(repeat):
+            scan_judgment(text)
+        single = (perf_counter() - start) / repeat
+
+        print(f'{len(text):>8} characters: separate scans {separate*1000:7.1f} ms | single pass {single*1000:7.1f} ms')
+
+def synthetic_judgment(index, paragraphs=300):
+    """
+    Returns the html of a Lawnet-shaped synthetic judgment, with navigation before and scripts after the judgment's contents.
+    """
+    navigation = ''.join(f'<li><a href="/lawnet/page{n}">Menu item {n}</a></li>' for n in range(300))
+    body = ''.join(f'<p class="txt-body"><span>{paragraph}.</span></p>' for paragraph in synthetic_text(paragraphs, seed=index).split('. '))
+    return (f'<html><head><title>Judgment</title><script>var config = {{}};</script></head><body>'
+            f'<div class="navigation"><ul>{navigation}</ul></div>'
+            f'<div class="contentsOfFile"><h2>Public Prosecutor v Synthetic Accused {index} [2021] SGHC {index}</h2>'
+            f'<table id="info-table"><tr><td>Decision Date : 22 January 2021 </td></tr>'
+            f'<tr><td>Tribunal/Court : General Division of the High Court </td></tr><tr><td>Coram : Judge</td></tr></table>'
+            f'{body}</div><div class="footer"><ul>{navigation}</ul></div><script>var tracking = 1;</script></body></html>')
+
+def _parse_corpus(parser, paths):
+    """
+    Parses each of `paths` with `parser` and returns the time taken and the increase in peak memory in kilobytes.
+    """
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = perf_counter()
+    for path in paths:
+        with open(path, 'r', encoding='utf_8') as file:
+            JudgmentSource.from_html(file.read(), parser)
+    return perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+
+def bench_parse(corpus='../judgments', synthetic=50):
+    """
+    Times each parser on the archived judgments in `corpus`, or on `synthetic` synthetic judgments if none are archived.
+    Each parser runs in a fresh process so that its peak memory is measured on its own.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        paths = sorted(glob.glob(os.path.join(corpus, '*_court', '*.html')))
+
+        # Write synthetic judgments if there is no archived corpus
+        if not paths:
+            for index in range(synthetic):
+                paths.append(os.path.join(directory, f'synthetic_{index}.html'))
+                with open(paths[-1], 'w', encoding='utf_8') as file:
+                    file.write(synthetic_judgment(index))
+
+        print(f'{len(paths)} judgments, {sum(os.path.getsize(path) for path in paths) / 1e6:.1f} MB')
+        context = multiprocessing.get_context('spawn')
+        for parser in PARSERS:
+            with context.Pool(1) as pool:
+                seconds, peak = pool.apply(_parse_corpus, (parser, paths))
+            print(f'{parser:>9}: {seconds / len(paths) * 1000:7.2f} ms per judgment | peak memory +{peak / 1024:6.1f} MB')
+
+def synthetic_database(size):
+    """
+    Returns a database of `size` rows, made by repeating database.csv with a unique link for each row.
+    """
+    database_df = pd.read_csv('../data/database.csv')
+    df = pd.concat([database_df] * (size // len(database_df) + 1), ignore_index=True).iloc[:size]
+    df['link'] = synthetic_links(size)
+    return df
+
+def bench_storage(sizes=(10000, 100000), new=100):
+    """
+    Times loading a database of each size and saving `new` new rows, using the previous full .csv rewrite
+    and the columnar store, which appends a Parquet partition.
+    """
+    for size in sizes:
+        df = synthetic_database(size + new)
+        existing, added = df.iloc[:size], df.iloc[size:]
+
+        with tempfile.TemporaryDirectory() as directory:
+            # Time the previous .csv load and full rewrite with the new rows
+            path = os.path.join(directory, 'database.csv')
+            existing.to_csv(path, index=False)
+            start = perf_counter()
+            database_df = pd.read_csv(path)
+            csv_load = perf_counter() - start
+            start = perf_counter()
+            pd.concat([database_df, added]).to_csv(path, index=False)
+            csv_save = perf_counter() - start
+
+            # Time the columnar store load and append of the new rows
+            store = ColumnarStore(os.path.join(directory, 'database'))
+            store.append(existing)
+            start = perf_counter()
+            store.read()
+            store_load = perf_counter() - start
+            start = perf_counter()
+            store.append(added)
+            store_save = perf_counter() - start
+
+        print(f'{size:>7} rows, {new} new: csv load {csv_load*1000:7.1f} ms + rewrite {csv_save*1000:7.1f} ms | '
+              f'store load {store_load*1000:7.1f} ms + append {store_save*1000:6.1f} ms')
+
+def bench_search(sizes=(10000, 100000), queries=('misuse of drugs act', 'Tang Keng Lai v Public Prosecutor', 'forgery')):
+    """
+    Times each of `queries` on a database of each size, using the previous search, which reloads the .csv file
+    and lowercases the searched column on every query, and the search index.
+    """
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'database.csv')
+            synthetic_database(size).to_csv(path, index=False)
+
+            # Time building the search index once
+            start = perf_counter()
+            search_index = SearchIndex(pd.read_csv(path))
+            build = perf_counter() - start
+
+            for query in queries:
+                search_string = classify_search(query)
+                column = 'case_name' if ' v ' in search_string else 'possible_statutes' if 'act' in search_string else 'possible_titles'
+
+                # Time the previous search of the column
+                start = perf_counter()
+                database = pd.read_csv(path)
+                temp = database.copy() if column == 'case_name' else database.copy().dropna()
+                result = database.loc[list(temp[temp[column].apply(lambda x: x.lower()).str.contains(search_string)].index)]
+                scan = perf_counter() - start
+
+                # Time the search index
+                start = perf_counter()
+                indexed = search_index.match(column, search_string, complete=column != 'case_name')
+                lookup = perf_counter() - start
+
+                # Check that both searches agree
+                assert list(result.index) == indexed
+
+                print(f'{size:>7} rows, {query!r:>36} ({len(indexed):>6} results): scan {scan*1000:8.1f} ms | '
+                      f'index {lookup*1000:7.2f} ms (built once in {build:.2f} s)')
+
+def bench_query_cache(size=100000, query='misuse of drugs act', repeat=20):
+    """
+    Times the outputs of one web search (the results table, both rates and the top citations) on a database of `size` rows,
+    when the search misses the query cache and when it is a cache hit.
+    """
+    search_index = SearchIndex(synthetic_database(size))
+    query_cache = QueryCache(loader=lambda: search_index, version=lambda: 0)
+
+    def respond():
+        result = query_cache.search(query)
+        return result.results, result.aggravating(), result.mitigating(), result.top_citations()
+
+    # Time the first search, which misses the cache
+    start = perf_counter()
+    respond()
+    miss = perf_counter() - start
+
+    # Time the repeated searches, which are cache hits
+    start = perf_counter()
+    for _ in range(repeat):
+        respond()
+    hit = (perf_counter() - start) / repeat
+
+    print(f'{size:>7} rows, {query!r}: cache miss {miss*1000:7.1f} ms | cache hit {hit*1000:6.3f} ms')
+
+def bench_citations(size=100000, results=(1000, 10000), repeat=5):
+    """
+    Times counting the top cited cases of result sets of each size in a database of `size` rows,
+    using the previous one-hot count and the citation graph.
+    """
+    search_index = SearchIndex(synthetic_database(size))
+    database = search_index.database
+
+    for count in results:
+        rows = sorted(random.Random(count).sample(range(size), count))
+        citations = database.loc[rows, 'citations'].dropna()
+
+        # Time the previous count, which one-hot encodes the cases cited by every result
+        start = perf_counter()
+        for _ in range(repeat):
+            split = citations.apply(lambda x: x.split(','))
+            one_hot = pd.get_dummies(split.apply(pd.Series).stack()).groupby(level=0).sum()
+            top = one_hot.sum().sort_values(ascending=False).head(10)
+        one_hot_time = (perf_counter() - start) / repeat
+
+        # Time the citation graph
+        start = perf_counter()
+        for _ in range(repeat):
+            top_cited = search_index.citations.top_cited(rows, n=10)
+        graph = (perf_counter() - start) / repeat
+
+        # Check that both counts agree
+        assert list(top) == list(top_cited)
+
+        print(f'{count:>6} results in {size} rows: one-hot count {one_hot_time*1000:8.1f} ms | citation graph {graph*1000:6.2f} ms')
+
+def bench_analytics(size=100000, statutes=20, repeat=3):
+    """
+    Times the mitigation and aggravation rates of the `statutes` most common statutes in a database of `size` rows,
+    using the previous search of the comma-joined strings for each statute and the analytics breakdown.
+    """
+    database_df = synthetic_database(size)
+    names = database_df['possible_statutes'].dropna().str.split(',').explode().value_counts().index[:statutes]
+
+    # Time the previous rates, which search the comma-joined statutes of every judgment once for each statute
+    start = perf_counter()
+    for _ in range(repeat):
+        rates = {}
+        for name in names:
+            matched = database_df[database_df['possible_statutes'].fillna('').str.split(',').apply(lambda x: name in x)]
+            rates[name] = matched['mitigation_discussed'].mean()
+    scan = (perf_counter() - start) / repeat
+
+    # Time building the statistics once, and the breakdown of a filter which is not precomputed
+    start = perf_counter()
+    analytics = Analytics(database_df)
+    build = perf_counter() - start
+
+    start = perf_counter()
+    for _ in range(repeat):
+        breakdown = analytics.breakdown('statute', court=list(database_df['tribunal/court'].unique()))
+    grouped = (perf_counter() - start) / repeat
+
+    # Check that both rates agree
+    assert all(abs(breakdown.loc[name, 'mitigation_rate'] - rate) < 1e-9 for name, rate in rates.items())
+
+    print(f'{size:>7} rows, {statutes} statutes: string search {scan*1000:8.1f} ms | '
+          f'analytics breakdown {grouped*1000:6.1f} ms (built once in {build:.2f} s)')
+
+def bench_fulltext(judgments=200, query='accused possession mitigating', repeat=20):
+    """
+    Times finding `query` in the text of `judgments` synthetic judgments, by re-parsing each html judgment
+    as before the full-text index existed, and with the full-text index once it is built and opened.
+    """
+    paths = []
+    with tempfile.TemporaryDirectory() as directory:
+        # Write the synthetic judgments
+        for index in range(judgments):
+            paths.append(os.path.join(directory, f'synthetic_{index}.html'))
+            with open(paths[-1], 'w', encoding='utf_8') as file:
+                file.write(synthetic_judgment(index))
+
+        # Time re-parsing every judgment to search its text
+        start = perf_counter()
+        words = query.lower().split()
+        for path in paths:
+            with open(path, 'r', encoding='utf_8') as file:
+                text = JudgmentSource.from_html(file.read()).text.lower()
+            all(word in text for word in words)
+        scan = perf_counter() - start
+
+        # Time building the index, which parses each judgment once
+        start = perf_counter()
+        documents = []
+        for path in paths:
+            with open(path, 'r', encoding='utf_8') as file:
+                documents.append((path, '', term_counts(JudgmentSource.from_html(file.read()).text)))
+        FullTextIndex(os.path.join(directory, 'fulltext')).add(documents)
+        build = perf_counter() - start
+
+        # Time opening the index and ranking the judgments
+        start = perf_counter()
+        fulltext = FullTextIndex(os.path.join(directory, 'fulltext'))
+        opened = perf_counter() - start
+        start = perf_counter()
+        for _ in range(repeat):
+            fulltext.search(query)
+        search = (perf_counter() - start) / repeat
+
+    print(f'{judgments} judgments: re-parse and scan {scan*1000:8.1f} ms | index build {build*1000:8.1f} ms, '
+          f'open {opened*1000:5.2f} ms, BM25 search {search*1000:5.2f} ms')
+
+def _rss_anon():
+    """
+    Returns the private memory of this process in MB, which is not shared with other processes through the page cache.
+    """
+    with open('/proc/self/status', 'r') as file:
+        for line in file:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) / 1024
+
+def _index_memory(directory, source):
+    """
+    Builds the search index of the snapshot in `directory` from its decoded rows if `source` is "frame",
+    or maps the index written with it if `source` is "snapshot", and returns the private memory in MB which this takes.
+    """
+    before = _rss_anon()
+    if source == 'frame':
+        search_index = SearchIndex(Snapshot(directory).frame())
+    else:
+        search_index = SearchIndex.from_snapshot(directory)
+    return _rss_anon() - before
+
+def bench_startup(sizes=(10000, 100000), rows=50):
+    """
+    Times loading a database of each size when a web worker starts, from database.csv, the columnar store
+    and the serving snapshot, either decoding every row or only `rows` rows of results.
+    """
+    for size in sizes:
+        database_df = synthetic_database(size)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'database.csv')
+            database_df.to_csv(path, index=False)
+            store = ColumnarStore(os.path.join(directory, 'database'))
+            store.append(database_df)
+            publish_snapshot(database_df, os.path.join(directory, 'snapshots'))
+
+            # Time parsing the .csv file
+            start = perf_counter()
+            pd.read_csv(path)
+            csv_load = perf_counter() - start
+
+            # Time reading the columnar store
+            start = perf_counter()
+            store.read(flat=True)
+            store_load = perf_counter() - start
+
+            # Time opening the snapshot and decoding every row
+            start = perf_counter()
+            snapshot = Snapshot(os.path.join(directory, 'snapshots'))
+            opened = perf_counter() - start
+            snapshot.frame()
+            snapshot_load = perf_counter() - start
+            snapshot.close()
+
+            # Time opening the snapshot and decoding only the rows of one page of results
+            start = perf_counter()
+            snapshot = Snapshot(os.path.join(directory, 'snapshots'))
+            snapshot.frame(rows=range(0, size, size // rows))
+            snapshot_rows = perf_counter() - start
+            snapshot.close()
+
+            # Measure the private memory of a new worker which builds its search index over the decoded database,
+            # and which maps the index written with the snapshot, whose pages are shared by the workers
+            with multiprocessing.get_context('spawn').Pool(1, maxtasksperchild=1) as pool:
+                private = {source: pool.apply(_index_memory, (os.path.join(directory, 'snapshots'), source)) for source in ('frame', 'snapshot')}
+
+        print(f'{size:>7} rows: csv {csv_load*1000:7.1f} ms | store {store_load*1000:7.1f} ms | snapshot open {opened*1000:5.2f} ms, '
+              f'all rows {snapshot_load*1000:7.1f} ms, {rows} rows {snapshot_rows*1000:5.2f} ms | '
+              f'index private memory {private["frame"]:6.1f} MB over the frame, {private["snapshot"]:6.1f} MB over the snapshot')
+
+def bench_cli_startup(repeats=5):
+    """
+    Times starting a new Python process for each command-line entry point and module, as a headless run
+    from cron or a worker would, taking the fastest of `repeats` runs.
+    """
+    commands = {
+        'python -c pass': ['-c', 'pass'],
+        'cli.py --help': ['cli.py', '--help'],
+        'cli.py search --help': ['cli.py', 'search', '--help'],
+        'import search': ['-c', 'import search'],
+        'import criminalcasedatabase': ['-c', 'import criminalcasedatabase'],
+    }
+    for name, command in commands.items():
+        times = []
+        for _ in range(repeats):
+            start = perf_counter()
+            subprocess.run([sys.executable, *command], check=True, stdout=subprocess.DEVNULL)
+            times.append(perf_counter() - start)
+
+        # Check whether the notebook machinery was loaded
+        loaded = subprocess.run([sys.executable, '-X', 'importtime', *command], check=True, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True).stderr
+        ipython = 'IPython' in re.findall(r'\|\s*(\S+)$', loaded, flags=re.MULTILINE)
+        record('cli_startup', name, min(times))
+        print(f'{name:<28} {min(times)*1000:7.1f} ms{" (imports IPython)" if ipython else ""}')
+
+@contextmanager
+def scratch_tree():
+    """
+    Creates an empty copy of the repository's data, judgments and logs folders in a temporary directory,
+    with the statutes and empty court and database tables, and runs the block from its code folder so that
+    the relative paths of the Court and Database point into it.
+    """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        for folder in ('code', 'data', 'logs', 'judgments/supreme_court', 'judgments/subordinate_court'):
+            os.makedirs(os.path.join(directory, folder))
+        shutil.copy('../data/statutes_crimes.csv', os.path.join(directory, 'data'))
+        for court in ('supreme', 'subordinate'):
+            pd.DataFrame(columns=['court', 'date', 'title', 'link']).to_csv(os.path.join(directory, 'data', f'{court}court_compiled.csv'), index=False)
+        pd.DataFrame(columns=COLUMNS).to_csv(os.path.join(directory, 'data', 'database.csv'), index=False)
+
+        os.chdir(os.path.join(directory, 'code'))
+        try:
+            yield directory
+        finally:
+            os.chdir(cwd)
+
+def bench_fetch_urls(pages=(10, 100), per_page=20, workers=(1, 4), latency=0.02):
+    """
+    Times fetching and parsing every listing page of a synthetic court with each number of `workers`,
+    from a local stub server which takes `latency` seconds to answer each request.
+    """
+    for count in pages:
+        corpus = SyntheticCorpus(count * per_page, per_page=per_page)
+        with scratch_tree(), StubServer(corpus, latency=latency) as server:
+            for worker_count in workers:
+                court = Court('supreme', workers=worker_count, requests_per_second=None, base_url=server.url, progress=NullProgress(), metrics=Metrics(path=None))
+
+                # Fetch the first page for the number of pages, then time fetching every page
+                court._Court__set_soup()
+                court._Court__get_num_pages()
+                start = perf_counter()
+                court._Court__fetch_urls()
+                seconds = perf_counter() - start
+                assert len(court.results_list) == len(corpus)
+
+                record('fetch_urls', f'{count} pages, {worker_count} workers', seconds, pages=count, workers=worker_count)
+                print(f'{count:>4} pages, {worker_count} workers: {seconds*1000:8.1f} ms ({seconds / count * 1000:5.1f} ms per page)')
+
+def bench_extractors(judgments=200, paragraphs=(40, 400)):
+    """
+    Times parsing and each extractor on `judgments` synthetic judgments with each number of `paragraphs`.
+    """
+    statute_index = StatuteIndex(pd.read_csv('../data/statutes_crimes.csv'))
+    for count in paragraphs:
+        corpus = SyntheticCorpus(judgments, paragraphs=count)
+        htmls = [corpus.judgment(index) for index in range(judgments)]
+
+        # Extract every judgment, timing each step in the metrics
+        metrics = Metrics(path=None)
+        for html in htmls:
+            extract_judgment(html, statute_index, metrics=metrics)
+
+        steps = {'parse': metrics.seconds('parse', parser='lxml')}
+        for (name, labels), (calls, seconds, longest) in metrics.timers.items():
+            if name == 'extractor':
+                steps[dict(labels)['extractor']] = seconds
+
+        for step, seconds in steps.items():
+            record('extractors', f'{count} paragraphs, {step}', seconds / judgments, paragraphs=count)
+        print(f'{count:>4} paragraphs, ms per judgment: ' + ' | '.join(f'{step} {seconds / judgments * 1000:.3f}' for step, seconds in steps.items()))
+
+def bench_pipeline(judgments=(200, 1000), workers=(1, 4), queries=('penal code', 'cheating', 'Public Prosecutor v Tan Ah Kow Lim')):
+    """
+    Times the whole pipeline on a synthetic court of each number of `judgments`, served by a local stub server:
+    pulling the listings, archiving the judgments, creating the database with each number of `workers`
+    (and again when nothing changed), and searching the database for each of `queries`.
+    """
+    for count in judgments:
+        corpus = SyntheticCorpus(count)
+        for worker_count in workers:
+            with scratch_tree(), StubServer(corpus) as server:
+                court = Court('supreme', workers=4, requests_per_second=None, base_url=server.url, progress=NullProgress())
+
+                # Time pulling the listings and archiving the judgments
+                start = perf_counter()
+                court.pull_urls()
+                pull = perf_counter() - start
+                start = perf_counter()
+                court.archive()
+                archive = perf_counter() - start
+                assert court.archived == count
+
+                # Time creating the database, and updating it when no judgment changed
+                start = perf_counter()
+                database = Database(progress=NullProgress())
+                database.create_database('supreme', workers=worker_count)
+                create = perf_counter() - start
+                start = perf_counter()
+                Database(progress=NullProgress()).create_database('supreme', workers=worker_count)
+                update = perf_counter() - start
+                assert len(database.database_df) == count
+
+                # Time building the search index and each search
+                start = perf_counter()
+                search_index = SearchIndex.from_store()
+                build = perf_counter() - start
+                searches = []
+                for query in queries:
+                    start = perf_counter()
+                    search_index.search(query)
+                    searches.append(perf_counter() - start)
+
+            case = f'{count} judgments, {worker_count} workers'
+            for step, seconds in (('pull', pull), ('archive', archive), ('create_database', create), ('unchanged update', update), ('search index', build)):
+                record('pipeline', f'{case}, {step}', seconds, judgments=count, workers=worker_count)
+            for query, seconds in zip(queries, searches):
+                record('pipeline', f'{case}, search {query!r}', seconds, judgments=count, workers=worker_count)
+            print(f'{case}: pull {pull:6.2f} s | archive {archive:6.2f} s | create_database {create:6.2f} s | '
+                  f'unchanged update {update:5.2f} s | search index {build*1000:6.1f} ms, '
+                  f'searches {" / ".join(f"{seconds*1000:.2f}" for seconds in searches)} ms')
+
+def bench_streaming(judgments=(500, 2000), batch_size=100):
+    """
+    Times creating the database from a backlog of each number of `judgments`, holding every extracted judgment in memory
+    and streaming them to the store in batches of `batch_size`, with the peak memory allocated by each.
+    """
+    for count in judgments:
+        corpus = SyntheticCorpus(count)
+        for mode in (None, batch_size):
+            with scratch_tree(), StubServer(corpus) as server:
+                court = Court('supreme', workers=4, requests_per_second=None, base_url=server.url, progress=NullProgress())
+                court.pull_urls()
+                court.archive()
+
+                # Time creating the database and trace its peak memory
+                database = Database(progress=NullProgress())
+                tracemalloc.start()
+                start = perf_counter()
+                database.create_database('supreme', batch_size=mode)
+                seconds = perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                assert len(database.database_df) == count
+
+            case = f'{count} judgments, ' + (f'batches of {mode}' if mode else 'in memory')
+            record('streaming', case, seconds, judgments=count, peak_mb=peak / 1e6)
+            print(f'{case:>36}: {seconds:6.2f} s | peak traced memory {peak / 1e6:6.1f} MB')
+
+def bench_incremental_pull(pages=(10, 100), per_page=20, new=(0, 20), latency=0.02):
+    """
+    Times refreshing the listings of a synthetic court of each number of `pages` which was pulled before,
+    after each number of `new` judgments were published, with a full pull and with an incremental pull,
+    from a local stub server which takes `latency` seconds to answer each request.
+    """
+    for count in pages:
+        for new_count in new:
+            for incremental in (False, True):
+                with scratch_tree(), StubServer(SyntheticCorpus(count * per_page, per_page=per_page), latency=latency) as server:
+                    # Pull the listings once, then publish the new judgments
+                    court = Court('supreme', workers=4, requests_per_second=None, base_url=server.url, progress=NullProgress(), metrics=Metrics(path=None))
+                    court.pull_urls()
+                    server.corpus = SyntheticCorpus(count * per_page + new_count, per_page=per_page)
+                    server.requests = server.not_modified = 0
+
+                    # Time refreshing the listings
+                    start = perf_counter()
+                    court.pull_urls(incremental=incremental)
+                    seconds = perf_counter() - start
+                    assert len(court.court_df) == new_count
+
+                case = f'{count} pages, {new_count} new, ' + ('incremental' if incremental else 'full')
+                record('incremental_pull', case, seconds, pages=count, new=new_count, requests=server.requests,
+                       not_modified=server.not_modified, pages_skipped=court.pages_skipped)
+                print(f'{case:>30}: {seconds*1000:8.1f} ms | {server.requests:>3} requests, {server.not_modified:>3} not modified, {court.pages_skipped:>3} pages skipped')
+
+def bench_archive_layout(judgments=(200, 2000), paragraphs=40):
+    """
+    Times writing each number of `judgments` synthetic judgments to a judgment archive in each layout and reading them all back
+    through their locations, as the database does, with the size and number of files of each archive.
+    """
+    for count in judgments:
+        corpus = SyntheticCorpus(count, paragraphs=paragraphs)
+        htmls = {corpus.doc_id(index): corpus.judgment(index).encode('utf-8') for index in range(count)}
+        for layout in ('files', 'pack'):
+            with tempfile.TemporaryDirectory() as directory:
+                if layout == 'files':
+                    archive = FileArchive(directory, lambda link: link.split('/')[-1] + '.html')
+                else:
+                    archive = PackArchive(directory)
+
+                # Time writing the judgments
+                start = perf_counter()
+                for link, html in htmls.items():
+                    archive.write(link, [html])
+                write = perf_counter() - start
+
+                # Time reading every judgment back through its location
+                start = perf_counter()
+                for link in htmls:
+                    read_judgment(archive.locate(link))
+                read = perf_counter() - start
+
+                paths = [os.path.join(root, name) for root, folders, names in os.walk(directory) for name in names]
+                size = sum(os.path.getsize(path) for path in paths)
+
+            case = f'{count} judgments, {layout}'
+            record('archive_layout', case, read, judgments=count, write_seconds=write, mb=size / 1e6, files=len(paths))
+            print(f'{case:>24}: write {write*1000:8.1f} ms | read {read*1000:8.1f} ms | {size / 1e6:6.1f} MB in {len(paths):>4} files')
+
+def bench_citation_resolver(names=(1000, 10000), judgments=100, paragraphs=200):
+    """
+    Times resolving the cases cited in `judgments` synthetic judgments against a database of each number of case `names`,
+    by searching the text for each name in turn and with the citation resolver, including building its automaton.
+    """
+    for count in names:
+        corpus = SyntheticCorpus(count, paragraphs=paragraphs)
+        case_names = [f'{corpus.name(index)} {corpus.citation(index)}' for index in range(count)]
+        texts = [JudgmentSource.from_html(corpus.judgment(index)).text for index in range(count - judgments, count)]
+
+        # Time searching the text for both variants of each case name, as a loop over the database would
+        variants = [name_variants(name) for name in case_names]
+        start = perf_counter()
+        for text in texts:
+            text = ' '.join(text.casefold().split())
+            [index for index, names in enumerate(variants) if any(name in text for name in names)]
+        scan = (perf_counter() - start) / judgments
+
+        # Time building the resolver and resolving each text in a single pass
+        start = perf_counter()
+        resolver = CitationResolver(range(count), case_names)
+        resolver.resolve('')
+        build = perf_counter() - start
+
+        start = perf_counter()
+        for text in texts:
+            resolver.resolve(text)
+        resolve = (perf_counter() - start) / judgments
+
+        record('citation_resolver', f'{count} names', resolve, names=count, build_seconds=build, scan_seconds=scan)
+        print(f'{count:>6} names: search per name {scan*1000:8.2f} ms per judgment | resolver build {build*1000:7.1f} ms + {resolve*1000:6.2f} ms per judgment')
+
+def bench_search_batch(size=100000, repeat=1):
+    """
+    Times searching every section in statutes_crimes.csv, with the rates and top citations of each search,
+    on a database of `size` rows, one search at a time and as one batch.
+    """
+    search_index = SearchIndex(synthetic_database(size))
+    queries = pd.read_csv('../data/statutes_crimes.csv')['section_statute'].dropna().tolist()
+
+    # Time searching and computing the statistics of each query in turn, as the web app does
+    start = perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for query in queries:
+            result = SearchResult(classify_search(query), search_index.search(query), search_index.citations)
+            if result.found:
+                result.aggravated_rate, result.mitigation_rate, result.top_citations()
+    single = perf_counter() - start
+
+    # Time the batch of all the queries
+    start = perf_counter()
+    for _ in range(repeat):
+        batch = search_index.search_many(queries)
+    batched = (perf_counter() - start) / repeat
+
+    record('search_batch', f'{size} rows, {len(queries)} queries', batched, rows=size, queries=len(queries), single_seconds=single)
+    print(f'{size:>7} rows, {len(queries)} queries: one at a time {single:6.2f} s | batch {batched:6.2f} s '
+          f'({int(batch.statistics.results.gt(0).sum())} with results)')
+
+def bench_chart_cache(size=100000, query='misuse of drugs act', formats=('png', 'svg'), repeat=20):
+    """
+    Times serving the top citations chart of a search on a database of `size` rows when it is rendered,
+    read from the chart cache on disk (e.g. by another worker of the app) and taken from the cache in memory.
+    """
+    search_index = SearchIndex(synthetic_database(size))
+    with tempfile.TemporaryDirectory() as directory:
+        for format in formats:
+            # Time the first request, which searches and renders the chart
+            chart_cache = ChartCache(QueryCache(loader=lambda: search_index, version=lambda: 0), directory=os.path.join(directory, format))
+            start = perf_counter()
+            chart = chart_cache.get(query, format)
+            render = perf_counter() - start
+
+            # Time a new cache on the same directory, which reads the chart from disk
+            chart_cache = ChartCache(QueryCache(loader=lambda: search_index, version=lambda: 0), directory=os.path.join(directory, format))
+            start = perf_counter()
+            chart_cache.get(query, format)
+            disk = perf_counter() - start
+
+            # Time the repeated requests, which are served from memory
+            start = perf_counter()
+            for _ in range(repeat):
+                chart_cache.get(query, format)
+            memory = (perf_counter() - start) / repeat
+
+            record('chart_cache', f'{size} rows, {format}', render, rows=size, kb=len(chart) / 1e3, disk_seconds=disk, memory_seconds=memory)
+            print(f'{format}: render {render*1000:7.1f} ms | disk hit {disk*1000:6.3f} ms | memory hit {memory*1000:6.4f} ms | {len(chart) / 1e3:5.1f} kB')
+
+def _version():
+    """
+    Returns the git commit of the code, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def save_results(path):
+    """
+    Compares the recorded results with the last saved result of each case in the JSON lines file at `path`,
+    and appends them to it.
+    """
+    # Load the last saved result of each case
+    previous = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf_8') as file:
+            for line in file:
+                result = json.loads(line)
+                previous[(result['benchmark'], result['case'])] = result
+
+    # Print the change of each case since it was last saved
+    for result in RESULTS:
+        last = previous.get((result['benchmark'], result['case']))
+        if last is not None and last['seconds']:
+            change = (result['seconds'] - last['seconds']) / last['seconds'] * 100
+            print(f'{result["benchmark"]}: {result["case"]}: {result["seconds"]*1000:.3f} ms, {change:+.1f}% since {last["version"]}')
+
+    # Append the results with the time and version they were measured at
+    now = datetime.now().isoformat(timespec='seconds')
+    version = _version()
+    with open(path, 'a', encoding='utf_8') as file:
+        for result in RESULTS:
+            file.write(json.dumps({'time': now, 'version': version, **result}) + '\n')
+
+# Set the benchmarks which can be run from the command line
+BENCHMARKS = {
+    'archive_planning': bench_archive_planning,
+    'statute_lookup': bench_statute_lookup,
+    'text_scan': bench_text_scan,
+    'parse': bench_parse,
+    'storage': bench_storage,
+    'search': bench_search,
+    'query_cache': bench_query_cache,
+    'citations': bench_citations,
+    'analytics': bench_analytics,
+    'fulltext': bench_fulltext,
+    'startup': bench_startup,
+    'cli_startup': bench_cli_startup,
+    'fetch_urls': bench_fetch_urls,
+    'extractors': bench_extractors,
+    'pipeline': bench_pipeline,
+    'streaming': bench_streaming,
+    'incremental_pull': bench_incremental_pull,
+    'archive_layout': bench_archive_layout,
+    'citation_resolver': bench_citation_resolver,
+    'chart_cache': bench_chart_cache,
+    'search_batch': bench_search_batch,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the criminalcasedatabase benchmarks.')
+    parser.add_argument('benchmarks', nargs='*', help=f'benchmarks to run, from: {", ".join(BENCHMARKS)} (default: all)')
+    parser.add_argument('--save', nargs='?', const='../logs/benchmarks.jsonl', default=None,
+                        help='compare the recorded results with the last saved ones and append them to this file (default: ../logs/benchmarks.jsonl)')
+    args = parser.parse_args()
+
+    # Raise an error for benchmarks which do not exist
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f'unknown benchmark: {name}')
+
+    # Run the chosen benchmarks, or all of them if none are given
+    for name in args.benchmarks or BENCHMARKS:
+        print(f'--- {name}')
+        BENCHMARKS[name]()
+
+    # Save the recorded results if set
+    if args.save and RESULTS:
+        print('--- saved results')
+        save_results(args.save)
@@ -0,0 +1,95 @@
+# Import the required packages/modules
+
+from extractors import EXTRACTOR_VERSION
+import hashlib
+import json
+import os
+
+# Create a class for the content-addressed extraction cache
+class ExtractionCache:
+
+    def __init__(self, directory='../data/extraction_cache', version=EXTRACTOR_VERSION):
+        """
+        Creates the extraction cache in `directory`. Each extraction is stored under the SHA-256 hash of the judgment's html,
+        together with the extractor `version` which made it, so that only judgments which changed or were extracted
+        by an older version of the extractors are extracted again.
+        """
+        # Set the cache directory and extractor version
+        self.directory = directory
+        self.version = version
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Count the cache hits and misses
+        self.hits = 0
+        self.misses = 0
+
+        # Load the hashes of the files seen before by their size and modification time, so that unchanged files are not read again
+        self.__stats_path = os.path.join(self.directory, 'stats.json')
+        self.__stats = {}
+        if os.path.exists(self.__stats_path):
+            with open(self.__stats_path, 'r', encoding='utf_8') as file:
+                self.__stats = json.load(file)
+
+    def digest(self, path):
+        """
+        Returns the SHA-256 hash of the file at `path`.
+        """
+        # Use the saved hash if the file has not changed since it was hashed
+        stat = os.stat(path)
+        saved = self.__stats.get(path)
+        if saved is not None and saved[0] == stat.st_size and saved[1] == stat.st_mtime_ns:
+            return saved[2]
+
+        # Otherwise hash the file in chunks
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                sha256.update(chunk)
+
+        self.__stats[path] = [stat.st_size, stat.st_mtime_ns, sha256.hexdigest()]
+        return sha256.hexdigest()
+
+    def __path(self, digest):
+        """
+        Returns the path of the cache entry for `digest`.
+        """
+        return os.path.join(self.directory, digest[:2], digest + '.json')
+
+    def get(self, digest):
+        """
+        Returns the cached extraction of the judgment with hash `digest` as a dictionary,
+        or None if it was not extracted or was extracted by another version of the extractors.
+        """
+        try:
+            with open(self.__path(digest), 'r', encoding='utf_8') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            entry = None
+
+        # Count a hit only if the extraction was made by the current version
+        if entry is None or entry['version'] != self.version:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry['record']
+
+    def put(self, digest, record):
+        """
+        Caches the extraction `record` (a dictionary) of the judgment with hash `digest`.
+        """
+        path = self.__path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first so that an interrupted write does not leave a broken entry
+        with open(path + '.tmp', 'w', encoding='utf_8') as file:
+            json.dump({'version': self.version, 'record': record}, file)
+        os.replace(path + '.tmp', path)
+
+    def save(self):
+        """
+        Saves the hashes of the files seen so far.
+        """
+        with open(self.__stats_path + '.tmp', 'w', encoding='utf_8') as file:
+            json.dump(self.__stats, file)
+        os.replace(self.__stats_path + '.tmp', self.__stats_path)
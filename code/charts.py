@@ -0,0 +1,187 @@
+# Import the required packages/modules
+
+from collections import OrderedDict
+import glob
+import hashlib
+import io
+import os
+import threading
+import pandas as pd
+from search import classify_search
+
+# Set the version of the charts, which is part of each chart's key so that a change to the drawing replaces the cached charts
+CHART_VERSION = 1
+
+# Set the media type of each chart format
+MEDIA_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+def create_figure(result, input_string):
+    """
+    Input: `result` as the SearchResult of `input_string`.
+    Output: `fig` as plot of top 10 citations for this search
+    """
+    # Import matplotlib only when a plot is drawn, so that workers start faster
+    from matplotlib.figure import Figure
+
+    # Create a fig for the plot
+    fig = Figure(figsize = (10,8))
+    ax = fig.subplots()
+
+    # Set colour of the plot background
+    fig.patch.set_facecolor('#E8E5DA')
+
+    # Set the x and y values of the plot
+    top_citations = result.top_citations(10)[::-1]
+
+    # Plot a horizontal bar plot of the data
+    ax.barh(top_citations.index, top_citations, color = "#304C89")
+
+    # Set plot title
+    ax.set_title(f'Top citations for {input_string}', size = 15)
+
+    # Set plot x_ticks size
+    ax.tick_params(axis='x', labelrotation = 0, labelsize = 12)
+
+    # Set plot layout to tight
+    fig.tight_layout()
+
+    # Return the plot as output
+    return fig
+
+def render_chart(result, input_string, format='png'):
+    """
+    Draws the top citations of the SearchResult `result` of `input_string` and returns the chart as bytes in `format` ("png" or "svg").
+    """
+    # Store the figure as bytes in an in-memory buffer
+    output = io.BytesIO()
+    create_figure(result, input_string).savefig(output, format=format)
+    return output.getvalue()
+
+# Create a class for the cache of the rendered charts
+class ChartCache:
+
+    def __init__(self, query_cache, directory='../data/chart_cache', maxsize=64, max_files=1024):
+        """
+        Creates a cache of the top citations chart of each search, which takes the searches from `query_cache` (see search.py).
+        Each chart is rendered once per classified search string, database version and format, and is kept in memory
+        (up to `maxsize` charts, least recently used first out) and in `directory` (up to `max_files` charts, least recently used first out),
+        so that it is shared by the app's workers and kept across restarts. The key of a chart is also its ETag.
+        """
+        # Set the cache settings
+        self.query_cache = query_cache
+        self.directory = directory
+        self.maxsize = maxsize
+        self.max_files = max_files
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Count the charts found in memory, found on disk and rendered
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+
+        # Lock the cache so that it can be shared by the threads of the app
+        self.__lock = threading.Lock()
+        self.__charts = OrderedDict()
+
+    def etag(self, input_string, format='png'):
+        """
+        Returns the key of the chart of `input_string` in `format` for the current version of the database,
+        which is also its ETag. The key is known without searching, so that a client which has the chart is answered at once.
+        """
+        # Hash the chart version, database version, format and classified search string
+        key = f'{CHART_VERSION}\n{self.query_cache.version()!r}\n{format}\n{classify_search(input_string)}'
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+    def __path(self, etag, format):
+        """
+        Returns the path of the chart with `etag` in `format` on disk.
+        """
+        return os.path.join(self.directory, f'{etag}.{format}')
+
+    def __remember(self, etag, chart):
+        """
+        Keeps `chart` in memory, dropping the least recently used charts if the cache is full.
+        """
+        with self.__lock:
+            self.__charts[etag] = chart
+            self.__charts.move_to_end(etag)
+            while len(self.__charts) > self.maxsize:
+                self.__charts.popitem(last=False)
+
+    def __store(self, path, chart):
+        """
+        Writes `chart` to `path`, moving it into place once it is complete, and removes the least recently used charts
+        if there are too many on disk.
+        """
+        # Move the chart into place once it is complete, as the app's workers write the charts concurrently
+        with open(path + '.tmp', 'wb') as file:
+            file.write(chart)
+        os.replace(path + '.tmp', path)
+
+        # Remove the charts which were read or written the longest ago
+        paths = glob.glob(os.path.join(self.directory, '*.png')) + glob.glob(os.path.join(self.directory, '*.svg'))
+        if len(paths) > self.max_files:
+            paths.sort(key=lambda path: os.stat(path).st_mtime_ns)
+            for old_path in paths[:len(paths) - self.max_files]:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+    def get(self, input_string, format='png', etag=None):
+        """
+        Returns the chart of `input_string` in `format` as bytes, from memory, from disk or rendered, or None if the search
+        has no results. `etag` is the key of the chart if it is already known.
+        """
+        # Set the key of the chart
+        etag = etag or self.etag(input_string, format)
+
+        # Return the chart from memory
+        with self.__lock:
+            chart = self.__charts.get(etag)
+            if chart is not None:
+                self.__charts.move_to_end(etag)
+                self.memory_hits += 1
+                return chart
+
+        # Or read it from disk, marking it as recently used
+        path = self.__path(etag, format)
+        try:
+            with open(path, 'rb') as file:
+                chart = file.read()
+            os.utime(path)
+            with self.__lock:
+                self.disk_hits += 1
+        except OSError:
+            chart = None
+
+        # Or search and render it
+        if chart is None:
+            result = self.query_cache.search(input_string)
+            if not result.found:
+                return None
+            chart = render_chart(result, input_string, format)
+            with self.__lock:
+                self.renders += 1
+            self.__store(path, chart)
+
+        self.__remember(etag, chart)
+        return chart
+
+    def prewarm(self, statutes_path='../data/statutes.csv', n=None, formats=('png',)):
+        """
+        Renders the charts of the `n` statutes in `statutes_path` (or all of them if `n` is None) which are the most frequent
+        in the database, in each of `formats`, so that the first searches for them are already cached.
+        Returns the statutes whose charts are cached.
+        """
+        # Count the judgments of the database which mention each statute, from the search index
+        statutes = pd.read_csv(statutes_path)['statute'].dropna().unique()
+        mentions = self.query_cache.current_index().column('possible_statutes').fillna('').str.lower()
+        counts = pd.Series({statute: mentions.str.contains(statute.lower(), regex=False).sum() for statute in statutes}, dtype='int64')
+
+        # Render the charts of the most frequent statutes which have results
+        warmed = []
+        for statute in counts[counts > 0].sort_values(ascending=False, kind='stable').index[:n]:
+            if all(self.get(statute, format) is not None for format in formats):
+                warmed.append(statute)
+        return warmed
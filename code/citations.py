@@ -0,0 +1,390 @@
+# Import the required packages/modules
+
+from collections import deque
+import re
+import string
+import numpy as np
+import pandas as pd
+from snapshot import load_array, TextTable, write_texts
+
+# Compile the pattern of the neutral citation after a case name, and of the dash before it in a listing title
+CITATION_SUFFIX_RE = re.compile(r'\s*\[\d{4}\].*$')
+TITLE_DASH_RE = re.compile(r' - (?=\[\d{4}\])')
+
+def citation_edges(citations):
+    """
+    Returns the edge table of the comma-joined `citations` of each row, as the `edges` of a CitationGraph of the same rows would be,
+    with the case ids numbered in the order the cases are first cited. The column is split as one string instead of interning
+    each case name, for when only the edges are needed.
+    """
+    # Split the citations of every row at once, where a missing or empty value cites nothing
+    values = [(row, value) for row, value in enumerate(pd.Series(citations).tolist()) if isinstance(value, str) and value]
+    names = ','.join(value for row, value in values).split(',') if values else []
+    citing = np.repeat(np.array([row for row, value in values], dtype=np.int64), [value.count(',') + 1 for row, value in values])
+
+    # Number the cases in the order they are first cited, and keep the first citation of each case by each row
+    cases, table = pd.factorize(np.array(names, dtype=object), sort=False)
+    kept = ~pd.Series(citing * max(len(table), 1) + cases).duplicated().to_numpy()
+    cases = cases[kept].astype(np.int64)
+    return pd.DataFrame({'cited_id': cases, 'cited': np.asarray(table, dtype=object)[cases], 'citing': citing[kept]})
+
+# Create a class for the graph of the cases cited by each judgment
+class CitationGraph:
+
+    def __init__(self, database_df=None):
+        """
+        Creates the citation graph of `database_df`, a database in the .csv layout.
+        Each cited case is interned as a case id, and each judgment is a row id in the order of `database_df`.
+        """
+        # Instantiate the case id of each case name and the case name of each case id
+        self.ids = {}
+        self.names = []
+
+        # Keep the case ids cited by each row, and the edge arrays and name ranks once they are built
+        self.__row_cases = []
+        self.__rows = 0
+        self.__edges = None
+        self.__ranks = None
+
+        # Add the citations of each row
+        if database_df is not None:
+            self.update(range(len(database_df)), database_df['citations'])
+
+    @classmethod
+    def load(cls, base):
+        """
+        Loads the graph saved at `base` by `save`. Its edge arrays are memory-mapped, so that their pages are shared
+        by every process which loads the same graph, and it cannot be updated.
+        """
+        graph = cls()
+        graph.names = TextTable(base + '.names').tolist()
+        graph.ids = {name: case for case, name in enumerate(graph.names)}
+        graph.__edges = (load_array(base + '.cited.npy'), load_array(base + '.citing.npy'))
+        graph.__rows = int(np.load(base + '.rows.npy'))
+        graph.__row_cases = None
+        return graph
+
+    def save(self, base):
+        """
+        Saves the case names and the edge arrays of the graph at `base`.
+        """
+        cited, citing = self.__edge_arrays()
+        write_texts(base + '.names', self.names)
+        np.save(base + '.cited.npy', cited)
+        np.save(base + '.citing.npy', citing)
+        np.save(base + '.rows.npy', np.int64(self.__rows))
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """
+        Returns the case id of the case `name`, assigning the next free id to a new case.
+        """
+        case = self.ids.get(name)
+        if case is None:
+            case = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return case
+
+    def update(self, rows, citations):
+        """
+        Sets the cases cited by each of `rows` from its comma-joined `citations`.
+        Row ids past the end of the graph are appended, and other rows replace the cases they cited before.
+        """
+        # Raise an error for a loaded graph, whose edges are read-only
+        if self.__row_cases is None:
+            raise ValueError('A loaded citation graph cannot be updated')
+
+        for row, value in zip(rows, citations):
+            # Intern each distinct case cited by the row, where a missing value cites nothing
+            names = dict.fromkeys(value.split(',')) if isinstance(value, str) and value else ()
+            cases = np.fromiter((self.intern(name) for name in names), dtype=np.int64, count=len(names))
+
+            if row == len(self.__row_cases):
+                self.__row_cases.append(cases)
+            else:
+                self.__row_cases[row] = cases
+        self.__rows = len(self.__row_cases)
+
+        # Build the edge arrays and name ranks again when they are next needed
+        self.__edges = None
+        self.__ranks = None
+
+    def __edge_arrays(self):
+        """
+        Returns the edges as two arrays of the cited case ids and the citing row ids.
+        """
+        if self.__edges is None:
+            lengths = [len(cases) for cases in self.__row_cases]
+            citing = np.repeat(np.arange(len(self.__row_cases), dtype=np.int64), lengths)
+            cited = np.concatenate(self.__row_cases) if self.__row_cases else np.empty(0, dtype=np.int64)
+            self.__edges = (cited, citing)
+        return self.__edges
+
+    def edges(self):
+        """
+        Returns the edge table with a row for each case cited by each judgment, from the cited case to the citing row.
+        """
+        cited, citing = self.__edge_arrays()
+        return pd.DataFrame({'cited_id': cited, 'cited': np.array(self.names, dtype=object)[cited], 'citing': citing})
+
+    def __name_ranks(self):
+        """
+        Returns the rank of each case id when the case names are sorted.
+        """
+        if self.__ranks is None:
+            self.__ranks = np.empty(len(self.names), dtype=np.int64)
+            self.__ranks[np.argsort(np.array(self.names, dtype=object), kind='stable')] = np.arange(len(self.names))
+        return self.__ranks
+
+    def __counts(self, counts, n=None, exclude=None):
+        """
+        Returns the non-zero `counts` of each case id as a series of case names, from the most to the least cited.
+        Ties are ordered by case name.
+        """
+        ranks = self.__name_ranks()
+
+        if exclude is not None:
+            counts[exclude] = 0
+
+        # Sort the cited cases by count and then by name
+        cases = np.flatnonzero(counts)
+        cases = cases[np.lexsort((ranks[cases], -counts[cases]))][:n]
+        return pd.Series(counts[cases], index=pd.Index(np.array(self.names, dtype=object)[cases]), dtype='int64')
+
+    def top_cited(self, rows=None, n=10):
+        """
+        Returns the `n` most cited cases, or all of them if `n` is None, with the number of judgments citing each.
+        Only the citations of `rows` are counted if given.
+        """
+        cited, citing = self.__edge_arrays()
+
+        # Keep the edges of the given rows
+        if rows is not None:
+            selected = np.zeros(self.__rows, dtype=bool)
+            selected[np.asarray(rows, dtype=np.int64)] = True
+            cited = cited[selected[citing]]
+
+        return self.__counts(np.bincount(cited, minlength=len(self.names)), n)
+
+    def top_cited_groups(self, groups, n=10):
+        """
+        Returns the `n` most cited cases of each of `groups`, a list of arrays of row ids, in one pass over their citations.
+        The result has a row for each group and case with the number of the group's rows citing it, ordered as `top_cited`.
+        """
+        cited, citing = self.__edge_arrays()
+        ranks = self.__name_ranks()
+
+        # Find the edges of each row, as the edges are ordered by the citing row
+        offsets = np.searchsorted(citing, np.arange(self.__rows + 1))
+
+        # Expand each row of each group into its edges, keeping the group of each edge
+        rows = np.concatenate([np.asarray(group, dtype=np.int64) for group in groups]) if groups else np.empty(0, dtype=np.int64)
+        group_ids = np.repeat(np.arange(len(groups), dtype=np.int64), [len(group) for group in groups])
+        lengths = offsets[rows + 1] - offsets[rows]
+        starts = np.repeat(offsets[rows] - np.cumsum(lengths) + lengths, lengths)
+        cases = cited[starts + np.arange(lengths.sum())]
+
+        # Count the citations of each case in each group
+        keys, counts = np.unique(np.repeat(group_ids, lengths) * max(len(self.names), 1) + cases, return_counts=True)
+        group_ids, cases = np.divmod(keys, max(len(self.names), 1))
+
+        # Sort each group's cases by count and then by name, and keep the first `n` of each group
+        order = np.lexsort((ranks[cases], -counts, group_ids))
+        group_ids, cases, counts = group_ids[order], cases[order], counts[order]
+        if n is not None:
+            first = np.searchsorted(group_ids, group_ids)
+            keep = np.arange(len(group_ids)) - first < n
+            group_ids, cases, counts = group_ids[keep], cases[keep], counts[keep]
+
+        return pd.DataFrame({'group': group_ids, 'cited': np.array(self.names, dtype=object)[cases], 'count': counts})
+
+    def in_degree(self):
+        """
+        Returns the number of judgments citing each case, from the most to the least cited.
+        """
+        return self.top_cited(n=None)
+
+    def citing(self, name):
+        """
+        Returns the row ids of the judgments which cite the case `name`.
+        """
+        case = self.ids.get(name)
+        if case is None:
+            return np.empty(0, dtype=np.int64)
+        cited, citing = self.__edge_arrays()
+        return citing[cited == case]
+
+    def co_cited(self, name, n=10):
+        """
+        Returns the `n` cases most often cited together with the case `name`, with the number of judgments citing both.
+        """
+        cited, citing = self.__edge_arrays()
+        counts = np.bincount(cited[np.isin(citing, self.citing(name))], minlength=len(self.names))
+        return self.__counts(counts, n, exclude=self.ids.get(name))
+
+def citation_tokens(text):
+    """
+    Returns the lowercase words of `text` without the punctuation around them, which case names are matched on.
+    """
+    return [word.strip(string.punctuation) for word in text.casefold().split()]
+
+def name_variants(case_name):
+    """
+    Returns the normalized variants which a judgment is cited by: its lowercase case name,
+    and the case name without its neutral citation, e.g. "public prosecutor v tan ah kow" for "Public Prosecutor v Tan Ah Kow [2021] SGHC 13".
+    A listing title such as "Public Prosecutor v Tan Ah Kow - [2021] SGHC 13" gives the same variants.
+    """
+    name = TITLE_DASH_RE.sub(' ', ' '.join(case_name.casefold().split()))
+    return list(dict.fromkeys(variant for variant in (name, CITATION_SUFFIX_RE.sub('', name)) if variant))
+
+# Create a class for the resolver of the cases cited in a judgment's text to the judgments of the database
+class CitationResolver:
+
+    def __init__(self, keys=(), case_names=()):
+        """
+        Creates the resolver of the judgments with `case_names`, each identified by one of `keys` (e.g. its row id or link).
+        The variants of every case name (see `name_variants`) are kept in a trie of their tokens, which is turned into an
+        Aho-Corasick automaton so that a judgment's text is matched against every case name in a single pass.
+        """
+        # Keep the trie as the children and pattern id (or -1) of each node, with the root as node 0
+        self.__children = [{}]
+        self.__terminal = [-1]
+
+        # Keep the pattern id of each variant, the number of tokens and the keys of each pattern, and the patterns of each key
+        self.__patterns = {}
+        self.__lengths = []
+        self.__keys = []
+        self.__key_patterns = {}
+
+        # Keep the failure link and the longest pattern ending at each node once the automaton is built
+        self.__fail = None
+        self.__output = None
+
+        # Count the cited names which were left unresolved as they name more than one judgment
+        self.ambiguous = 0
+
+        self.add(keys, case_names)
+
+    def __len__(self):
+        return len(self.__key_patterns)
+
+    def __contains__(self, key):
+        return key in self.__key_patterns
+
+    def __insert(self, tokens):
+        """
+        Adds the `tokens` of a variant to the trie and returns the id of its pattern.
+        """
+        node = 0
+        for token in tokens:
+            child = self.__children[node].get(token)
+            if child is None:
+                child = self.__children[node][token] = len(self.__children)
+                self.__children.append({})
+                self.__terminal.append(-1)
+            node = child
+
+        pattern = self.__terminal[node] = len(self.__lengths)
+        self.__lengths.append(len(tokens))
+        self.__keys.append(set())
+        return pattern
+
+    def add(self, keys, case_names):
+        """
+        Adds the judgments with `case_names` by their `keys`. A key which was added before takes its new case name.
+        The automaton is built again on the next scan, once for all the judgments added in the meantime.
+        """
+        for key, case_name in zip(keys, case_names):
+            # Remove the key from the patterns of its earlier case name
+            for pattern in self.__key_patterns.pop(key, ()):
+                self.__keys[pattern].discard(key)
+
+            # Skip a missing case name
+            if not isinstance(case_name, str):
+                continue
+
+            # Add the key to the pattern of each variant, inserting the variants which are new into the trie
+            patterns = []
+            for variant in name_variants(case_name):
+                tokens = tuple(citation_tokens(variant))
+                pattern = self.__patterns.get(tokens)
+                if pattern is None:
+                    pattern = self.__patterns[tokens] = self.__insert(tokens)
+                    self.__fail = None
+                self.__keys[pattern].add(key)
+                patterns.append(pattern)
+            self.__key_patterns[key] = patterns
+
+    def __build(self):
+        """
+        Sets the failure link of each node of the trie, in breadth-first order, and the longest pattern which ends at it.
+        """
+        fail = [0] * len(self.__children)
+        output = list(self.__terminal)
+        queue = deque(self.__children[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self.__children[node].items():
+                queue.append(child)
+
+                # Follow the failure links of the parent to the longest suffix which continues with the token
+                state = fail[node]
+                while state and token not in self.__children[state]:
+                    state = fail[state]
+                fail[child] = self.__children[state].get(token, 0) if node else 0
+
+                # A node which ends no pattern itself ends the longest pattern of its failure link
+                if output[child] < 0:
+                    output[child] = output[fail[child]]
+
+        self.__fail = fail
+        self.__output = output
+
+    def resolve(self, text, exclude=None):
+        """
+        Scans `text` once for the case names of the judgments and returns the keys of the judgments cited, in the order
+        they are first cited, without the key `exclude` (e.g. the judgment's own). Where variants overlap, the leftmost
+        and then longest is taken, so that a citation with its neutral citation is not also matched without it.
+        A variant which names more than one judgment is counted in `ambiguous` and left unresolved.
+        """
+        # Build the automaton if judgments were added since it was last built
+        if self.__fail is None:
+            self.__build()
+        children, fail, output, lengths = self.__children, self.__fail, self.__output, self.__lengths
+
+        # Find the longest pattern ending at each token of the text, as its first token and its pattern
+        matches = []
+        root = children[0]
+        node = 0
+        for position, token in enumerate(citation_tokens(text)):
+            # Skip the tokens which start no case name while outside of one, which are most of the text
+            if not node:
+                node = root.get(token, 0)
+                if not node:
+                    continue
+            else:
+                while node and token not in children[node]:
+                    node = fail[node]
+                node = children[node].get(token, 0)
+            pattern = output[node]
+            if pattern >= 0:
+                matches.append((position + 1 - lengths[pattern], -lengths[pattern], pattern))
+
+        # Keep the leftmost longest matches which do not overlap, and collect the judgments they name
+        cited = {}
+        end = 0
+        for start, length, pattern in sorted(matches):
+            if start < end:
+                continue
+            end = start - length
+            keys = self.__keys[pattern]
+            if len(keys) == 1:
+                key = next(iter(keys))
+                if key != exclude:
+                    cited[key] = None
+            elif keys:
+                self.ambiguous += 1
+
+        return list(cited)
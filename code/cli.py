@@ -0,0 +1,230 @@
+# Import the required packages/modules
+# Only the standard library is imported here; each command imports what it needs when it runs,
+# so that `--help` and the light commands start without loading the scraping and extraction modules.
+
+import argparse
+import sys
+
+def _progress(args):
+    """
+    Returns the progress reporter for the `--progress` option.
+    """
+    from progress import default_progress, NullProgress, PrintProgress
+    return {'auto': default_progress, 'print': PrintProgress, 'none': NullProgress}[args.progress]()
+
+def _metrics(args):
+    """
+    Returns the metrics for the `--metrics` and `--metrics-events` options.
+    """
+    from metrics import Metrics
+    return Metrics(path=None if args.metrics == 'none' else args.metrics, events_path=args.metrics_events)
+
+def pull(args):
+    """
+    Pulls the listings of the court from Lawnet and saves the new entries.
+    """
+    from criminalcasedatabase import Court
+    court = Court(args.court, workers=args.workers, requests_per_second=args.requests_per_second,
+                  base_url=args.base_url, export_csv=args.export_csv, progress=_progress(args), metrics=_metrics(args))
+    court.pull_urls(incremental=args.incremental, stop_after=args.stop_after)
+
+def archive(args):
+    """
+    Archives the judgments of the court's new entries as .html files.
+    """
+    from criminalcasedatabase import Court
+    court = Court(args.court, workers=args.workers, requests_per_second=args.requests_per_second,
+                  base_url=args.base_url, progress=_progress(args), metrics=_metrics(args), layout=args.layout)
+    court.archive()
+
+def build_db(args):
+    """
+    Extracts the archived judgments of the court into the database.
+    """
+    from criminalcasedatabase import Database
+    database = Database(parser=args.parser, export_csv=args.export_csv, progress=_progress(args), metrics=_metrics(args), layout=args.layout)
+    database.create_database(args.court, workers=args.workers, batch_size=args.batch_size)
+
+def migrate(args):
+    """
+    Copies the judgments of the court which are archived as files into its packs.
+    """
+    from judgmentarchive import migrate_files
+    from linkindex import LinkIndex
+    print(f'{migrate_files(args.court, LinkIndex.for_court(args.court))} judgments copied into the packs')
+
+def search(args):
+    """
+    Searches the database and prints the results with their statistics.
+    """
+    import pandas as pd
+    from search import classify_search, NO_RESULTS, SearchIndex, SearchResult
+    from snapshot import current_version
+
+    # Search the serving snapshot if one was published, or else the database store
+    index = SearchIndex.from_snapshot() if current_version() is not None else SearchIndex.from_store()
+    result = SearchResult(classify_search(args.query), index.search(args.query), index.citations)
+
+    # Say so and return an error status if there are no results
+    if not result.found:
+        print(NO_RESULTS)
+        return 1
+
+    # Print the case name, court, date and link of the results, and the statistics of the search
+    columns = ['case_name', 'tribunal/court', 'decision_date', 'link']
+    with pd.option_context('display.width', None, 'display.max_colwidth', 60):
+        print(result.results.loc[:args.limit - 1, columns].to_string())
+    print(result.aggravating())
+    print(result.mitigating())
+    return 0
+
+def search_batch(args):
+    """
+    Searches the database for many queries in one pass and prints the statistics of each search,
+    or writes them and the top citations of each search to .csv files.
+    """
+    import pandas as pd
+    from search import SearchIndex
+    from snapshot import current_version
+
+    # Collect the queries from the arguments, the queries file (one per line) and the sections of statutes_crimes.csv
+    queries = list(args.queries)
+    if args.file:
+        with open(args.file, 'r', encoding='utf_8') as file:
+            queries += [line.strip() for line in file if line.strip()]
+    if args.sections:
+        queries += pd.read_csv('../data/statutes_crimes.csv')['section_statute'].dropna().tolist()
+
+    # Search the serving snapshot if one was published, or else the database store
+    index = SearchIndex.from_snapshot() if current_version() is not None else SearchIndex.from_store()
+    batch = index.search_many(queries, n=args.top)
+
+    # Write the tables if set, or else print the statistics
+    if args.output:
+        batch.statistics.to_csv(args.output, index=False)
+    if args.citations:
+        batch.top_citations.to_csv(args.citations, index=False)
+    if not args.output:
+        with pd.option_context('display.width', None, 'display.max_rows', None, 'display.max_colwidth', 60):
+            print(batch.statistics.to_string())
+    return 0
+
+def fulltext(args):
+    """
+    Searches the text of the judgments and prints the best matching judgments with their BM25 scores.
+    """
+    import pandas as pd
+    from fulltext import FullTextIndex
+    from store import ColumnarStore
+
+    # Rank the judgments, and return an error status if none has a term of the query
+    ranked = FullTextIndex().search(args.query, n=args.top)
+    if ranked.empty:
+        print('No judgments contain the terms of the query.')
+        return 1
+
+    # Print the case name and date of each judgment next to its link and score
+    database = ColumnarStore.for_table('database').read(flat=True)
+    if not database.empty:
+        ranked = ranked.merge(database[['link', 'case_name', 'decision_date']], on='link', how='left')[['case_name', 'decision_date', 'score', 'link']]
+    with pd.option_context('display.width', None, 'display.max_colwidth', 60):
+        print(ranked.to_string())
+    return 0
+
+def prewarm_charts(args):
+    """
+    Renders the charts of the statutes which are the most frequent in the database, so that they are served from the chart cache.
+    """
+    from charts import ChartCache
+    from search import QueryCache, SearchIndex
+    from snapshot import current_version
+
+    # Search the serving snapshot if one was published, or else the database store, as the app does
+    if current_version() is not None:
+        query_cache = QueryCache(loader=SearchIndex.from_snapshot, version=current_version)
+    else:
+        query_cache = QueryCache()
+
+    # Render the charts and print the statutes which were cached
+    chart_cache = ChartCache(query_cache)
+    for statute in chart_cache.prewarm(n=args.top, formats=args.format or ('png',)):
+        print(statute)
+    print(f'{chart_cache.renders} charts rendered, {chart_cache.disk_hits} already cached')
+
+def build_parser():
+    """
+    Returns the parser of the command-line arguments.
+    """
+    parser = argparse.ArgumentParser(prog='criminalcasedatabase', description='Pull, archive, process and search the criminal case database.')
+    parser.add_argument('--progress', choices=('auto', 'print', 'none'), default='auto',
+                        help='how progress is reported: in a notebook only (auto), printed line by line, or not at all')
+    parser.add_argument('--metrics', default='../logs/metrics.jsonl',
+                        help='file the metrics of each run are written to: Prometheus text if it ends in .prom, JSON lines otherwise, or "none"')
+    parser.add_argument('--metrics-events', default=None, help='JSON lines file of every request and judgment, with its time and size')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    # Set the arguments shared by the commands which fetch from Lawnet
+    fetching = argparse.ArgumentParser(add_help=False)
+    fetching.add_argument('court', choices=('supreme', 'subordinate'))
+    fetching.add_argument('--workers', type=int, default=1, help='number of concurrent requests, which share the --requests-per-second limit, so more than one rarely helps unless the limit is raised')
+    fetching.add_argument('--requests-per-second', type=float, default=2, help='limit on the request rate to Lawnet (default: 2), shared by the workers and their retries, where 0 disables it, e.g. for a local stand-in server')
+    fetching.add_argument('--base-url', default=None, help='replaces the Lawnet page, e.g. with a local stand-in server')
+
+    command = commands.add_parser('pull', parents=[fetching], help='pull the listings of a court from Lawnet')
+    command.add_argument('--export-csv', action='store_true', help='also write the full compiled .csv file')
+    command.add_argument('--incremental', action='store_true', help='stop paging once the listings reach cases which were pulled before')
+    command.add_argument('--stop-after', type=int, default=20, help='number of known criminal cases in a row after which an incremental pull stops')
+    command.set_defaults(run=pull)
+
+    command = commands.add_parser('archive', parents=[fetching], help='archive the judgments of the new listings')
+    command.add_argument('--layout', choices=('pack', 'files'), default='pack', help='archive the judgments in compressed pack files, or as one .html file each')
+    command.set_defaults(run=archive)
+
+    command = commands.add_parser('build-db', help='extract the archived judgments of a court into the database')
+    command.add_argument('court', choices=('supreme', 'subordinate'))
+    command.add_argument('--workers', type=int, default=1, help='number of processes which extract the judgments')
+    command.add_argument('--parser', choices=('lxml', 'strainer', 'soup'), default='lxml', help='html parser of the judgments')
+    command.add_argument('--export-csv', action='store_true', help='also write the full database.csv file')
+    command.add_argument('--layout', choices=('pack', 'files'), default='pack', help='layout the judgments were archived in')
+    command.add_argument('--batch-size', type=int, default=None, help='stream the extracted judgments to the store in batches of this many rows instead of holding them all in memory; the final export still reads the whole database')
+    command.set_defaults(run=build_db)
+
+    command = commands.add_parser('migrate', help='copy the judgments archived as files into the packs, which archiving with the pack layout does once on its own')
+    command.add_argument('court', choices=('supreme', 'subordinate'))
+    command.set_defaults(run=migrate)
+
+    command = commands.add_parser('search', help='search the database by case name, offence or statute')
+    command.add_argument('query')
+    command.add_argument('--limit', type=int, default=20, help='number of results printed')
+    command.set_defaults(run=search)
+
+    command = commands.add_parser('search-batch', help='search the database for many queries in one pass and report the statistics of each')
+    command.add_argument('queries', nargs='*')
+    command.add_argument('--file', default=None, help='file of further queries, one per line')
+    command.add_argument('--sections', action='store_true', help='also search every section in statutes_crimes.csv')
+    command.add_argument('--top', type=int, default=10, help='number of most cited cases kept for each search')
+    command.add_argument('--output', default=None, help='.csv file the statistics of each search are written to, instead of printing them')
+    command.add_argument('--citations', default=None, help='.csv file the most cited cases of each search are written to')
+    command.set_defaults(run=search_batch)
+
+    command = commands.add_parser('fulltext', help='rank the judgments by how well their text matches the query (BM25)')
+    command.add_argument('query')
+    command.add_argument('--top', type=int, default=10, help='number of judgments printed')
+    command.set_defaults(run=fulltext)
+
+    command = commands.add_parser('prewarm-charts', help='render the charts of the most frequent statutes ahead of the first searches')
+    command.add_argument('--top', type=int, default=20, help='number of statutes whose charts are rendered')
+    command.add_argument('--format', choices=('png', 'svg'), action='append', default=None, help='chart format, which can be given more than once (default: png)')
+    command.set_defaults(run=prewarm_charts)
+
+    return parser
+
+def main(argv=None):
+    """
+    Runs the command given in `argv`, or in the command-line arguments. Returns the exit status.
+    """
+    args = build_parser().parse_args(argv)
+    return args.run(args) or 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,244 @@
+# Import the required packages/modules
+
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import hashlib
+import os
+import random
+import threading
+import time
+import pandas as pd
+
+# Set the names which the parties of the synthetic judgments are made from
+GIVEN_NAMES = ('Tan', 'Lim', 'Ng', 'Wong', 'Muhammad', 'Siti', 'Ravi', 'Kumar', 'Chua', 'Goh', 'Lee', 'Ong', 'Raj', 'Teo')
+FAMILY_NAMES = ('Ah Kow', 'Wei Ming', 'bin Ismail', 'bte Latib', 's/o Suppiah', 'd/o Rajan', 'Boon Heng', 'Mei Ling', 'Jun Jie')
+
+# Set the filler words of the judgment text
+WORDS = ('the accused was found to have in his possession and the court considered whether this was a case where '
+         'the prosecution submitted that sentence should reflect culpability harm of offence').split()
+
+# Create a class for a synthetic corpus of Lawnet listings and judgments
+class SyntheticCorpus:
+
+    def __init__(self, size, court='supreme', paragraphs=40, per_page=20, seed=0, statutes_df=None):
+        """
+        Creates a corpus of `size` criminal judgments of `court`, listed `per_page` to a listing page, each with
+        about `paragraphs` paragraphs of text. Every judgment is made from `seed` and its number, so the same corpus
+        is generated on every run. Sections and statutes are drawn from `statutes_df` (by default statutes_crimes.csv),
+        and each judgment cites earlier judgments of the corpus by name.
+        """
+        # Set the corpus settings
+        self.size = size
+        self.court = court
+        self.paragraphs = paragraphs
+        self.per_page = per_page
+        self.seed = seed
+        self.statutes_df = pd.read_csv('../data/statutes_crimes.csv') if statutes_df is None else statutes_df
+
+        # Keep the sections and statutes as lists for drawing from them
+        self.sections = self.statutes_df['section'].astype(str).tolist()
+        self.statutes = self.statutes_df['statute'].tolist()
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def pages(self):
+        return max(1, -(-self.size // self.per_page))
+
+    def __random(self, index):
+        """
+        Returns the random generator of the judgment `index`.
+        """
+        return random.Random(self.seed * 1000003 + index)
+
+    def doc_id(self, index):
+        """
+        Returns the Lawnet document id of the judgment `index`.
+        """
+        return f'/Judgment/{100000 + index}-SSP.xml'
+
+    def index_of(self, doc_id):
+        """
+        Returns the number of the judgment with the Lawnet document id `doc_id`, or None if it is not in the corpus.
+        """
+        try:
+            index = int(doc_id.split('/')[-1].split('-')[0]) - 100000
+        except ValueError:
+            return None
+        return index if 0 <= index < self.size else None
+
+    def name(self, index):
+        """
+        Returns the case name of the judgment `index`, e.g. "Public Prosecutor v Tan Wei Ming Lee".
+        """
+        rng = self.__random(index)
+        return f'Public Prosecutor v {rng.choice(GIVEN_NAMES)} {rng.choice(FAMILY_NAMES)} {rng.choice(GIVEN_NAMES)}'
+
+    def decision_date(self, index):
+        """
+        Returns the decision date of the judgment `index`, where later judgments are decided later.
+        """
+        return date(2015, 1, 1) + timedelta(days=index * 3650 // max(self.size, 1))
+
+    def citation(self, index):
+        """
+        Returns the neutral citation of the judgment `index`.
+        """
+        return f'[{self.decision_date(index).year}] SGHC {index}'
+
+    def listing_page(self, page):
+        """
+        Returns the html of the listing page `page` (from 1), with the newest judgments first as on Lawnet.
+        """
+        first = self.size - 1 - (page - 1) * self.per_page
+        items = []
+        for index in range(first, max(first - self.per_page, -1), -1):
+            items.append(f'<li><p class="resultsDate">{self.decision_date(index):%d %b %Y}</p>'
+                         f'<a href="javascript:viewContent(\'{self.doc_id(index)}\')">{self.name(index)} - {self.citation(index)}</a></li>')
+
+        # Link the last page as Lawnet does, where the page number follows the column count of 3
+        return (f'<html><head><title>Free Resources</title></head><body>'
+                f'<ul class="pagination"><li class="lastPageActive"><a href="?p_p_col_count=3&page={self.pages}">Last</a></li></ul>'
+                f'<ul class="searchResultsHolder">{"".join(items)}</ul></body></html>')
+
+    def judgment(self, index):
+        """
+        Returns the html of the judgment `index`, with a header of its offences in most judgments,
+        and a text which cites earlier judgments and mentions sections, statutes, mitigation and aggravation.
+        """
+        rng = self.__random(index)
+        offences = [(rng.choice(self.sections), rng.choice(self.statutes)) for _ in range(rng.randint(1, 3))]
+
+        # Write the header of the offences, which a fifth of the judgments do not have
+        header = ''
+        if rng.random() < 0.8:
+            spans = ''.join(f'<span>Criminal Law – Offences – Section {section} {statute}</span>' for section, statute in offences)
+            header = f'<p class="txt-body">{spans}</p>'
+
+        # Write each paragraph from the filler words with some of the patterns the extractors look for
+        paragraphs = []
+        for number in range(1, self.paragraphs + 1):
+            draw = rng.random()
+            text = ' '.join(rng.choices(WORDS, k=rng.randint(10, 40)))
+            if draw < 0.3 and index:
+                cited = rng.randrange(index)
+                text += f' In {self.name(cited)} {self.citation(cited)}, the court held so.'
+            if draw > 0.6:
+                section, statute = rng.choice(offences)
+                text += f' The charge was under section {section} of the {statute}.'
+            if draw > 0.93:
+                text += ' The mitigating factors were considered.'
+            if 0.85 < draw < 0.88:
+                text += '\xa0The aggravating factors were present.'
+            paragraphs.append(f'<p class="Judg-1">{number} {text}</p>')
+
+        return (f'<html><head><title>{self.name(index)}</title><script>var config = {{}};</script></head><body>'
+                f'<div class="navigation"><ul><li><a href="/lawnet/home">Home</a></li></ul></div>'
+                f'<div class="contentsOfFile"><h2>{self.name(index)} {self.citation(index)}</h2>'
+                f'<table id="info-table"><tr><td>Case Number : CC {index}</td></tr>'
+                f'<tr><td>Decision Date : {self.decision_date(index):%d %B %Y} </td></tr>'
+                f'<tr><td>Tribunal/Court : General Division of the High Court </td></tr>'
+                f'<tr><td>Coram : Judge {index % 7}</td></tr></table>'
+                f'{header}{"".join(paragraphs)}</div><script>var tracking = 1;</script></body></html>')
+
+    def write_judgments(self, directory):
+        """
+        Writes every judgment to `directory` as "judgment_{index}.html". Returns the paths of the files.
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for index in range(self.size):
+            paths.append(os.path.join(directory, f'judgment_{index}.html'))
+            with open(paths[-1], 'w', encoding='utf_8') as file:
+                file.write(self.judgment(index))
+        return paths
+
+# Create a class for a local stand-in for Lawnet, which serves the listing pages and judgments of a corpus
+class StubServer:
+
+    def __init__(self, corpus, latency=0):
+        """
+        Creates the server for `corpus`, which waits `latency` seconds before each response. It listens on a free local port
+        once started, and its `url` is given to a Court as `base_url`. Each page is served with an ETag, and a conditional
+        request for a page which has not changed is answered with 304 Not Modified. The corpus can be replaced while serving,
+        e.g. with a larger one to publish new judgments.
+        """
+        self.corpus = corpus
+        self.latency = latency
+        self.requests = 0
+        self.not_modified = 0
+
+        # Create the request handler, which reads the corpus of this server
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server._respond(self)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}/lawnet/web/lawnet/free-resources'
+
+    def _respond(self, handler):
+        """
+        Sends the judgment or listing page which `handler` requested.
+        """
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        query = parse_qs(urlsplit(handler.path).query)
+
+        # Send the judgment of a document id, or the listing page of a court
+        doc_id = query.get('_freeresources_WAR_lawnet3baseportlet_docId')
+        if doc_id:
+            index = self.corpus.index_of(doc_id[0])
+            body = None if index is None else self.corpus.judgment(index)
+        elif query.get('_freeresources_WAR_lawnet3baseportlet_action') == [self.corpus.court]:
+            page = int(query.get('_freeresources_WAR_lawnet3baseportlet_page', ['1'])[0])
+            body = self.corpus.listing_page(page) if page <= self.corpus.pages else None
+        else:
+            body = None
+
+        if body is None:
+            handler.send_error(404)
+            return
+        body = body.encode('utf-8')
+
+        # Answer that the page has not changed if the request has its ETag
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        if handler.headers.get('If-None-Match') == etag:
+            self.not_modified += 1
+            handler.send_response(304)
+            handler.send_header('ETag', etag)
+            handler.end_headers()
+            return
+
+        handler.send_response(200)
+        handler.send_header('ETag', etag)
+        handler.send_header('Content-Type', 'text/html; charset=utf-8')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def start(self):
+        """
+        Starts serving in a background thread.
+        """
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """
+        Stops serving and closes the port.
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -1,24 +1,38 @@
 # Import the required packages/modules
+# Only the light modules are imported here; the scraping, extraction and indexing modules (and pandas) are imported
+# by the methods which use them, so that importing the module does not load them all.
 
 from __future__ import division, unicode_literals 
-from bs4 import BeautifulSoup
 from datetime import datetime
-from IPython.display import clear_output
-from time import sleep
-import pandas as pd
-import codecs
-import requests
-import re
-import numpy as np
-import itertools
+from judgmentarchive import close_maps, needs_migration, open_archive, read_judgment
+from linkindex import LinkIndex
+from metrics import Metrics
+from pagecache import PageCache
+from progress import default_progress, PrintProgress
+import os
 
 # Create the Court class
 class Court:
 
-    def __init__(self, name):
+    # Set the Lawnet free resources page that the listings are pulled from
+    base_url = "https://www.lawnet.sg/lawnet/web/lawnet/free-resources"
+
+    def __init__(self, name, workers=1, requests_per_second=2, retries=3, base_url=None, export_csv=False, progress=None, metrics=None, layout='pack'):
         """
         Create a court. Only accepts "subordinate" and "supreme".
-        """
+        `workers` sets how many listing pages are fetched concurrently, `requests_per_second` limits the request rate
+        to Lawnet (2 requests per second by default, where `None` or 0 disables the limit), and `retries` sets how many times a failed request is retried with backoff.
+        As the workers share the rate limit, more than one worker only helps while a response takes longer than the interval
+        between two requests (half a second by default), so raise `requests_per_second` along with `workers`.
+        `base_url` replaces the Lawnet page, e.g. with a local stand-in server.
+        `export_csv` also writes the full compiled .csv file after each pull.
+        `layout` sets how the judgments are archived (see judgmentarchive.py): in compressed pack files, or as one .html file each.
+        `progress` reports the progress (see progress.py), by default in a notebook and nowhere otherwise.
+        `metrics` records the time of each stage and request (see metrics.py), by default to ../logs/metrics.jsonl.
+        """
+        from fetcher import Fetcher
+        from store import ColumnarStore
+
         # Set the name of the instance
         self.name = name
         
@@ -26,16 +40,43 @@ class Court:
         if self.name != 'subordinate' and self.name != 'supreme':
             raise CourtNameError("There is only the Subordinate (State) or Supreme Court!")
 
+        # Override the Lawnet page if given
+        if base_url is not None:
+            self.base_url = base_url
+
+        # Set the metrics of the runs
+        self.metrics = metrics or Metrics()
+
+        # Create the fetcher which shares one keep-alive session across all requests
+        self.fetcher = Fetcher(workers=workers, requests_per_second=requests_per_second, retries=retries, metrics=self.metrics)
+
+        # Load the columnar store of the compiled entries, which is seeded from the compiled .csv file
+        self.store = ColumnarStore.for_table(f'{self.name}court_compiled')
+        self.export_csv = export_csv
+
+        # Load the cache of the listing pages, which are only downloaded again when Lawnet says they changed
+        self.page_cache = PageCache(f'../data/page_cache/{self.name}')
+
+        # Set the progress reporter
+        self.progress = progress or default_progress()
+
+        # Set the layout of the judgment archive
+        self.layout = layout
+
     def __set_soup(self):
         """
         Sets the target Court's Lawnet page using `name`.
         """
+        from bs4 import BeautifulSoup
+
         # Set the url for API requests
-        self.url = "https://www.lawnet.sg/lawnet/web/lawnet/free-resources?p_p_id=freeresources_WAR_lawnet3baseportlet&p_p_lifecycle=0&p_p_state=normal&p_p_mode=view&p_p_col_id=column-1&p_p_col_pos=2&p_p_col_count=3&_freeresources_WAR_lawnet3baseportlet_action="+self.name
+        self.url = self.base_url+"?p_p_id=freeresources_WAR_lawnet3baseportlet&p_p_lifecycle=0&p_p_state=normal&p_p_mode=view&p_p_col_id=column-1&p_p_col_pos=2&p_p_col_count=3&_freeresources_WAR_lawnet3baseportlet_action="+self.name
         
+        # Set the base domain for the urls
+        self.domain = self.base_url+"?p_p_id=freeresources_WAR_lawnet3baseportlet&p_p_lifecycle=1&p_p_state=normal&p_p_mode=view&p_p_col_id=column-1&p_p_col_pos=2&p_p_col_count=3&_freeresources_WAR_lawnet3baseportlet_action=openContentPage&_freeresources_WAR_lawnet3baseportlet_docId="
+
         # Set the variables for BeautifulSoup parsing
-        self.response = requests.get(self.url)
-        self.html = self.response.text
+        self.html = self.fetcher.get_text(self.url, self.page_cache)
         self.court = BeautifulSoup(self.html, 'lxml')
 
     def __get_num_pages(self):
@@ -49,81 +90,137 @@ class Court:
         # Replace the first "3" as it comes from the url
         self.last_page = int(self.page.replace("3","",1))
 
+    def __parse_page(self, html):
+        """
+        Parses the html of a listing page and returns the cases found on it as a list of dictionaries.
+        """
+        from bs4 import BeautifulSoup
+
+        # Create an empty list for the results of this page
+        page_results = []
+        court1 = BeautifulSoup(html, 'lxml')
+        
+        # Get the relevant elements (date, name, link)
+        search_results = court1.find_all('ul', {'class': 'searchResultsHolder'})
+        
+        # Iterate throught the search results to find the list elements
+        for li in search_results:
+            li_list = li.find_all('li')
+            for element in li_list:
+               # start a dictionary to store this item's data
+                result = {}
+                
+                # Set the court
+                result['court'] = self.name
+                
+                # get the date
+                result['date'] = element.find('p', {'class': 'resultsDate'}).text
+                
+                # get the title and full link/url
+                a_href = element.find('a')
+                if a_href:
+                    result['title'] = a_href.text.strip()   # element text
+                    link = str(a_href['href']) # href link
+                    
+                    # Remove unnecessary parts of the link
+                    link = link.replace("javascript:viewContent","")
+                    link = link.strip("')(")
+                    
+                    # Add the result including the domain
+                    result['link'] = self.domain+link
+                    
+                    # only store "full" rows of data
+                    if len(result) == 4:
+                        page_results.append(result)
+
+        return page_results
+
     def __fetch_urls(self):
         """
         Uses `name` to scrape lawnet for the cases and urls and store it in a dataframe `court_df`.
+        Pages are fetched concurrently when the court has more than one worker, but are always merged in page order.
         """
         # Create an empty list for results
         self.results_list = []
         
-        # Set the base domain for the urls
-        self.domain = "https://www.lawnet.sg/lawnet/web/lawnet/free-resources?p_p_id=freeresources_WAR_lawnet3baseportlet&p_p_lifecycle=1&p_p_state=normal&p_p_mode=view&p_p_col_id=column-1&p_p_col_pos=2&p_p_col_count=3&_freeresources_WAR_lawnet3baseportlet_action=openContentPage&_freeresources_WAR_lawnet3baseportlet_docId="
-        
-        # Create counter for current page
-        self.current_page = 1
+        # Set the full url for every page from the first to the last page
+        page_urls = [self.__page_url(page) for page in range(1, self.last_page+1)]
         
-        # Loop while it is not the last page
-        while self.current_page <= self.last_page:
-            
-            # Set the full url for the current page
-            url1 = self.url+"&_freeresources_WAR_lawnet3baseportlet_page="+str(self.current_page)
-            
-            # Establishing the connection to the web page:
-            response1 = requests.get(url1)
-            
-            # Pull the HTML string out of requests and convert it to a Python string.
-            html1 = response1.text
-            court1 = BeautifulSoup(html1, 'lxml')
-            
-            # Get the relevant elements (date, name, link)
-            search_results = court1.find_all('ul', {'class': 'searchResultsHolder'})
-            
-            # Iterate throught the search results to find the list elements
-            for li in search_results:
-                li_list = li.find_all('li')
-                for element in li_list:
-                   # start a dictionary to store this item's data
-                    result = {}
-                    
-                    # Set the court
-                    result['court'] = self.name
-                    
-                    # get the date
-                    result['date'] = element.find('p', {'class': 'resultsDate'}).text
-                    
-                    # get the title and full link/url
-                    a_href = element.find('a')
-                    if a_href:
-                        result['title'] = a_href.text.strip()   # element text
-                        link = str(a_href['href']) # href link
-                        
-                        # Remove unnecessary parts of the link
-                        link = link.replace("javascript:viewContent","")
-                        link = link.strip("')(")
-                        
-                        # Add the result including the domain
-                        result['link'] = self.domain+link
-                        
-                        # only store "full" rows of data
-                        if len(result) == 4:
-                            self.results_list.append(result)
-                            
-                    # Clear cell output
-                    clear_output(wait=True)
-
-                    # Print current progress
-                    print(f'Current progress: page {self.current_page}/{self.last_page}.')
-
-            # Raise page counter for the loop to pull results from the next page
-            self.current_page += 1
+        # Fetch the pages (in page order) and iterate through them
+        for self.current_page, html1 in enumerate(self.fetcher.fetch_all(page_urls, self.page_cache), start=1):
             
+            # Add the results of the current page
+            self.results_list.extend(self.__parse_page(html1))
+
+            # Report current progress
+            self.progress.update(self.current_page, self.last_page, 'page')
+
+        # Count that no page was skipped
+        self.pages_skipped = 0
+
+        # Create the dataframe of the results
+        self.__create_court_df()
+
+    def __page_url(self, page):
+        """
+        Returns the url of the listing page `page`, counted from 1.
+        """
+        return self.url+"&_freeresources_WAR_lawnet3baseportlet_page="+str(page)
+
+    def __fetch_new_urls(self, stop_after):
+        """
+        Scrapes lawnet for the cases and urls like `__fetch_urls`, but stops paging once `stop_after` criminal cases
+        in a row are already in the compiled store. As Lawnet lists the newest cases first, the pages after that
+        only hold cases which were pulled before, and are counted in `pages_skipped` instead of being fetched.
+        Pages are still fetched concurrently when the court has more than one worker, a window of pages at a time.
+        """
+        # Create an empty list for results
+        self.results_list = []
+
+        # Load the links of the compiled store, reading only the link column
+        known_links = self.store.keys()
+
+        # Count the criminal cases in a row which are already known
+        known_run = 0
+
+        # Fetch the pages in windows of one page per worker, until enough known cases in a row were found
+        self.current_page = 0
+        while self.current_page < self.last_page and known_run < stop_after:
+            window = range(self.current_page + 1, min(self.current_page + self.fetcher.workers, self.last_page) + 1)
+            for self.current_page, html1 in zip(window, self.fetcher.fetch_all([self.__page_url(page) for page in window], self.page_cache)):
+
+                # Add the results of the current page
+                page_results = self.__parse_page(html1)
+                self.results_list.extend(page_results)
+
+                # Count the known criminal cases in a row, as only criminal cases are kept in the compiled store
+                for result in page_results:
+                    if "Public Prosecutor" in result['title']:
+                        known_run = known_run + 1 if result['link'] in known_links else 0
+
+                # Report current progress
+                self.progress.update(self.current_page, self.last_page, 'page')
+
+        # Count the pages which were not fetched
+        self.pages_skipped = self.last_page - self.current_page
+        self.progress.message(f'Current progress: {self.pages_skipped} of {self.last_page} pages skipped.')
+
+        # Create the dataframe of the results
+        self.__create_court_df()
+
+    def __create_court_df(self):
+        """
+        Creates the dataframe `court_df` of the scraped results.
+        """
+        import pandas as pd
+
         # Create a dataframe with all the links, sorted by date
         self.court_df = pd.DataFrame(self.results_list)
         self.court_df = self.court_df.sort_values(by='date')
         self.court_df = self.court_df.reset_index(drop=True)
         
-        # Print current progress
-        print(f'Current progress: DataFrame created.')
+        # Report current progress
+        self.progress.message(f'Current progress: DataFrame created.')
 
     def __only_crim(self):
         """
@@ -133,548 +230,693 @@ class Court:
         self.court_df = self.court_df[self.court_df['title'].str.contains("Public Prosecutor")]
         self.court_df = self.court_df.reset_index(drop=True)
 
-        # Print current progress
-        print(f'Current progress: Narrowed to only Criminal cases.')
+        # Report current progress
+        self.progress.message(f'Current progress: Narrowed to only Criminal cases.')
 
     def __compare_csv(self):
         """
         Loads the complete csv database and compares data with the dataframe to identify new entries.
         Returns new entries as `court_df` and all entries as `court_full`.
         """
+        import pandas as pd
+
         # Convert dates to datetime
         self.court_df['date'] = pd.to_datetime(self.court_df['date'], dayfirst=True)
         
-        # Load the full dataset .csv and convert dates to datetime
-        self.court_full = pd.read_csv(f'../data/{self.name}court_compiled.csv')
-        self.court_full['date'] = pd.to_datetime(self.court_full['date'], format='%Y-%m-%d')
+        # Load the full dataset, where dates are already stored as datetime
+        self.court_full = self.store.read()
+        
+        # Load the link index, which gives every judgment a stable document id
+        self.link_index = LinkIndex.for_court(self.name, self.court_full['link'])
         
         # Filter to entries which are not in the full dataset
         self.court_df = self.court_df[~self.court_df['link'].isin(self.court_full['link'])]
         
+        # Assign document ids to the new entries
+        self.link_index.add(self.court_df['link'])
+        
         # Merge new entries to the full dataset, sorted by date
         self.court_full = self.court_full.merge(self.court_df, how='outer')
         self.court_full = self.court_full.sort_values(by='date')
         self.court_full = self.court_full.reset_index(drop=True)
 
 
-        # Print current progress
-        print(f'Current progress: {len(self.court_df.date)} New entries identified and saved.')
+        # Report current progress
+        self.progress.message(f'Current progress: {len(self.court_df.date)} New entries identified and saved.')
 
     def __export_csv(self):
         """
-        Exports dataframes to the respective .csv files
+        Exports the new entries to a .csv file and appends them to the compiled store.
         """
         # Save the new entries in a .csv
         self.court_df.to_csv(path_or_buf=f'../data/{self.name}court.csv', index=False)
         
-        # Save the new full dataset in a .csv
-        self.court_full.to_csv(path_or_buf=f'../data/{self.name}court_compiled.csv', index=False)
+        # Append the new entries to the compiled store
+        self.store.append(self.court_df)
+        
+        # Save the new full dataset in a .csv if set
+        if self.export_csv:
+            self.court_full.to_csv(path_or_buf=f'../data/{self.name}court_compiled.csv', index=False)
+        
+        # Save the document ids of the new entries
+        self.link_index.save()
 
-    def pull_urls(self):
+    def pull_urls(self, incremental=False, stop_after=20):
         """
-        Call command to pull urls and export to csv database
+        Call command to pull urls and export to csv database.
+        If `incremental` is set, paging stops once `stop_after` criminal cases in a row were pulled before.
         """
-        # Call the functions required to pull the urls from Lawnet
-        self.__set_soup()
-        self.__get_num_pages()
-        self.__fetch_urls()
-        self.__only_crim()
-        self.__compare_csv()
-        self.__export_csv()
+        # Call the functions required to pull the urls from Lawnet, timing each stage
+        with self.metrics.timer('stage', stage='listing'):
+            self.__set_soup()
+            self.__get_num_pages()
+        with self.metrics.timer('stage', stage='fetch_urls'):
+            if incremental:
+                self.__fetch_new_urls(stop_after)
+            else:
+                self.__fetch_urls()
+        with self.metrics.timer('stage', stage='compare'):
+            self.__only_crim()
+            self.__compare_csv()
+        with self.metrics.timer('stage', stage='export'):
+            self.__export_csv()
         
         # Write a log of the last pull date
-        self.file = open('../logs/pull_log.txt', 'a', encoding='utf_8')
-        self.file.write(f'list last updated on: {datetime.today()}; \n')
+        with open('../logs/pull_log.txt', 'a', encoding='utf_8') as file:
+            file.write(f'list last updated on: {datetime.today()}; \n')
+        
+        # Write the metrics of the pull
+        self.metrics.count('listings', len(self.results_list))
+        self.metrics.count('new_entries', len(self.court_df))
+        self.metrics.count('pages_skipped', self.pages_skipped)
+        self.metrics.write(command='pull', court=self.name)
         
-        # Print current progress
-        print(f'Current progress: Completed url pull and export.')
+        # Report current progress
+        self.progress.message(f'Current progress: Completed url pull and export.')
 
     def load_csv(self):
         """
-        Loads .csvs using `name` as lists of dictionaries.
+        Loads .csvs using `name` as lists of dictionaries, and the link index of the court as `link_index`.
         """
+        import pandas as pd
+
         # Load the .csv files as pandas dataframes
         self.court_link_list = [pd.read_csv(f'../data/{self.name}court.csv').link.to_dict()]
-        self.court_link_dict = pd.read_csv(f'../data/{self.name}court_compiled.csv').link.to_dict()
-        self.court_full = pd.read_csv(f'../data/{self.name}court_compiled.csv')
-        self.court_full['date'] = pd.to_datetime(self.court_full['date'], format='%Y-%m-%d')
+        self.court_full = self.store.read()
+        
+        # Load the link index once and make sure that every compiled link has a document id
+        self.link_index = LinkIndex.for_court(self.name, self.court_full['link'])
+        self.link_index.add(self.court_full['link'])
+        self.link_index.save()
 
     def __save_html(self):
         """
-        Iterates through the lists of dictionaries to save judgments from Lawnet as a .html file.
+        Archives the new judgments from Lawnet into the judgment archive through the archiver's worker pool.
+        Judgments which were archived in an earlier (possibly interrupted) run are skipped.
         """
-        # Create a counter for the progress bar
-        self.count = 1
+        from archiver import Archiver
 
         # Sets the file name for the judgment
         self.file_name = self.name+'court'
-            
-        # Iterate through the list of new link entries
+
+        # Create the archiver for this court's judgment archive, which names the judgment files by their document ids,
+        # copying the judgments archived as files into the packs first so that they are not downloaded again
+        self.judgment_archive = open_archive(self.name, self.link_index, self.layout, migrate=True)
+        self.archiver = Archiver(self.fetcher, self.judgment_archive)
+
+        # Plan the link of each new link entry
+        jobs = []
         for item in self.court_link_list:
-            for key, value in item.items():            
-                # Sets the request for the link
-                url = value
-                response = requests.get(url)
-                
-                # Pull the HTML string out of requests and convert it to a Python string.
-                html = response.text
-                soup = BeautifulSoup(html, 'lxml')
-                
-                # Match value to key in full list for file name
-                key1 = list(self.court_link_dict.keys())[list(self.court_link_dict.values()).index(value)]
-                try:                    
-                    # Try to save as html file
-                    file = open(f'../judgments/{self.name}_court/{self.file_name}_{key1}.html', 'x', encoding='utf_8')
-                    file.write(str(soup))
-                    file.close
-                    sleep(randint(1,4))
-
-                    # Clear cell output
-                    clear_output(wait=True)
-
-                    # Print current progress
-                    print(f'Current progress: {self.count}/{len(self.court_link_list[0])}.')
-                    self.count += 1
-
-                except:
-                    # Skip if error, print an error log with index
-                    file = open('../logs/error_log.txt', 'a', encoding='utf_8')
-                    file.write(f'{self.file_name}_list error: {key1}.html : {datetime.today()}; \n')
-                    
-                    # Clear cell output
-                    clear_output(wait=True)
+            for key, value in item.items():
+                jobs.append(value)
 
-                    # Print current progress
-                    print(f'Current progress: {self.count}/{len(self.court_link_list[0])}.')
-                    self.count += 1
+        # Create a counter for the progress bar
+        self.count = 1
+        self.archived = 0
+
+        # Archive the judgments and track their progress
+        for entry in self.archiver.run(jobs):
+            self.metrics.count('judgments_archived', status=entry['status'])
+            if entry['status'] == 'done':
+                self.archived += 1
+            else:
+                # Print an error log with the file name if the judgment could not be archived
+                with open('../logs/error_log.txt', 'a', encoding='utf_8') as file:
+                    file.write(f'{self.file_name}_list error: {entry["link"]} : {entry["error"]} : {datetime.today()}; \n')
+
+            # Report current progress
+            self.progress.update(self.count, len(jobs))
+            self.count += 1
 
     def archive(self):
         """
-        Call command to archive the urls as .html files.
+        Call command to archive the urls as .html judgments.
         """
-        # Call the functions required to archive the new html files from Lawnet
-        self.load_csv()
-        self.__save_html()
+        # Call the functions required to archive the new html files from Lawnet, timing each stage
+        with self.metrics.timer('stage', stage='load'):
+            self.load_csv()
+        with self.metrics.timer('stage', stage='archive'):
+            self.__save_html()
         
         # Update the log file for the last archival date
-        self.file = open('../logs/archival_log.txt', 'a', encoding='utf_8')
-        self.file.write(f'last archived on: {datetime.today()}; \n')
+        with open('../logs/archival_log.txt', 'a', encoding='utf_8') as file:
+            file.write(f'last archived on: {datetime.today()}; \n')
+        
+        # Write the metrics of the archival
+        self.metrics.write(command='archive', court=self.name)
         
-        # Print current progress
-        print(f'Current progress: {len(self.court_link_list[0])} HTMLs archived.')
+        # Report current progress
+        self.progress.message(f'Current progress: {self.archived} HTMLs archived.')
         
 # Create a class for the database creation / updating
 class Database:
 
-    def __init__(self):
+    def __init__(self, parser='lxml', export_csv=False, progress=None, metrics=None, layout='pack'):
         """
         Initializes the class and loads the datasets.
-        """
-        # Load the .csv files as pandas dataframes
-        self.supremecourt_df = pd.read_csv('../data/supremecourt_compiled.csv')
-        self.subordinatecourt_df = pd.read_csv('../data/subordinatecourt_compiled.csv')
-        self.database_df = pd.read_csv('../data/database.csv')
+        `parser` sets how the html judgments are parsed: "lxml" (fastest), "strainer" or "soup" (a full BeautifulSoup tree).
+        `export_csv` also writes the full database.csv file after each update.
+        `layout` sets how the judgments were archived (see judgmentarchive.py): in compressed pack files, or as one .html file each.
+        `progress` reports the progress (see progress.py), by default in a notebook and nowhere otherwise.
+        `metrics` records the time of each stage, judgment and extractor (see metrics.py), by default to ../logs/metrics.jsonl.
+        """
+        from cache import ExtractionCache
+        from extractors import COLUMNS, StatuteIndex
+        from fulltext import FullTextIndex
+        from store import ColumnarStore
+        import pandas as pd
+
+        # Set the parser for the html judgments
+        self.parser = parser
+        self.export_csv = export_csv
+        self.progress = progress or default_progress()
+        self.metrics = metrics or Metrics()
+        self.layout = layout
+        
+        # Load the columnar stores, which are seeded from the .csv files, as pandas dataframes in the .csv layout
+        self.store = ColumnarStore.for_table('database')
+        self.supremecourt_df = ColumnarStore.for_table('supremecourt_compiled').read(flat=True)
+        self.subordinatecourt_df = ColumnarStore.for_table('subordinatecourt_compiled').read(flat=True)
+        self.database_df = self.store.read(flat=True).reindex(columns=COLUMNS)
+        
+        # Build the search index and the statistics on first use
+        self.__search_index = None
+        self.__analytics = None
         self.statutes_df = pd.read_csv('../data/statutes_crimes.csv')
         
-    def __get_num_rows(self):
+        # Index the statutes once for the lookups of every judgment
+        self.statute_index = StatuteIndex(self.statutes_df)
+        
+        # Load the cache of extracted judgments, keyed by the hash of each judgment's html
+        self.cache = ExtractionCache()
+        
+        # Open the full-text index of the judgments' text
+        self.fulltext = FullTextIndex()
+        
+        # Load the links of the judgments cited by each judgment, and build the resolver of the case names on first use
+        self.cited_links = _load_cited_links()
+        self.__citation_resolver = None
+        
+    def extract_judgment(self, court, link, location, verbose=False):
         """
-        Calculates the number of rows there are in each dataset.
+        Loads the html judgment at `location` (the path of an .html file, or a location in a judgment archive)
+        and performs the NLP steps to extract the key information.
+        Returns the information as a dictionary with a column for each field of the database.
         """
-        # Find the number of rows in each court's dataframe
-        self.__supremecourt_rows = len(self.supremecourt_df)
-        self.__subordinatecourt_rows = len(self.subordinatecourt_df)
+        # Extract the information with the stateless extractors
+        record, terms, timings, text = _extract_file(court, link, location, self.statute_index, self.parser)
+        
+        # Print the information extracted
+        if verbose:
+            _print_record(record, PrintProgress())
         
-        # Compare the number of rows for each court in the database to find out how many new rows there are
-        self.__new_supremecourt_rows = self.__supremecourt_rows - len(self.database_df[self.database_df['court_tag'] == 'supreme'])
-        self.__new_subordinatecourt_rows = self.__subordinatecourt_rows - len(self.database_df[self.database_df['court_tag'] == 'subordinate'])
+        return record.to_dict()
 
-    def __get_case_name(self):
+    @property
+    def search_index(self):
         """
-        Takes out the case name from the judgment
+        The search index of the database, which is built on first use and updated as judgments are processed.
         """
-        # Search for the case name in the judgment
-        self.__case_name = {'case_name': self.__search_results.find('h2').text.strip()}
-        
-        # Create a temp variable for the case name without the case citation notation by looking for patterns of Capitalized words with name terms which are followed by v and further capitalized words with name terms as these suggest that it is a case name
-        self.__temp_case_name = re.search('(([A-Z][a-z]*)(([A-Z][a-z]*)|(a\/l|a\/p|d\/o|s\/o| |bte|bin|and|another|anr|binti|de|the|for|other|matters))* v (([A-Z][a-z]*)|(a\/l|a\/p|d\/o|s\/o| |bte|bin|and|another|anr|binti|de|the|for|other|matters))*(?=|))', str(self.__case_name)).group(0).strip()
-        
-        # Return case name as a dictionary
-        return self.__case_name
-    
-    def __get_court(self):
+        if self.__search_index is None:
+            from search import SearchIndex
+            self.__search_index = SearchIndex(self.database_df)
+        return self.__search_index
+
+    @property
+    def citation_graph(self):
         """
-        Takes out the court name from the judgment
+        The citation graph of the database, whose row ids are those of the search index.
         """
-        # Search for the info table in the html
-        self.__temp_results1 = self.__search_results.find('table', {'id': 'info-table'})
-        
-        # Picks out the court info in the search results as string
-        self.__temp_court = re.search('Tribunal/Court : (\w* )*(?=Coram)', self.__temp_results1.text).group(0).strip()
-        
-        # Split the court info string to the key and value
-        self.__temp_list = self.__temp_court.split(" : ")
-        
-        # Set court info in a dictionary
-        self.__court = {str.lower(self.__temp_list[0]): self.__temp_list[1]}
-        
-        # Return court info as a dictionary
-        return self.__court
-                        
-    def __get_date(self):
+        return self.search_index.citations
+
+    @property
+    def citation_resolver(self):
         """
-        Takes out the court name from the judgment
+        The resolver of the cases cited in a judgment's text to the links of the judgments of the database,
+        which is built on first use and updated as judgments are processed.
         """
-        # Search for the info table in the html
-        self.__temp_results1 = self.__search_results.find('table', {'id': 'info-table'})
-        
-        # Picks out the decision date in the search results as string
-        self.__temp_date = re.search('Decision Date : (\w* )*(?=Tribunal)', self.__temp_results1.text).group(0).strip()
+        if self.__citation_resolver is None:
+            from citations import CitationResolver
+            self.__citation_resolver = CitationResolver(self.database_df['link'].tolist(), self.database_df['case_name'].tolist())
+            
+            # Add the listed judgments which are not in the database yet by their listing titles, so that a citation
+            # resolves whether or not the judgment it cites was extracted before the judgment citing it
+            known_links = set(self.database_df['link'])
+            for court_df in (self.supremecourt_df, self.subordinatecourt_df):
+                if 'title' in court_df:
+                    listed = court_df[~court_df['link'].isin(known_links)]
+                    self.__citation_resolver.add(listed['link'].tolist(), listed['title'].tolist())
+        return self.__citation_resolver
+
+    @property
+    def analytics(self):
+        """
+        The aggregate statistics of the database, whose row ids are those of the search index.
+        """
+        if self.__analytics is None:
+            from analytics import Analytics
+            self.__analytics = Analytics(self.search_index.database)
+        return self.__analytics
+
+    def __plan(self, court):
+        """
+        Finds the archived judgments of `court` which need to be extracted, by the hash of each judgment's html.
+        Yields a (job, None) pair for each judgment to extract, and a (None, cached dictionary) pair for each judgment
+        which is unchanged but missing from the database. Judgments which are unchanged and already in the database are skipped.
+        """
+        # Raise an error if an invalid court is set
+        if court not in ('supreme', 'subordinate'):
+            raise CourtNameError("There is only the Subordinate (State) or Supreme Court!")
+            
+        # Set the dataset based on which court is given
+        self.dataset = getattr(self, f'{court}court_df')
         
-        # Split the decision date to the key and value
-        self.__temp_list = self.__temp_date.split(" : ")
+        # Load the link index which gives the document id in each judgment's file name
+        self.link_index = LinkIndex.for_court(court, self.dataset['link'])
+
+        # Open the judgment archive, which hashes the judgment files through the cache so that unchanged files are not read again
+        self.judgment_archive = open_archive(court, self.link_index, self.layout, hasher=self.cache.digest)
         
-        # Set decision date in a dictionary
-        self.__decision_date = {'decision_date': self.__temp_list[1]}
+        # Report judgments archived as files which are not in the packs, as only the archiving or the migrate command copies them
+        if self.layout == 'pack' and needs_migration(court):
+            self.progress.message(f'Judgments archived as files are not in the packs yet; run "python cli.py migrate {court}" to include them.')
         
-        # Return decision date as a dictionary
-        return self.__decision_date
+        # Find the links of the court which are already in the database
+        known_links = set(self.database_df.loc[self.database_df['court_tag'] == court, 'link'])
         
-    def __get_statute(self):
-        """
-        Identifies criminal offences and statutes mentioned in the judgment based on its header as a first choice, and text as a second choice.
-        """
-        # Create an empty list of offences
-        self.__offences = []
+        # Instantiate the hashes of the judgments to extract, the documents for the full-text index and the count of extractions
+        self.__digests = {}
+        self.__documents = []
+        self.__citing_texts = []
+        self.__extracted = 0
         
-        # First try to identify the crimes based on the header of the judgment.
-        try:
-            # Search for the header in the html
-            self.__temp_results1 = self.__search_results.find('p', {'class': 'txt-body'})
-            self.__temp_results2 = self.__temp_results1.find_all('span')
+        for link in self.dataset['link']:
+            location = self.judgment_archive.locate(link)
             
-            # Iterate through the results and try to find the offences
-            for result in self.__temp_results2:
-                try:
-                    # Search for "Section(s) or "s(s)" (abbreviated sections) with digits. First replace weird text.
-                    section = re.search('([Ss](ection|)(s|) \d+)', result.text.replace('\xa0',' ')).group(0).strip()
-                    
-                    # Pick out only the section numbers
-                    section_num = re.sub('([Ss](ection|)(s|) )', "", section)
-                    
-                    # Pick out patterns which end in Act or Code as these refer to statutes
-                    statute = re.search(r'((([A-Z][a-z]*)|(Corruption, Drug Trafficking and Other Serious Crimes \(Confiscation of Benefits\)|and|of| )){2,}(Act|Code))', result.text.replace('\xa0',' ')).group(0).strip()
-                    
-                    # Combine section numbers and statute
-                    section_statute = section_num + " " + statute
-                    
-                    # Checks the database of statutes I created to find a possible offence if it exists within and adds it to the list of offences for this judgment
-                    if section_statute in self.statutes_df['section_statute'].values:
-                        index = self.statutes_df[self.statutes_df['section_statute'] == section_statute].index
-                        offence = self.statutes_df.iloc[index].values
-                        self.__offences.append([offence[0][1], section_statute])
-                        
-                    # If not found within the database of statutes, adds the section number and statute but list offences as "unsure"
-                    else:
-                        self.__offences.append(['Not in database', section_statute])
-                        
-                except:
-                    pass
-        except:
-            pass
-        
-        # If the judgment header does not contain the section and statute, identify it through the text
-        if len(self.__offences) == 0:
-            print('No offences found in header, checking document text..')
+            # Skip judgments which have not been archived yet
+            if location is None:
+                continue
             
-            # Instantiate empty lists
-            offence_b = []
-            sections_found = []
-            statutes_found = []
+            # Look up the extraction of the judgment's html made by the current extractors
+            digest = self.judgment_archive.digest(link)
+            record = self.cache.get(digest)
             
-            # Search for all the document text
-            self.__search_results2 = self.__search_results.text.replace("\xa0"," ")
+            # Extract the judgment if it is new, was re-archived or was extracted by an older version of the extractors
+            if record is None:
+                self.__digests[link] = digest
+                yield (court, link, location), None
+                continue
             
-            # Instantiate empty lists
-            section_list = []
-            statute_list = []
-            try:
-                # Try to find the sections as above
-                sections = re.findall('( [Ss](ection|)(s|) \d+)', self.__search_results2)
-
-                # If sections is not empty:
-                if sections != []:
-                    # Iterate through the sections and adds their digits to the section list
-                    for s in sections:
-                        section_list.append(re.findall(r'\d+',s[0]))
-
-                        # Add the sections found to the list
-                        for ss in section_list:
-                            sections_found.append(ss[0])
-
-                # Try to find the statutes as above
-                statutes = re.findall(r'((([A-Z][a-z]*)|(Corruption, Drug Trafficking and Other Serious Crimes \(Confiscation of Benefits\)|and|of| )){2,}(Act|Code))', self.__search_results2)
-
-                # If statutes is not empty:
-                if statutes != []:
-                    # Iterate through the statutes and adds their name to the statute list
-                    for s in statutes:
-                        statute_list.append(s[0].strip())
-
-                        # Add the statutes found to the list
-                        for ss in list(statute_list):
-                            statutes_found.append(ss)
-            except:
-                pass
+            # Count the terms of a cached judgment whose text is not in the full-text index, without extracting it again
+            if self.fulltext.digest(link) != digest:
+                with self.metrics.timer('term_counts'):
+                    self.__documents.append((link, digest, _judgment_terms(location, self.parser)))
             
-            if statutes_found != []:
-                # Convert the sections and statutes found to sets to remove duplicates
-                sections2 = set(sections_found)
-                statutes2 = set(statutes_found)
-                
-                # Permutate through the sections and statutes to find all possible combinations of the two
-                combinations = list(itertools.product(list(sections2),list(statutes2)))
-                
-                # Check if combinations is blank
-                if combinations == []:
-                    combinations = list(statutes_found)
+            # Reuse the cached extraction if the judgment is missing from the database
+            if link not in known_links:
+                yield None, dict(record, court_tag=court, link=link)
+        
+        # Save the hashes so that unchanged files are not read again on the next run
+        self.cache.save()
+        
+        # Record the hits and misses of the cache
+        self.metrics.count('cache_hits', self.cache.hits, cache='extraction')
+        self.metrics.count('cache_misses', self.cache.misses, cache='extraction')
+        if self.cache.hits + self.cache.misses:
+            self.metrics.gauge('cache_hit_rate', self.cache.hits / (self.cache.hits + self.cache.misses), cache='extraction')
+
+    def __plan_judgments(self, court):
+        """
+        Finds the archived judgments of `court` which need to be extracted (see `__plan`).
+        Returns the jobs to extract and the cached dictionaries of judgments which are missing from the database.
+        """
+        jobs = []
+        cached = []
+        for job, dictionary in self.__plan(court):
+            if job is not None:
+                jobs.append(job)
+            else:
+                cached.append(dictionary)
+        return jobs, cached
+
+    def __extract(self, jobs, executor=None, workers=1, total=None):
+        """
+        Extracts each of `jobs` and yields the dictionary of each judgment in order, in the pool of `workers` processes
+        `executor` if one is given or else one at a time. Progress is reported out of `total` judgments.
+        """
+        # Process the judgments one at a time
+        if executor is None:
+            for job in jobs:
+                # Report the current progress
+                self.__extracted += 1
+                self.progress.update(self.__extracted, total)
                 
-                # Instantiate list of possible offences
-                possible_offences = []
+                # Extract the judgment and report the information extracted
+                record, terms, timings, text = _extract_file(*job, self.statute_index, self.parser)
+                _print_record(record, self.progress)
                 
-                # Check if combinations has only 1 entry and sets possible_offences as combinations
-                if type(combinations[0]) == str:
-                    possible_offences = combinations
-                
-                else:
-                    # Add each possible offence from the permutations to the list of possible offences
-                    for offence in combinations:
-                        possible_offences.append(' '.join(offence))
-                    
-                # Check the database of statutes I created to find a possible offence if it exists within and adds it to the list of offences for this judgment
-                for value in possible_offences:
-                    if value in self.statutes_df['section_statute'].values:
-                        index = self.statutes_df[self.statutes_df['section_statute'] == value].index
-                        offence = self.statutes_df.iloc[index].values
-                        offence_b.append([offence[0][1], value])
-                        [self.__offences.append(x) for x in offence_b if x not in self.__offences];
-                        
-                    # If not found within the database of statutes, adds the section number and statute but list offences as "unsure"
-                    else:
-                        offence_b.append(['Not in database', value])
-                        [self.__offences.append(x) for x in offence_b if x not in self.__offences];
-            
-        # Instantiate empty lists and dictionaries
-        self.__title = []
-        self.__temp_title = []
-        self.__statute = []
-        self.__title_statute = {}
-        
-        # Iterate through self.__offences
-        for item in self.__offences:
-        # Add each offence into temp_title and statute
-            self.__temp_title.append(item[0])
-            self.__statute.append(item[1])
-            
-        # converts temp_title to a set to remove duplicates
-        self.__temp_title = set(self.__temp_title)
-        
-        # Adds each temp_title to title
-        for titles in self.__temp_title:
-            self.__title.append(str(titles))
-            
-        # Joins all the titles in title list as a full string
-        self.__title = ",".join(self.__title)
-        
-        # Joins all the statutes in statute list as a full string
-        self.__statute = ",".join(self.__statute)
+                yield self.__add_result(record.to_dict(), terms, timings, text)
         
-        # Returns title and statute as a dictionary
-        self.__title_statute = {'possible_titles': self.__title, 'possible_statutes': self.__statute}
-        return self.__title_statute
-     
-    def __get_citations(self):
+        # Or fan the judgments out to worker processes, which return the dictionaries in index order
+        elif jobs:
+            chunksize = max(1, len(jobs) // (workers * 4))
+            for dictionary, terms, timings, text in executor.map(_extract_in_worker, jobs, chunksize=chunksize):
+                yield self.__add_result(dictionary, terms, timings, text)
+                
+                # Report the current progress
+                self.__extracted += 1
+                self.progress.update(self.__extracted, total)
+
+    def __pool(self, workers):
         """
-        Searches the document text for case citations which are in the format of `____ v ____`.
+        Returns a pool of `workers` processes which are set up to extract judgments, or None for a single worker.
         """
-        # Replaces weird characters from html and return text
-        self.__judgment_text = self.__search_results.text.replace('\xa0','')
-        
-        # Searches through text for patterns of Capitalized words with name terms which are followed by v and further capitalized words with name terms as these suggest that it is a case name
-        self.__case_search = re.findall('(([A-Z][a-z]*)(([A-Z][a-z]*)|(a\/l|a\/p|d\/o|s\/o| |bte|bin|and|another|anr|binti|de|the|for|other|matters))* v (([A-Z][a-z]*)|(a\/l|a\/p|d\/o|s\/o| |bte|bin|and|another|anr|binti|de|the|for|other|matters))*(?=|))', self.__judgment_text)
+        if workers <= 1:
+            return None
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self.statute_index, self.parser))
+
+    def __process_judgments(self, court, workers=1):
+        """
+        Loads each new or changed html judgment and performs the NLP steps to extract the key information.
+        With more than one worker, the judgments are processed in a pool of `workers` processes.
+        """
+        from extractors import COLUMNS
+        import pandas as pd
+
+        # Find the judgments to extract, and start with the cached dictionaries of the judgments missing from the database
+        jobs, self.dictionaries_list = self.__plan_judgments(court)
         
-        # Instantiate an empty list
-        self.__cases = []
+        # Add the dictionary for each judgment into the list of dictionaries
+        executor = self.__pool(workers)
+        try:
+            self.dictionaries_list.extend(self.__extract(jobs, executor, workers, len(jobs)))
+        finally:
+            if executor is not None:
+                executor.shutdown()
         
-        # Iterate through the results to append the case name into a list, excluding duplicates
-        for item in self.__case_search:
-            case = []
-            temp_case = re.search('(([A-Z][a-z]*)(([A-Z][a-z]*)|(a\/l|a\/p|d\/o|s\/o| |bte|bin|and|another|anr|binti|de|the|for|other|matters))* v (([A-Z][a-z]*)|(a\/l|a\/p|d\/o|s\/o| |bte|bin|and|another|anr|binti|de|the|for|other|matters))*(?=|))', str(item)).group(0).replace("In ","").strip()
+        # Check if there are any new entries
+        if self.dictionaries_list:
+            # Create a Dataframe out of the list of dictionaries
+            self.database = pd.DataFrame(self.dictionaries_list, columns=COLUMNS)
             
-            # Try removing a few wrong words which are captured
-            try:
-                temp_case = temp_case.replace('Antecedents','').replace('Untraced','').strip()
-            except:
-                pass
-            # Append temp_case to the list of cases
-            case.append(temp_case)
+            # Report current progress
+            self.progress.message(f'Current progress: DataFrame created ({len(jobs)} extracted, {self.cache.hits} unchanged).')
             
-            # Append to self.__cases if not a duplicate
-            [self.__cases.append(x) for x in case if x not in self.__cases];
+            # Replace the rows of the judgments which were extracted again and append the new ones
+            replaced = self.database_df['link'].isin(self.database['link'])
+            self.database_df = pd.concat([self.database_df[~replaced], self.database], ignore_index=True)
             
-        # Remove this judgment's name from the list as it cannot be its own citation
-        self.__cases.remove(self.__temp_case_name)
-        
-        # Change the list to a string
-        self.__cases = ",".join(self.__cases)
-        
-        # Returns the citations as a dictionary
-        self.__citations = {'citations': self.__cases}
-        return self.__citations
+            # Add the new and re-extracted rows to the search index if it was built
+            if self.__search_index is not None:
+                self.__search_index.update(self.database)
+            
+            # Build the statistics again when they are next used
+            self.__analytics = None
             
-    def __get_miscellaneous(self):
+        # Print 'No new entries' if there are no new entries.
+        else:
+            self.database = pd.DataFrame()
+            self.progress.message('No new entries')
+
+    def __stream_judgments(self, court, workers=1, batch_size=1000):
         """
-        Searches the document text to identify if mitigating factors were discussed, and if aggravating factors were discussed
+        Streams the judgments of `court` from planning through extraction to the store in batches of `batch_size`,
+        so that only one batch of extracted judgments is held in memory however many judgments are processed.
+        Each batch is upserted into the database store by link. The whole database is read back from the store once at the end,
+        for the export.
         """
-        # Searches the judgment text to see if mitigation or mitigating is mentioned and returns 1 for yes, 0 for no
-        if re.search(r'[mM]itigation|[mM]itigating',self.__judgment_text):
-            self.__mitigation_discussed = 1
-        else:
-            self.__mitigation_discussed = 0
+        from extractors import COLUMNS
+        import pandas as pd
+
+        # Report the progress of extraction out of the court's judgments, as the number to extract is not known in advance
+        total = len(getattr(self, f'{court}court_df')) if court in ('supreme', 'subordinate') else None
+        
+        # Keep no dataframe of the new rows, which are only in the store and the temporary .csv file
+        self.database = None
+        
+        batch = []
+        jobs = []
+        written = 0
+        executor = self.__pool(workers)
+        try:
+            for job, dictionary in self.__plan(court):
+                # Collect the cached dictionaries, and the jobs to extract in batches
+                if job is None:
+                    batch.append(dictionary)
+                else:
+                    jobs.append(job)
+                if len(jobs) == batch_size:
+                    batch.extend(self.__extract(jobs, executor, workers, total))
+                    jobs = []
+                
+                # Write each full batch to the store
+                if len(batch) >= batch_size:
+                    self.__export_batch(pd.DataFrame(batch, columns=COLUMNS), first=not written, compact=False)
+                    written += len(batch)
+                    batch = []
             
-        # Searches the judgment text to see if aggravating or aggravated is mentioned and returns 1 for yes, 0 for no
-        if re.search(r'[aA]ggravating|[aA]ggravated',self.__judgment_text):
-            self.__aggravated_discussed = 1
+            # Extract and write the last batch
+            batch.extend(self.__extract(jobs, executor, workers, total))
+            if batch or not written:
+                self.__export_batch(pd.DataFrame(batch, columns=COLUMNS), first=not written, compact=False)
+                written += len(batch)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        
+        # Merge the segments of the full-text index once, rather than every few batches
+        if len(self.fulltext.segments) > self.fulltext.max_segments:
+            self.fulltext.compact()
+        
+        if written:
+            # Read the updated database back from the store, and build the search index and statistics again when they are next used
+            self.database_df = self.store.read(flat=True).reindex(columns=COLUMNS)
+            self.__search_index = None
+            self.__analytics = None
+            
+            # Report current progress
+            self.progress.message(f'Current progress: {written} rows written in batches of {batch_size} ({self.__extracted} extracted, {self.cache.hits} unchanged).')
         else:
-            self.__aggravated_discussed = 0   
+            self.progress.message('No new entries')
             
-        # Returns the results as a dictionary
-        self.__miscellaneous = {'mitigation_discussed': self.__mitigation_discussed, 'aggravation_discussed': self.__aggravated_discussed}
-        return self.__miscellaneous
-        
+    def __add_result(self, dictionary, terms, timings, text):
+        """
+        Caches the extracted dictionary of a judgment under the hash of its html, without its court tag and link,
+        keeps the term counts of its text for the full-text index and its text for the citation resolver,
+        and adds the metrics of its extraction (`timings`).
+        """
+        digest = self.__digests.pop(dictionary['link'])
+        record = {key: value for key, value in dictionary.items() if key not in ('court_tag', 'link')}
+        self.cache.put(digest, record)
+        self.__documents.append((dictionary['link'], digest, terms))
+        self.__citing_texts.append((dictionary['link'], text))
         
-    def __process_judgments(self, court):
+        # Add the metrics of the judgment, and log the time of each of its steps as an event
+        self.metrics.merge(timings)
+        self.metrics.event('judgment', link=dictionary['link'], seconds=_step_seconds(timings))
+        return dictionary
+
+    def __export_batch(self, database, first=True, compact=True):
         """
-        Loads each new html judgment and performs the NLP steps to extract the key information.
+        Exports the new rows `database` to a .csv file (replacing it if `first` is set, or else appending to it),
+        appends them to the database store, and adds the text of the extracted judgments to the full-text index,
+        whose segments are merged when there are too many of them only if `compact` is set.
         """
-        # Instantiate a list for the dictionary outputs of the above functions
-        self.dictionaries_list = []
+        # Save the temporary database to a .csv file
+        database.to_csv(path_or_buf=f'../data/database_temp.csv', index=False, mode='w' if first else 'a', header=first)
         
-        # Set a default start value
-        self.__start = 0
+        # Append the new and re-extracted rows to the database store
+        self.store.append(database)
         
-        # Check which court is being processed, and find the number of new rows to set the start and end indices
-        if court == 'supreme':
-            self.__start = self.__supremecourt_rows - self.__new_supremecourt_rows
-            self.__end = self.__supremecourt_rows
-        elif court == 'subordinate':
-            self.__start = self.__subordinatecourt_rows - self.__new_subordinatecourt_rows
-            self.__end = self.__subordinatecourt_rows
-            
-        # Raise an error if an invalid court is set
-        else:
-            raise CourtNameError("There is only the Subordinate (State) or Supreme Court!")
-            
-        # Load the dataset based on which court is given
-        self.dataset = pd.read_csv(f'../data/{court}court_compiled.csv')
+        # Add the text of the extracted judgments to the full-text index
+        self.fulltext.add(self.__documents, compact=compact)
+        self.__documents = []
         
-        # Check if there are any new entries
-        if self.__start < self.__end:
-            # Create index range for new entries and iterate through the range of indices
-            for index in range(self.__start, self.__end):               
-                # Set the case_link to be the link for the current index
-                self.__case_link = self.dataset.loc[index]['link']
-                
-                # Print the current progress
-                print(f'Current progress: {index+1}/{self.__end}.')
-                
-                # Load the judgment html for the current index and parse it in BeautifulSoup
-                load_judgment = codecs.open(f'../judgments/{court}_court/{court}court_{index}.html', 'r', 'utf-8')
-                print('Judgment loaded')
-                self.document = BeautifulSoup(load_judgment.read())
-                print('BeautifulSoup initialized')
-                
-                # Create __search_results which are the contents of the html
-                self.__search_results = self.document.find('div', {'class': 'contentsOfFile'})
-                print('Judgment text identified')
-                
-                # Call the functions above to extract the information required
-                self.__get_case_name()    
-                print(f'Case name extracted: {self.__case_name}')
-                self.__get_court()
-                print(f'Court extracted: {self.__court}')
-                self.__get_date()       
-                print(f'Decision date extracted: {self.__decision_date}')
-                self.__get_statute()   
-                print(f'Statutes extracted*: {self.__title_statute}')
-                self.__get_citations()      
-                print(f'Citations extracted*: {self.__citations}')
-                self.__get_miscellaneous()
-                print(f'Miscellaneous extracted*: {self.__miscellaneous}')
-                
-                # Add a court_tag column which specifies whether it is subordinate or supreme court (for the identification of new entries)
-                self.__court_column = {'court_tag': court}
-                print('tag set')
-                
-                # Add the case url
-                self.__add_link = {'link': self.__case_link}
-                print('case link set')
-                
-                # Create and merge a dictionary which merges all the information extracted for each judgment
-                self.__dictionaries_merged = self.__case_name.copy()
-                self.__dictionaries_merged.update(self.__court)
-                self.__dictionaries_merged.update(self.__decision_date)
-                self.__dictionaries_merged.update(self.__title_statute)
-                self.__dictionaries_merged.update(self.__citations)
-                self.__dictionaries_merged.update(self.__miscellaneous)
-                self.__dictionaries_merged.update(self.__court_column) 
-                self.__dictionaries_merged.update(self.__add_link)
-                
-                # Add the dictionary for each judgment into a list of dictionaries
-                self.dictionaries_list.append(self.__dictionaries_merged)
+        # Resolve the cases cited in the text of the extracted judgments
+        self.__resolve_citations(database)
 
-                # Clear cell output
-                clear_output(wait=True)
-            
-            # Create a Dataframe out of the list of dictionaries
-            self.database = pd.DataFrame(self.dictionaries_list)
-            
-            # Print current progress
-            print(f'Current progress: DataFrame created.')
-            
-            # Merge the Dataframe into the full database
-            self.database_df = self.database_df.merge(self.database, how='outer')
-            self.database_df.reset_index(drop=True)
-            
-        # Print 'No new entries' if there are no new entries.
-        else:
-            self.database = pd.DataFrame()
-            print('No new entries')
+    def __resolve_citations(self, database):
+        """
+        Adds the case names of the new rows `database` to the citation resolver, and then resolves the judgments cited
+        in the text of each judgment extracted since the last batch, so that judgments of the same batch can cite each other.
+        """
+        # Skip if there is nothing new to resolve
+        if database.empty and not self.__citing_texts:
+            return
+        
+        with self.metrics.timer('resolve_citations'):
+            # Add the case names once for the batch, so that the automaton is built once before the texts are scanned
+            if not database.empty:
+                self.citation_resolver.add(database['link'].tolist(), database['case_name'].tolist())
             
+            # Resolve the links of the judgments cited by each judgment, without the judgment itself
+            ambiguous = self.citation_resolver.ambiguous
+            for link, text in self.__citing_texts:
+                self.cited_links[link] = self.citation_resolver.resolve(text, exclude=link)
+                self.metrics.count('citations_resolved', len(self.cited_links[link]))
+            self.metrics.count('citations_ambiguous', self.citation_resolver.ambiguous - ambiguous)
+            self.__citing_texts = []
 
     def __export_database(self):
         """
-        Exports dataframes to the respective .csv files
+        Exports the full database: the citation edge table, the table of resolved citations, the database.csv file if set,
+        and the serving snapshot.
         """
-        # Save the temporary database and updated full database to .csv files
-        self.database.to_csv(path_or_buf=f'../data/database_temp.csv', index=False)
-        self.database_df.to_csv(path_or_buf=f'../data/database.csv', index=False)
+        from citations import citation_edges
+        from snapshot import publish_snapshot
+        import pandas as pd
+
+        # Save the citation edge table, with the link of each citing judgment, from the graph of the search index if it was built
+        # or else from the citations column alone, as the edges do not need the rest of the index
+        if self.__search_index is not None:
+            edges = self.citation_graph.edges()
+            edges['citing'] = self.__search_index.database['link'].to_numpy()[edges['citing']]
+        else:
+            edges = citation_edges(self.database_df['citations'])
+            edges['citing'] = self.database_df['link'].to_numpy()[edges['citing']]
+        edges.to_parquet('../data/citation_edges.parquet', index=False)
+        
+        # Save the links of the judgments cited by each judgment, in the order they are cited
+        pd.DataFrame([(citing, cited) for citing, links in self.cited_links.items() for cited in links],
+                     columns=['citing', 'cited']).to_parquet('../data/citation_links.parquet', index=False)
+        
+        # Save the updated full database to a .csv file if set
+        if self.export_csv:
+            self.database_df.to_csv(path_or_buf=f'../data/database.csv', index=False)
+        
+        # Publish the updated database as the serving snapshot for the web app
+        publish_snapshot(self.database_df)
 
-    def create_database(self,court):
+    def create_database(self, court, workers=1, batch_size=None):
         """
-        Call command to pull urls and export to csv database
+        Call command to pull urls and export to csv database.
+        `workers` sets the number of processes used to process the judgments.
+        If `batch_size` is set, the judgments are streamed to the store in batches of that many rows (see `__stream_judgments`),
+        so that the extracted judgments of a large backlog are not all held in memory at once. The final export still reads
+        the whole database back once to write the citation tables and the serving snapshot, so its memory grows with the database.
         """
-        # Call the functions to create / update the database
-        self.__get_num_rows()
-        self.__process_judgments(court)
-        self.__export_database()
-        
-        # Update the log file for the latest database update date
-        self.file = open('../logs/database_log.txt', 'a', encoding='utf_8')
-        self.file.write(f'database last updated on: {datetime.today()}; \n')
+        # Call the functions to create / update the database, timing each stage
+        if batch_size:
+            with self.metrics.timer('stage', stage='stream'):
+                self.__stream_judgments(court, workers, batch_size)
+        else:
+            with self.metrics.timer('stage', stage='process'):
+                self.__process_judgments(court, workers)
+            with self.metrics.timer('stage', stage='export_batch'):
+                self.__export_batch(self.database)
+        with self.metrics.timer('stage', stage='export'):
+            self.__export_database()
         
-        # Print current progress
-        print(f'Current progress: Completed judgment processing and export.')
+        # Close the maps of the packs which the judgments were read from
+        close_maps()
         
+        # Update the log file for the latest database update date
+        with open('../logs/database_log.txt', 'a', encoding='utf_8') as file:
+            file.write(f'database last updated on: {datetime.today()}; \n')
+        
+        # Write the metrics of the update
+        self.metrics.count('judgments_extracted', self.__extracted)
+        self.metrics.write(command='build-db', court=court, workers=workers)
+        
+        # Report current progress
+        self.progress.message(f'Current progress: Completed judgment processing and export.')
+        
+def _extract_file(court, link, location, statute_index, parser):
+    """
+    Loads the html judgment at `location` (see judgmentarchive.py) and extracts it into a JudgmentRecord.
+    Returns the record, the term counts of the judgment's text, the snapshot of the metrics of its extraction and its text.
+    """
+    from extractors import extract_judgment, JudgmentSource
+    from fulltext import term_counts
+
+    metrics = Metrics(path=None)
+    with metrics.timer('read'):
+        html = read_judgment(location)
+    with metrics.timer('parse', parser=parser):
+        source = JudgmentSource.from_html(html, parser)
+    record = extract_judgment(source, statute_index, court_tag=court, link=link, metrics=metrics)
+    with metrics.timer('term_counts'):
+        terms = term_counts(source.text)
+    return record, terms, metrics.snapshot(), source.text
+
+def _judgment_terms(location, parser):
+    """
+    Loads the html judgment at `location` and returns the term counts of its text, for the full-text index.
+    """
+    from extractors import JudgmentSource
+    from fulltext import term_counts
+
+    return term_counts(JudgmentSource.from_html(read_judgment(location), parser).text)
+
+def _load_cited_links(path='../data/citation_links.parquet'):
+    """
+    Loads the table of resolved citations at `path` as a dictionary of each citing link to the links it cites, in order.
+    """
+    import pandas as pd
+
+    cited_links = {}
+    if os.path.exists(path):
+        table = pd.read_parquet(path)
+        for citing, cited in zip(table['citing'].tolist(), table['cited'].tolist()):
+            cited_links.setdefault(citing, []).append(cited)
+    return cited_links
+
+def _step_seconds(timings):
+    """
+    Returns the seconds of each step in the snapshot of the metrics of one extraction, by the step or extractor name.
+    """
+    return {dict(labels).get('extractor', name): total for (name, labels), (count, total, longest) in timings[1]}
+
+def _print_record(record, progress):
+    """
+    Reports the information extracted into `record` to `progress`.
+    """
+    progress.message(f'Case name extracted: {record.case_name}')
+    progress.message(f'Court extracted: {record.court}')
+    progress.message(f'Decision date extracted: {record.decision_date}')
+    progress.message(f'Statutes extracted*: {record.possible_titles} / {record.possible_statutes}')
+    progress.message(f'Citations extracted*: {record.citations}')
+    progress.message(f'Miscellaneous extracted*: {record.mitigation_discussed} / {record.aggravation_discussed}')
+
+# Keep the statute index and parser of each worker process
+_worker_settings = None
+
+def _init_worker(statute_index, parser):
+    """
+    Initializes a worker process with the statute index and parser, without loading the other datasets.
+    """
+    global _worker_settings
+    _worker_settings = (statute_index, parser)
+
+def _extract_in_worker(job):
+    """
+    Extracts the judgment of `job` in a worker process. Returns its dictionary, the term counts of its text,
+    the snapshot of the metrics of its extraction and its text.
+    """
+    record, terms, timings, text = _extract_file(*job, *_worker_settings)
+    return record.to_dict(), terms, timings, text
+
 # Create a class for exceptions
 class CourtNameError(Exception):
     pass
@@ -0,0 +1,446 @@
+# Import the required packages/modules
+
+from bs4 import BeautifulSoup, SoupStrainer
+from contextlib import nullcontext
+from lxml import etree
+import io
+import itertools
+import re
+
+# Set the patterns for the extraction rules
+# Capitalized words with name terms which are followed by v and further capitalized words with name terms suggest that it is a case name
+CASE_NAME_PATTERN = r'(?:[A-Z][a-z]*)(?:[A-Z][a-z]*|a/l|a/p|d/o|s/o| |bte|bin|and|another|anr|binti|de|the|for|other|matters)* v (?:[A-Z][a-z]*|a/l|a/p|d/o|s/o| |bte|bin|and|another|anr|binti|de|the|for|other|matters)*'
+
+# "Section(s)" or "s(s)" (abbreviated sections) with digits
+SECTION_PATTERN = r'[Ss](?:ection|)(?:s|) (?P<section_num>\d+)'
+
+# Patterns which end in Act or Code as these refer to statutes
+STATUTE_PATTERN = r'(?:[A-Z][a-z]*|Corruption, Drug Trafficking and Other Serious Crimes \(Confiscation of Benefits\)|and|of| ){2,}(?:Act|Code)'
+
+# Mentions of mitigation and aggravation
+MITIGATION_PATTERN = r'[mM]itigati(?:on|ng)'
+AGGRAVATION_PATTERN = r'[aA]ggravat(?:ing|ed)'
+
+# Compile the patterns once for the whole module
+CASE_NAME_RE = re.compile(CASE_NAME_PATTERN)
+SECTION_RE = re.compile(SECTION_PATTERN)
+STATUTE_RE = re.compile(STATUTE_PATTERN)
+COURT_RE = re.compile(r'Tribunal/Court : (\w* )*(?=Coram)')
+DATE_RE = re.compile(r'Decision Date : (\w* )*(?=Tribunal)')
+MITIGATION_RE = re.compile(MITIGATION_PATTERN)
+AGGRAVATION_RE = re.compile(AGGRAVATION_PATTERN)
+
+# Sections, statutes, case names and mentions of mitigation and aggravation only contain letters, spaces and the characters below,
+# so every match lies within a run of these characters. The scanner walks the text once by these runs and only searches the runs
+# which contain the trigger of a pattern, e.g. " v " for case names or "Act" and "Code" for statutes.
+RUN_RE = re.compile(r'[A-Za-z ,()/]+')
+
+# A run which ends with "Section(s)" or "s(s)" and is followed by digits is a section
+SECTION_TAIL_RE = re.compile(r' [Ss](?:ection|)(?:s|) \Z')
+DIGITS_RE = re.compile(r'\d+')
+
+# Set the parsers which can be used to read the html of a judgment
+PARSERS = ('soup', 'strainer', 'lxml')
+
+# Match the class of the judgment's contents while the html is strained, before class attributes are split into lists
+CONTENTS_CLASS_RE = re.compile(r'(?:^|\s)contentsOfFile(?:\s|$)')
+
+# Set the html elements whose text BeautifulSoup leaves out of `.text`, which the lxml parser leaves out too
+IGNORED_TAGS = ('script', 'style', 'template', 'rt', 'rp')
+
+# Set the version of each extractor. Bump the version of an extractor when its rules change,
+# so that judgments extracted with the previous rules are extracted again.
+EXTRACTOR_VERSIONS = {'case_name': 1, 'court': 1, 'date': 1, 'statute': 1, 'citations': 1, 'miscellaneous': 1}
+EXTRACTOR_VERSION = ','.join(f'{name}={version}' for name, version in sorted(EXTRACTOR_VERSIONS.items()))
+
+# Set the columns of the database in order
+COLUMNS = ['case_name', 'tribunal/court', 'decision_date', 'possible_titles', 'possible_statutes', 'citations',
+           'mitigation_discussed', 'aggravation_discussed', 'court_tag', 'link']
+
+# Create a class for the parts of a judgment which the extractors need
+class JudgmentSource:
+
+    __slots__ = ('title', 'info', 'header', 'text', '_scan')
+
+    def __init__(self, title, info, header, text):
+        """
+        Creates the source of a judgment from its `title` (the h2 heading), `info` (the text of the info table),
+        `header` (the text of each span in the first txt-body paragraph, or None) and `text` (the whole judgment text).
+        """
+        self.title = title
+        self.info = info
+        self.header = header
+        self.text = text
+        self._scan = None
+
+    @property
+    def scan(self):
+        """
+        The TextScan of the judgment text, which is scanned once on first use.
+        """
+        if self._scan is None:
+            self._scan = scan_judgment(self.text)
+        return self._scan
+
+    @classmethod
+    def from_html(cls, html, parser='lxml'):
+        """
+        Parses the html of a judgment from Lawnet into its source. `parser` is one of:
+        "soup" to build a full BeautifulSoup tree, "strainer" to build a BeautifulSoup tree of only the judgment's contents,
+        or "lxml" to stream the html through lxml and stop as soon as the judgment's contents have been read.
+        """
+        if parser == 'lxml':
+            return cls.__from_lxml(html)
+
+        # Find the contents of the judgment in the html, keeping only the contents when the strainer is used
+        parse_only = SoupStrainer('div', {'class': CONTENTS_CLASS_RE}) if parser == 'strainer' else None
+        search_results = BeautifulSoup(html, 'lxml', parse_only=parse_only).find('div', {'class': 'contentsOfFile'})
+
+        # Pick out the header spans if the judgment has a header
+        header = search_results.find('p', {'class': 'txt-body'})
+        if header is not None:
+            header = [span.text for span in header.find_all('span')]
+
+        return cls(search_results.find('h2').text,
+                   search_results.find('table', {'id': 'info-table'}).text,
+                   header,
+                   search_results.text)
+
+    @classmethod
+    def __from_lxml(cls, html):
+        """
+        Streams the html of a judgment through lxml's iterparse and reads the source from the judgment's contents.
+        """
+        # Encode the html for the parser
+        if isinstance(html, str):
+            html = html.encode('utf-8')
+
+        # Iterate through the elements until the end of the judgment's contents
+        search_results = None
+        for event, element in etree.iterparse(io.BytesIO(html), events=('start', 'end'), html=True, encoding='utf-8'):
+            if search_results is None:
+                if event == 'start' and element.tag == 'div' and 'contentsOfFile' in (element.get('class') or '').split():
+                    search_results = element
+                elif event == 'end':
+                    # Free the elements before the judgment's contents as soon as they are parsed
+                    element.clear(keep_tail=True)
+            elif event == 'end' and element is search_results:
+                break
+
+        # Raise the same error as BeautifulSoup would if the judgment has no contents
+        if search_results is None:
+            raise AttributeError("'NoneType' object has no attribute 'find'")
+
+        # Remove comments and the elements whose text is not part of the judgment text
+        for element in list(search_results.iter(etree.Comment, etree.ProcessingInstruction, *IGNORED_TAGS)):
+            _drop_element(element)
+
+        # Pick out the header spans if the judgment has a header
+        header = search_results.xpath(".//p[contains(concat(' ', normalize-space(@class), ' '), ' txt-body ')]")
+        if header:
+            header = [span.xpath('string()') for span in header[0].iter('span')]
+        else:
+            header = None
+
+        return cls(search_results.find('.//h2').xpath('string()'),
+                   search_results.find(".//table[@id='info-table']").xpath('string()'),
+                   header,
+                   search_results.xpath('string()'))
+
+def _drop_element(element):
+    """
+    Removes `element` and its text from the lxml tree, keeping the text which follows it.
+    """
+    parent = element.getparent()
+    if element.tail:
+        previous = element.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or '') + element.tail
+        else:
+            parent.text = (parent.text or '') + element.tail
+    parent.remove(element)
+
+# Create a class for the information extracted from a judgment
+class JudgmentRecord:
+
+    __slots__ = ('case_name', 'court', 'decision_date', 'possible_titles', 'possible_statutes', 'citations',
+                 'mitigation_discussed', 'aggravation_discussed', 'court_tag', 'link')
+
+    def __init__(self, **fields):
+        """
+        Creates a record with the given fields. Fields which are not given are set to None.
+        """
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def to_dict(self):
+        """
+        Returns the record as a dictionary with a key for each column of the database.
+        """
+        return dict(zip(COLUMNS, (getattr(self, name) for name in self.__slots__)))
+
+    def __repr__(self):
+        return f'JudgmentRecord({self.case_name!r})'
+
+# Create a class for the matches found in the text of a judgment
+class TextScan:
+
+    __slots__ = ('sections', 'statutes', 'cases', 'mitigation', 'aggravation', 'matches')
+
+    def __init__(self):
+        """
+        Creates an empty scan. `sections`, `statutes` and `cases` are lists of the matches in order,
+        `mitigation` and `aggravation` are 1 if they are mentioned and 0 if not, and `matches` counts the matches of each kind.
+        """
+        self.sections = []
+        self.statutes = []
+        self.cases = []
+        self.mitigation = 0
+        self.aggravation = 0
+        self.matches = dict.fromkeys(('section', 'statute', 'case', 'mitigation', 'aggravation'), 0)
+
+def scan_text(text):
+    """
+    Walks `text` once and yields a (kind, value) pair for each match, where the kind is "section", "statute",
+    "case", "mitigation" or "aggravation". Sections are given as their section number.
+    """
+    for run in RUN_RE.finditer(text):
+        value = run.group(0)
+
+        # Search the run for statutes and case names if it has their triggers
+        if 'Act' in value or 'Code' in value:
+            for match in STATUTE_RE.finditer(value):
+                yield 'statute', match.group(0)
+        if ' v ' in value:
+            for match in CASE_NAME_RE.finditer(value):
+                yield 'case', match.group(0)
+
+        # Search the run for mentions of mitigation and aggravation
+        for kind, trigger, pattern in (('mitigation', 'itigati', MITIGATION_RE), ('aggravation', 'ggravat', AGGRAVATION_RE)):
+            if trigger in value:
+                for match in pattern.finditer(value):
+                    yield kind, match.group(0)
+
+        # Check if the run ends in a section followed by its number
+        if value[-1] == ' ' and SECTION_TAIL_RE.search(value):
+            number = DIGITS_RE.match(text, run.end())
+            if number:
+                yield 'section', number.group(0)
+
+def scan_judgment(text):
+    """
+    Scans the text of a judgment once for its sections, statutes, case citations and mentions of mitigation and aggravation.
+    Returns the matches as a TextScan.
+    """
+    # Replace weird characters from html
+    text = text.replace('\xa0', ' ')
+
+    # Sort each match into the scan
+    scan = TextScan()
+    for kind, value in scan_text(text):
+        scan.matches[kind] += 1
+        if kind == 'section':
+            scan.sections.append(value)
+        elif kind == 'statute':
+            scan.statutes.append(value.strip())
+        elif kind == 'case':
+            scan.cases.append(value.strip())
+        elif kind == 'mitigation':
+            scan.mitigation = 1
+        else:
+            scan.aggravation = 1
+
+    return scan
+
+def get_case_name(source):
+    """
+    Takes out the case name from the judgment. Returns the full case name and the case name without its citation.
+    """
+    # Search for the case name in the judgment
+    case_name = source.title.strip()
+
+    # Take the case name without the case citation notation
+    short_name = CASE_NAME_RE.search(case_name).group(0).strip()
+    return case_name, short_name
+
+def get_court(source):
+    """
+    Takes out the court name from the judgment
+    """
+    # Picks out the court info in the info table as string and split it to the key and value
+    temp_court = COURT_RE.search(source.info).group(0).strip()
+    return temp_court.split(" : ")[1]
+
+def get_date(source):
+    """
+    Takes out the decision date from the judgment
+    """
+    # Picks out the decision date in the info table as string and split it to the key and value
+    temp_date = DATE_RE.search(source.info).group(0).strip()
+    return temp_date.split(" : ")[1]
+
+# Create a class for the hash index of the database of statutes
+class StatuteIndex:
+
+    __slots__ = ('titles',)
+
+    def __init__(self, statutes_df):
+        """
+        Creates the index of offence titles by `section_statute` from the database of statutes `statutes_df`.
+        """
+        # Map each section and statute to the title of its first row, as a scan of the database would find
+        self.titles = {}
+        for section_statute, title in zip(statutes_df['section_statute'], statutes_df['title']):
+            self.titles.setdefault(section_statute, title)
+
+    def __contains__(self, section_statute):
+        return section_statute in self.titles
+
+    def lookup(self, section_statute):
+        """
+        Returns the offence title of `section_statute`, or "Not in database" if it is not in the database.
+        """
+        return self.titles.get(section_statute, 'Not in database')
+
+    def lookup_many(self, section_statutes):
+        """
+        Looks up each of `section_statutes`. Returns a list of [offence title, section_statute] pairs,
+        where the title is "Not in database" if the section and statute is not in the database.
+        """
+        titles = self.titles
+        return [[titles.get(section_statute, 'Not in database'), section_statute] for section_statute in section_statutes]
+
+def get_statute(source, statutes):
+    """
+    Identifies criminal offences and statutes mentioned in the judgment based on its header as a first choice, and text as a second choice.
+    `statutes` is the StatuteIndex of the database of statutes.
+    Returns the possible titles and possible statutes as comma-joined strings.
+    """
+    # Create an empty list of section and statutes
+    section_statutes = []
+
+    # First try to identify the crimes based on the header of the judgment.
+    for span in source.header or []:
+        # Search for sections and statutes in the span. First replace weird text.
+        text = span.replace('\xa0', ' ')
+        section = SECTION_RE.search(text)
+        statute = STATUTE_RE.search(text)
+
+        # Skip the span unless it has both a section and a statute
+        if section is None or statute is None:
+            continue
+
+        # Combine section numbers and statute
+        section_statutes.append(section.group('section_num') + " " + statute.group(0).strip())
+
+    offences = statutes.lookup_many(section_statutes)
+
+    # If the judgment header does not contain the section and statute, identify it through the text
+    if len(offences) == 0:
+        # Take the section numbers (without duplicates) and statutes found in the text
+        sections_found = list(dict.fromkeys(source.scan.sections))
+        statutes_found = source.scan.statutes
+
+        if statutes_found != []:
+            # Permutate through the sections and statutes to find all possible combinations of the two
+            if sections_found != []:
+                possible_offences = [' '.join(offence) for offence in itertools.product(sections_found, dict.fromkeys(statutes_found))]
+
+            # Use the statutes alone if no sections were found
+            else:
+                possible_offences = statutes_found
+
+            # Add the possible offences, excluding duplicates
+            offences = [list(offence) for offence in dict.fromkeys(map(tuple, statutes.lookup_many(possible_offences)))]
+
+    # Join the titles without duplicates, and all the statutes as full strings
+    titles = ",".join(dict.fromkeys(str(offence[0]) for offence in offences))
+    statutes = ",".join(offence[1] for offence in offences)
+    return titles, statutes
+
+def get_citations(source, short_name):
+    """
+    Searches the document text for case citations which are in the format of `____ v ____`.
+    Returns the citations as a comma-joined string, without the judgment's own case name `short_name`.
+    """
+    # Iterate through the case names found in the text to collect them in order, excluding duplicates
+    cases = {}
+    for item in source.scan.cases:
+        # Remove a few wrong words which are captured
+        temp_case = item.replace("In ", "").strip()
+        temp_case = temp_case.replace('Antecedents', '').replace('Untraced', '').strip()
+        cases[temp_case] = None
+
+    # Remove this judgment's name from the list as it cannot be its own citation
+    cases.pop(short_name, None)
+
+    # Change the list to a string
+    return ",".join(cases)
+
+def get_miscellaneous(source):
+    """
+    Searches the document text to identify if mitigating factors were discussed, and if aggravating factors were discussed.
+    Returns 1 for yes and 0 for no for each.
+    """
+    # Take whether mitigation or mitigating, and aggravating or aggravated, were found in the text
+    return source.scan.mitigation, source.scan.aggravation
+
+def extract_judgment(judgment, statutes, court_tag=None, link=None, parser='lxml', metrics=None):
+    """
+    Performs the NLP steps on a judgment to extract the key information. `judgment` is the html of the judgment
+    or its JudgmentSource, and `statutes` is the StatuteIndex (or dataframe) of the database of statutes.
+    `parser` sets how the html is parsed (see JudgmentSource.from_html). Returns the information as a JudgmentRecord.
+    If `metrics` (see metrics.py) are given, the time of each extractor and the number of matches of each pattern are recorded.
+    """
+    # Time each step only if metrics are given
+    timer = metrics.timer if metrics is not None else _untimed
+
+    # Parse the judgment if its html is given
+    if not isinstance(judgment, JudgmentSource):
+        with timer('parse', parser=parser):
+            judgment = JudgmentSource.from_html(judgment, parser)
+    source = judgment
+
+    # Index the database of statutes if a dataframe is given
+    if not isinstance(statutes, StatuteIndex):
+        statutes = StatuteIndex(statutes)
+
+    # Scan the text once for the extractors which share the scan, so that it is timed on its own
+    with timer('extractor', extractor='scan'):
+        scan = source.scan
+
+    # Call the extractors to extract the information required
+    with timer('extractor', extractor='case_name'):
+        case_name, short_name = get_case_name(source)
+    with timer('extractor', extractor='statute'):
+        possible_titles, possible_statutes = get_statute(source, statutes)
+    with timer('extractor', extractor='miscellaneous'):
+        mitigation_discussed, aggravation_discussed = get_miscellaneous(source)
+    with timer('extractor', extractor='court'):
+        court = get_court(source)
+    with timer('extractor', extractor='date'):
+        decision_date = get_date(source)
+    with timer('extractor', extractor='citations'):
+        citations = get_citations(source, short_name)
+
+    # Count the matches of each pattern in the text
+    if metrics is not None:
+        for kind, matches in scan.matches.items():
+            metrics.count('regex_matches', matches, pattern=kind)
+
+    return JudgmentRecord(case_name=case_name,
+                          court=court,
+                          decision_date=decision_date,
+                          possible_titles=possible_titles,
+                          possible_statutes=possible_statutes,
+                          citations=citations,
+                          mitigation_discussed=mitigation_discussed,
+                          aggravation_discussed=aggravation_discussed,
+                          court_tag=court_tag,
+                          link=link)
+
+def _untimed(name, **labels):
+    """
+    Returns a context which times nothing, in place of a timer of the metrics.
+    """
+    return nullcontext()
@@ -0,0 +1,177 @@
+# Import the required packages/modules
+
+from concurrent.futures import ThreadPoolExecutor
+from metrics import Metrics
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+import threading
+import time
+import requests
+
+# Set the default limit on the request rate to each host, so that concurrent workers stay polite to Lawnet
+DEFAULT_REQUESTS_PER_SECOND = 2
+
+# Set the server-side and throttling status codes which are retried
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Create a class for per-host rate limiting
+class RateLimiter:
+
+    def __init__(self, requests_per_second=None):
+        """
+        Creates a rate limiter which spaces out requests to the same host. `None` or 0 disables the limit.
+        """
+        # Set the minimum interval between two requests to the same host
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+
+        # Keep the time of the next free slot for each host, guarded by a lock so threads can share it
+        self.__next_slot = {}
+        self.__lock = threading.Lock()
+
+    def wait(self, url):
+        """
+        Blocks until a request to the host of `url` is allowed.
+        """
+        # Skip if rate limiting is disabled
+        if not self.interval:
+            return
+
+        # Reserve the next free slot for this host
+        host = urlsplit(url).netloc
+        with self.__lock:
+            now = time.monotonic()
+            slot = max(now, self.__next_slot.get(host, now))
+            self.__next_slot[host] = slot + self.interval
+
+        # Sleep outside the lock until the reserved slot comes up
+        if slot > now:
+            time.sleep(slot - now)
+
+# Create a class for fetching pages over a shared keep-alive session
+class Fetcher:
+
+    def __init__(self, workers=1, requests_per_second=DEFAULT_REQUESTS_PER_SECOND, retries=3, backoff=0.5, timeout=30, metrics=None):
+        """
+        Creates a fetcher with a shared keep-alive session. `workers` sets the number of concurrent requests,
+        `requests_per_second` limits the request rate per host (`None` or 0 disables the limit, e.g. for a local stand-in server), and `retries` and `backoff` set the retry policy.
+        The time and size of each request are recorded in `metrics` (see metrics.py).
+        """
+        # Set the fetcher settings
+        self.workers = max(1, int(workers))
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.metrics = metrics if metrics is not None else Metrics(path=None)
+
+        # Size the connection pool to the number of workers so that connections are reused rather than discarded.
+        # Retries are made by `get` rather than by the adapter, so that every attempt goes through the rate limiter
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+
+        # Create the shared session
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, **kwargs):
+        """
+        Sends a rate limited GET request for `url` and returns the response. Connection errors, timeouts and server-side
+        or throttling status codes are retried up to `retries` times with exponential backoff (or as long as the server's
+        Retry-After header asks), and every attempt waits for its own slot of the rate limit.
+        """
+        attempt = 0
+        while True:
+            try:
+                response = self.__send(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                # Give up once the retries are used up
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+            else:
+                # Return the response unless its status is retried and retries are left
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    response.raise_for_status()
+                    return response
+
+                # Wait as long as the server asks or else back off, and release the connection of the failed attempt
+                retry_after = response.headers.get('Retry-After', '')
+                delay = float(retry_after) if retry_after.isdigit() else self.backoff * 2 ** attempt
+                response.close()
+
+            # Back off before the next attempt, which then waits for its slot of the rate limit
+            self.metrics.count('http_retries')
+            time.sleep(delay)
+            attempt += 1
+
+    def __send(self, url, **kwargs):
+        """
+        Sends one GET request for `url` once the rate limit allows it, records its time and size, and returns the response.
+        """
+        # Wait for a free slot on the host before sending the request
+        start = time.perf_counter()
+        self.rate_limiter.wait(url)
+        waited = time.perf_counter() - start
+        try:
+            response = self.session.get(url, timeout=self.timeout, **kwargs)
+        except requests.RequestException as error:
+            # Count the requests which failed without a response
+            self.metrics.count('http_errors', error=type(error).__name__)
+            raise
+
+        # Record the time and size of the request. A streamed body is only timed up to its headers,
+        # as it is read (and recorded) by the caller
+        seconds = time.perf_counter() - start - waited
+        size = 0 if kwargs.get('stream') else len(response.content)
+        self.metrics.observe('rate_limit_wait', waited)
+        self.metrics.observe('http_fetch', seconds, status=response.status_code)
+        self.metrics.count('http_bytes', size)
+        self.metrics.event('http_fetch', url=url, status=response.status_code, seconds=seconds, bytes=size)
+        return response
+
+    def get_text(self, url, cache=None):
+        """
+        Returns the text of `url`. If a page `cache` is given (see pagecache.py), the request is made conditional on the
+        cached page, which is returned without being downloaded again if the server answers that it has not changed.
+        """
+        # Fetch the page unconditionally if there is no cache
+        if cache is None:
+            return self.get(url).text
+
+        # Send the validators of the cached page, and use it if the page has not changed
+        entry = cache.get(url)
+        response = self.get(url, headers=cache.headers(entry))
+        if response.status_code == 304 and entry is not None:
+            self.metrics.count('page_cache', result='not_modified')
+            return entry['text']
+
+        # Otherwise cache the new page
+        self.metrics.count('page_cache', result='modified' if entry is not None else 'miss')
+        cache.put(url, response)
+        return response.text
+
+    def map(self, function, items):
+        """
+        Applies `function` to each of `items` using up to `workers` threads. Results are returned in the order of `items`.
+        """
+        # Run serially if only one worker is set
+        if self.workers == 1:
+            for item in items:
+                yield function(item)
+            return
+
+        # Otherwise run in a thread pool, which returns the results in submission order
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            yield from executor.map(function, items)
+
+    def fetch_all(self, urls, cache=None):
+        """
+        Fetches the text of each of `urls`, revalidating the pages of the `cache` if given, and returns them in the same order as `urls`.
+        """
+        return self.map(lambda url: self.get_text(url, cache), urls)
+
+    def close(self):
+        """
+        Closes the shared session and its connection pool.
+        """
+        self.session.close()
@@ -0,0 +1,312 @@
+# Import the required packages/modules
+
+from collections import Counter
+import bisect
+import json
+import os
+import re
+import shutil
+import numpy as np
+import pandas as pd
+from snapshot import load_array, TextTable, write_texts
+
+# Compile the pattern of the tokens in the index
+TOKEN_RE = re.compile('[a-z0-9]+')
+
+def term_counts(text):
+    """
+    Returns the number of times each lowercase token occurs in `text`.
+    """
+    return dict(Counter(TOKEN_RE.findall(text.lower())))
+
+# Create a class for a segment of the full-text index, whose postings are memory-mapped
+class _Segment:
+
+    def __init__(self, directory):
+        """
+        Opens the segment in `directory`. The sorted terms, postings and document lengths are memory-mapped,
+        so only the pages which are searched are read from disk, and a term is found by bisecting the mapped terms.
+        """
+        self.directory = directory
+
+        # Map the sorted terms
+        self.terms = TextTable(os.path.join(directory, 'terms'))
+
+        # Load the links and hashes of the documents
+        with open(os.path.join(directory, 'docs.json'), 'r', encoding='utf_8') as file:
+            docs = json.load(file)
+        self.links = docs['links']
+        self.digests = docs['digests']
+
+        # Memory-map the offset of each term's postings, the postings as (document, term frequency) pairs,
+        # and the length of each document
+        self.offsets = load_array(os.path.join(directory, 'offsets.npy'))
+        self.postings = load_array(os.path.join(directory, 'postings.npy'))
+        self.lengths = load_array(os.path.join(directory, 'lengths.npy'))
+
+        # Mark every document as live until a newer segment replaces it
+        self.live = np.ones(len(self.links), dtype=bool)
+
+    def lookup(self, term):
+        """
+        Returns the postings of `term` as an array of (document, term frequency) pairs.
+        """
+        index = bisect.bisect_left(self.terms, term)
+        if index == len(self.terms) or self.terms[index] != term:
+            return self.postings[:0]
+        return self.postings[self.offsets[index]:self.offsets[index + 1]]
+
+    @staticmethod
+    def write(directory, links, digests, counts):
+        """
+        Writes a segment of the documents with `links`, `digests` and term `counts` to `directory`.
+        """
+        os.makedirs(directory)
+
+        # Give each term an id in sorted order
+        terms = sorted(set().union(*counts)) if counts else []
+        term_ids = {term: term_id for term_id, term in enumerate(terms)}
+
+        # Collect the (term, document, term frequency) triples and sort them by term, keeping documents in order
+        term_column = np.fromiter((term_ids[term] for terms_counts in counts for term in terms_counts), dtype=np.int64)
+        doc_column = np.repeat(np.arange(len(counts), dtype=np.int32), [len(terms_counts) for terms_counts in counts])
+        tf_column = np.fromiter((tf for terms_counts in counts for tf in terms_counts.values()), dtype=np.int32)
+        order = np.argsort(term_column, kind='stable')
+
+        # Write the terms, the offsets of their postings, the postings and the document lengths
+        write_texts(os.path.join(directory, 'terms'), terms)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_column, minlength=len(terms)), out=offsets[1:])
+        np.save(os.path.join(directory, 'offsets.npy'), offsets)
+        np.save(os.path.join(directory, 'postings.npy'), np.column_stack((doc_column[order], tf_column[order])))
+        np.save(os.path.join(directory, 'lengths.npy'), np.array([sum(terms_counts.values()) for terms_counts in counts], dtype=np.int32))
+        with open(os.path.join(directory, 'docs.json'), 'w', encoding='utf_8') as file:
+            json.dump({'links': list(links), 'digests': list(digests)}, file)
+
+    @staticmethod
+    def merge(directory, segments):
+        """
+        Writes the live documents of `segments` as one segment to `directory`, in order. The postings are merged as arrays,
+        so that the segments are not read back into term counts for each document.
+        """
+        os.makedirs(directory)
+
+        # Give each term an id in the sorted union of the terms of the segments
+        terms = [segment.terms.tolist() for segment in segments]
+        vocabulary = np.array(sorted(set().union(*terms)), dtype=object)
+
+        links, digests, lengths, term_columns, postings = [], [], [], [], []
+        for segment, segment_terms in zip(segments, terms):
+            # Number the live documents of the segment after the documents of the earlier segments
+            live = np.flatnonzero(segment.live)
+            new_docs = np.full(len(segment.links), -1, dtype=np.int64)
+            new_docs[live] = np.arange(len(live)) + len(links)
+            links.extend(segment.links[doc] for doc in live.tolist())
+            digests.extend(segment.digests[doc] for doc in live.tolist())
+            lengths.append(np.asarray(segment.lengths)[live])
+
+            # Map the postings of the live documents to the merged terms and document numbers
+            term_ids = np.searchsorted(vocabulary, np.array(segment_terms, dtype=object)) if segment_terms else np.zeros(0, dtype=np.int64)
+            term_column = np.repeat(term_ids, np.diff(segment.offsets))
+            found = np.asarray(segment.postings)
+            kept = segment.live[found[:, 0]] if len(found) else np.zeros(0, dtype=bool)
+            term_columns.append(term_column[kept])
+            postings.append(np.column_stack((new_docs[found[kept, 0]], found[kept, 1])).astype(np.int32) if len(found) else found)
+
+        # Sort the postings by term, keeping documents in order, and drop the terms which only dead documents had
+        term_column = np.concatenate(term_columns) if term_columns else np.zeros(0, dtype=np.int64)
+        postings = np.concatenate(postings) if postings else np.zeros((0, 2), dtype=np.int32)
+        order = np.argsort(term_column, kind='stable')
+        used, term_column = np.unique(term_column[order], return_inverse=True)
+
+        # Write the terms, the offsets of their postings, the postings and the document lengths
+        write_texts(os.path.join(directory, 'terms'), vocabulary[used].tolist())
+        offsets = np.zeros(len(used) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_column, minlength=len(used)), out=offsets[1:])
+        np.save(os.path.join(directory, 'offsets.npy'), offsets)
+        np.save(os.path.join(directory, 'postings.npy'), postings[order].reshape(-1, 2).astype(np.int32))
+        np.save(os.path.join(directory, 'lengths.npy'), np.concatenate(lengths).astype(np.int32) if lengths else np.zeros(0, dtype=np.int32))
+        with open(os.path.join(directory, 'docs.json'), 'w', encoding='utf_8') as file:
+            json.dump({'links': links, 'digests': digests}, file)
+
+# Create a class for the BM25 full-text index of the judgments
+class FullTextIndex:
+
+    def __init__(self, directory='../data/fulltext', k1=1.2, b=0.75, max_segments=16):
+        """
+        Opens the full-text index in `directory`, which ranks judgments for a query with BM25 (`k1` and `b`).
+        Each batch of judgments is written as a new segment, and a judgment indexed again replaces the
+        one in the older segment. Once there are more than `max_segments` segments they are merged into one.
+        """
+        # Set the index settings
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.max_segments = max_segments
+        self.manifest_path = os.path.join(directory, 'segments.json')
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.__open()
+
+    def __open(self):
+        """
+        Opens the segments in the manifest and marks the documents which were replaced by a newer segment.
+        """
+        names = []
+        self.__manifest = self.__manifest_version()
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf_8') as file:
+                names = json.load(file)
+        self.segments = [_Segment(os.path.join(self.directory, name)) for name in names]
+
+        # Find the live segment and document of each link, where the newest segment wins
+        self.documents = {}
+        for segment in reversed(self.segments):
+            for doc, link in enumerate(segment.links):
+                if link in self.documents:
+                    segment.live[doc] = False
+                else:
+                    self.documents[link] = (segment, doc)
+
+        # Set the number of live documents and their average length for the BM25 scores
+        self.total_length = sum(int(segment.lengths[segment.live].sum()) for segment in self.segments)
+        self.__set_average()
+
+    def __manifest_version(self):
+        """
+        Returns a token which changes whenever the manifest is replaced, or None if there is no manifest.
+        """
+        try:
+            stat = os.stat(self.manifest_path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def changed(self):
+        """
+        Checks if the segments were changed by another index since this one was opened or last written,
+        e.g. by a database build while the app serves the index.
+        """
+        return self.__manifest_version() != self.__manifest
+
+    def __set_average(self):
+        """
+        Sets the number of live documents and their average length.
+        """
+        self.num_docs = len(self.documents)
+        self.average_length = self.total_length / self.num_docs if self.num_docs else 0
+
+    def __append(self, segment):
+        """
+        Adds the new `segment` to the open segments, marking the documents it replaces in the older segments,
+        without opening the older segments again.
+        """
+        for doc, link in enumerate(segment.links):
+            replaced = self.documents.get(link)
+            if replaced is not None:
+                replaced[0].live[replaced[1]] = False
+                self.total_length -= int(replaced[0].lengths[replaced[1]])
+            self.documents[link] = (segment, doc)
+            self.total_length += int(segment.lengths[doc])
+        self.segments.append(segment)
+        self.__set_average()
+
+    def __len__(self):
+        return self.num_docs
+
+    def __contains__(self, link):
+        return link in self.documents
+
+    def digest(self, link):
+        """
+        Returns the hash of the html which the judgment at `link` was indexed from, or None if it is not indexed.
+        """
+        if link not in self.documents:
+            return None
+        segment, doc = self.documents[link]
+        return segment.digests[doc]
+
+    def __write_manifest(self, names):
+        """
+        Replaces the manifest with the segment `names`.
+        """
+        with open(self.manifest_path + '.tmp', 'w', encoding='utf_8') as file:
+            json.dump(names, file)
+        os.replace(self.manifest_path + '.tmp', self.manifest_path)
+
+    def __next_name(self):
+        """
+        Returns the name of the next segment.
+        """
+        numbers = [int(name.split('-')[1]) for name in os.listdir(self.directory) if name.startswith('segment-')]
+        return f'segment-{max(numbers, default=-1) + 1:06d}'
+
+    def add(self, documents, compact=True):
+        """
+        Indexes `documents`, a list of (link, hash of the html, term counts) for each judgment, as a new segment.
+        The segments are merged once there are too many of them, unless `compact` is False (e.g. while streaming batches).
+        """
+        # Skip if there is nothing to index
+        if not documents:
+            return
+
+        # Keep the latest entry of each link
+        links, digests, counts = zip(*{document[0]: document for document in documents}.values())
+        name = self.__next_name()
+        _Segment.write(os.path.join(self.directory, name), links, digests, counts)
+        self.__write_manifest([os.path.basename(segment.directory) for segment in self.segments] + [name])
+        self.__manifest = self.__manifest_version()
+        self.__append(_Segment(os.path.join(self.directory, name)))
+
+        # Merge the segments once there are too many of them
+        if compact and len(self.segments) > self.max_segments:
+            self.compact()
+
+    def compact(self):
+        """
+        Merges the segments into one, without the documents which were replaced.
+        """
+        old = [segment.directory for segment in self.segments]
+
+        # Write the merged segment and switch the manifest to it before removing the old segments
+        name = self.__next_name()
+        _Segment.merge(os.path.join(self.directory, name), self.segments)
+        self.__write_manifest([name])
+        self.__open()
+        for directory in old:
+            shutil.rmtree(directory)
+
+    def search(self, query, n=10):
+        """
+        Returns the `n` judgments which best match `query` as a dataframe of their links and BM25 scores.
+        """
+        scores = [np.zeros(len(segment.links)) for segment in self.segments]
+
+        for term in set(TOKEN_RE.findall(query.lower())):
+            # Look up the live postings of the term in each segment
+            postings = []
+            for segment in self.segments:
+                found = segment.lookup(term)
+                postings.append(found[segment.live[found[:, 0]]] if len(found) else found)
+
+            # Weigh the term by the number of judgments it occurs in
+            df = sum(len(found) for found in postings)
+            if not df:
+                continue
+            idf = np.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+
+            # Add the BM25 score of the term to each judgment it occurs in
+            for segment, found, segment_scores in zip(self.segments, postings, scores):
+                if len(found):
+                    docs, tf = found[:, 0], found[:, 1].astype(np.float64)
+                    norm = self.k1 * (1 - self.b + self.b * segment.lengths[docs] / self.average_length)
+                    np.add.at(segment_scores, docs, idf * tf * (self.k1 + 1) / (tf + norm))
+
+        # Rank the judgments with a score across all segments
+        found = [(number, np.flatnonzero(segment_scores)) for number, segment_scores in enumerate(scores)]
+        numbers = np.concatenate([np.full(len(docs), number) for number, docs in found]) if found else np.zeros(0, dtype=np.int64)
+        docs = np.concatenate([docs for number, docs in found]) if found else np.zeros(0, dtype=np.int64)
+        values = np.concatenate([scores[number][docs] for number, docs in found]) if found else np.zeros(0)
+        top = np.argsort(-values, kind='stable')[:n]
+
+        return pd.DataFrame({'link': [self.segments[numbers[index]].links[docs[index]] for index in top], 'score': values[top]})
@@ -0,0 +1,322 @@
+# Import the required packages/modules
+
+import codecs
+import glob
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+import zlib
+
+# Set the layouts of the judgment archive
+LAYOUTS = ('pack', 'files')
+
+# Set the pattern of the pack file names
+PACK_RE = re.compile(r'pack-(\d+)\.gz$')
+
+# Set the name of the marker file of packs into which the judgment files were copied
+MIGRATED = 'migrated'
+
+def _sha256_file(path):
+    """
+    Returns the SHA-256 hash of the file at `path`.
+    """
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+# Create a class for the archive which stores each judgment as its own .html file
+class FileArchive:
+
+    def __init__(self, directory, file_name, hasher=None):
+        """
+        Creates the archive of judgments in `directory`, where `file_name` returns the file name of a judgment's link,
+        e.g. "supremecourt_12.html". `hasher` returns the SHA-256 hash of a file, by default by reading it.
+        """
+        # Set the archive directory and the naming of the files
+        self.directory = directory
+        self.file_name = file_name
+        self.hasher = hasher or _sha256_file
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, link):
+        """
+        Returns the path of the file of `link`.
+        """
+        return os.path.join(self.directory, self.file_name(link))
+
+    def __contains__(self, link):
+        return os.path.exists(self.path(link))
+
+    def write(self, link, chunks):
+        """
+        Writes the html of `link` from the byte `chunks`, moving the file into place once it is complete.
+        Returns the number of bytes written.
+        """
+        path = self.path(link)
+        size = 0
+        with open(path + '.part', 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+                size += len(chunk)
+        os.replace(path + '.part', path)
+        return size
+
+    def locate(self, link):
+        """
+        Returns the location of the judgment of `link` for `read_judgment`, or None if it is not archived.
+        """
+        path = self.path(link)
+        return path if os.path.exists(path) else None
+
+    def digest(self, link):
+        """
+        Returns the SHA-256 hash of the html of `link`.
+        """
+        return self.hasher(self.path(link))
+
+    def read(self, link):
+        """
+        Returns the html of `link`.
+        """
+        return read_judgment(self.locate(link))
+
+# Create a class for the archive which appends the judgments to compressed pack files
+class PackArchive:
+
+    def __init__(self, directory, pack_size=256 * 1024 * 1024, level=6):
+        """
+        Creates the archive of judgments in `directory`, where each judgment is appended to a pack file as its own
+        gzip member, so that a pack can be copied as one file and still be decompressed as a whole with gzip.
+        A new pack is started once a pack holds `pack_size` bytes, and judgments are compressed with `level`.
+        The offset, length and SHA-256 hash of each judgment are kept in an index by link, from which a judgment
+        is read with one slice of the memory-mapped pack.
+        """
+        # Set the archive directory and settings
+        self.directory = directory
+        self.pack_size = pack_size
+        self.level = level
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Lock the packs and index so that the archiver's threads take turns to pick a pack and to index a judgment
+        self.__lock = threading.Lock()
+
+        # Load the index, and continue the packs which are not full
+        self.index_path = os.path.join(self.directory, 'index.jsonl')
+        self.entries = self.__load_index()
+        packs = [int(PACK_RE.search(path).group(1)) for path in glob.glob(os.path.join(self.directory, 'pack-*.gz')) if PACK_RE.search(path)]
+        self.__pack = max(packs, default=0)
+
+        # Keep the packs which no thread is writing to, so that each thread streams its judgment into a pack of its own
+        self.__free = sorted(packs) or [self.__pack]
+
+    def __load_index(self):
+        """
+        Loads the index as a dictionary of links to their entries, where the latest entry for each link wins.
+        """
+        entries = {}
+        if not os.path.exists(self.index_path):
+            return entries
+
+        with open(self.index_path, 'r', encoding='utf_8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Skip a partly written line from an interrupted run
+                    continue
+                entries[entry['link']] = entry
+
+        return entries
+
+    def __pack_path(self, number):
+        """
+        Returns the path of the pack `number`.
+        """
+        return os.path.join(self.directory, f'pack-{number:06d}.gz')
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, link):
+        return link in self.entries
+
+    def __acquire(self):
+        """
+        Returns the number of a pack which is not full and which no other thread is writing to, starting a new pack if there is none.
+        """
+        with self.__lock:
+            while self.__free:
+                number = self.__free.pop()
+                path = self.__pack_path(number)
+                if not os.path.exists(path) or os.path.getsize(path) < self.pack_size:
+                    return number
+            self.__pack += 1
+            return self.__pack
+
+    def write(self, link, chunks):
+        """
+        Appends the html of `link` from the byte `chunks` to a pack and indexes it. A judgment which is
+        written again replaces the earlier one in the index. Returns the number of bytes of the html.
+        """
+        # Take a pack of this thread's own, so that the threads stream their judgments at the same time
+        number = self.__acquire()
+        path = self.__pack_path(number)
+        sha256 = hashlib.sha256()
+        size = 0
+
+        try:
+            with open(path, 'ab') as file:
+                offset = file.tell()
+                try:
+                    # Compress the chunks into a gzip member as they arrive, hashing and counting the html on the way
+                    compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+                    for chunk in chunks:
+                        sha256.update(chunk)
+                        size += len(chunk)
+                        file.write(compressor.compress(chunk))
+                    file.write(compressor.flush())
+                    length = file.tell() - offset
+                except BaseException:
+                    # Cut a partly written judgment off the pack, so that the pack still decompresses as a whole
+                    file.truncate(offset)
+                    raise
+
+            # Index the judgment once it is complete in the pack, so that an interruption never indexes a partial judgment
+            entry = {'link': link, 'pack': os.path.basename(path), 'offset': offset, 'length': length,
+                     'size': size, 'sha256': sha256.hexdigest()}
+            with self.__lock:
+                with open(self.index_path, 'a', encoding='utf_8') as file:
+                    file.write(json.dumps(entry) + '\n')
+                self.entries[link] = entry
+
+        finally:
+            # Give the pack back for the next judgment
+            with self.__lock:
+                self.__free.append(number)
+
+        return size
+
+    def locate(self, link):
+        """
+        Returns the location of the judgment of `link` for `read_judgment`, or None if it is not archived.
+        """
+        entry = self.entries.get(link)
+        if entry is None:
+            return None
+        return (os.path.join(self.directory, entry['pack']), entry['offset'], entry['length'])
+
+    def digest(self, link):
+        """
+        Returns the SHA-256 hash of the html of `link`, which was recorded when it was written.
+        """
+        return self.entries[link]['sha256']
+
+    def read(self, link):
+        """
+        Returns the html of `link`.
+        """
+        return read_judgment(self.locate(link))
+
+def migrate_files(court, link_index, hasher=None):
+    """
+    Copies the judgments of `court` which are only archived as files into its packs, keeping the files for the file layout,
+    so that they do not have to be downloaded again, and marks the packs as migrated. Returns the number of judgments copied.
+    """
+    directory = f'../judgments/{court}_court'
+    files = FileArchive(directory, lambda link: f'{court}court_{link_index[link]}.html', hasher)
+    archive = PackArchive(os.path.join(directory, 'packs'))
+
+    # Stream each file into the packs
+    copied = 0
+    for link in link_index.ids:
+        if link not in archive and link in files:
+            with open(files.path(link), 'rb') as file:
+                archive.write(link, iter(lambda: file.read(1 << 20), b''))
+            copied += 1
+
+    # Mark the packs once every file is copied, so that an interrupted migration is run again
+    with open(os.path.join(archive.directory, MIGRATED), 'w', encoding='utf_8') as file:
+        file.write(f'{copied}\n')
+
+    return copied
+
+def needs_migration(court):
+    """
+    Returns whether `court` has judgments archived as files which may not be in its packs,
+    as the packs were not migrated since the file layout was last used.
+    """
+    directory = f'../judgments/{court}_court'
+    if os.path.exists(os.path.join(directory, 'packs', MIGRATED)) or not os.path.isdir(directory):
+        return False
+
+    # Look for a judgment file, stopping at the first one
+    with os.scandir(directory) as entries:
+        return any(entry.name.endswith('.html') for entry in entries)
+
+def open_archive(court, link_index, layout='pack', hasher=None, migrate=False):
+    """
+    Opens the judgment archive of `court` in the `layout` "pack" or "files", where `link_index` gives the document id
+    in the file name of each judgment. If `migrate` is set and the pack layout is opened for the first time since the file layout
+    was used, judgments which were archived as files are copied into the packs (see `migrate_files`). Readers leave it unset
+    and check `needs_migration` instead, so that reading the archive never writes to it.
+    """
+    # Raise an error if an invalid layout is set
+    if layout not in LAYOUTS:
+        raise ValueError(f'Unknown archive layout: {layout}')
+
+    directory = f'../judgments/{court}_court'
+    packs = os.path.join(directory, 'packs')
+    if layout == 'files':
+        # Clear the mark of the packs, as the judgments archived as files from now on are not in the packs yet
+        if os.path.exists(os.path.join(packs, MIGRATED)):
+            os.remove(os.path.join(packs, MIGRATED))
+        return FileArchive(directory, lambda link: f'{court}court_{link_index[link]}.html', hasher)
+
+    # Copy the judgments which are only archived as files into the packs if set, unless the packs were migrated since
+    if migrate and needs_migration(court):
+        migrate_files(court, link_index, hasher)
+
+    return PackArchive(packs)
+
+# Keep the memory maps of the packs read by this process, by path
+_maps = {}
+
+def read_judgment(location):
+    """
+    Returns the html of the judgment at `location`, as given by the `locate` method of an archive:
+    the path of a file, or the path, offset and length of a judgment in a pack. The location can be sent to a worker process,
+    which maps each pack into memory once and reads every judgment of the pack from the map.
+    """
+    # Read the file of a judgment
+    if isinstance(location, str):
+        with codecs.open(location, 'r', 'utf-8') as load_judgment:
+            return load_judgment.read()
+
+    # Map the pack, again if it was replaced or has grown past the judgment since it was mapped
+    path, offset, length = location
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    mapped = _maps.get(path)
+    if mapped is None or mapped[0] != stat.st_ino or len(mapped[1]) < offset + length:
+        # Close the map which is replaced, as the judgments read from it were copied out of it
+        if mapped is not None:
+            mapped[1].close()
+        with open(path, 'rb') as file:
+            mapped = (stat.st_ino, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+        _maps[path] = mapped
+
+    return gzip.decompress(mapped[1][offset:offset + length]).decode('utf-8')
+
+def close_maps():
+    """
+    Closes the memory maps of the packs read by this process, e.g. once a database update has read its judgments.
+    """
+    for inode, mapped in _maps.values():
+        mapped.close()
+    _maps.clear()
@@ -0,0 +1,86 @@
+# Import the required packages/modules
+
+import csv
+import os
+
+# Create a class for the persistent link to document id index
+class LinkIndex:
+
+    def __init__(self, path):
+        """
+        Creates the link index stored at `path`, which maps each judgment link to a stable document id.
+        The document id is used in the archived file name, e.g. `supremecourt_{doc_id}.html`.
+        """
+        # Set the path of the index and the dictionary of links to document ids
+        self.path = path
+        self.ids = {}
+
+        # Keep the entries which have not been saved yet
+        self.__pending = []
+
+        # Load the saved index if it exists
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf_8', newline='') as file:
+                for row in csv.DictReader(file):
+                    self.ids[row['link']] = int(row['doc_id'])
+
+    @classmethod
+    def for_court(cls, name, links=()):
+        """
+        Loads the index of the court `name`. A new index is seeded with `links` in their current order,
+        which matches the file names of judgments archived before the index existed.
+        """
+        index = cls(f'../data/{name}court_index.csv')
+        if not index.ids:
+            index.add(links)
+            index.save()
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, link):
+        return link in self.ids
+
+    def __getitem__(self, link):
+        return self.ids[link]
+
+    def get(self, link, default=None):
+        return self.ids.get(link, default)
+
+    def add(self, links):
+        """
+        Assigns the next free document ids to the `links` which are not in the index yet.
+        Returns the number of links added.
+        """
+        # Set the next free document id
+        next_id = max(self.ids.values(), default=-1) + 1
+        added = 0
+
+        # Add each new link with the next document id
+        for link in links:
+            if link not in self.ids:
+                self.ids[link] = next_id
+                self.__pending.append((link, next_id))
+                next_id += 1
+                added += 1
+
+        return added
+
+    def save(self):
+        """
+        Appends the new entries to the index file. Existing entries are never rewritten, so document ids stay stable.
+        """
+        # Skip if there is nothing to save
+        if not self.__pending:
+            return
+
+        # Write the header if the file is new, followed by the new entries
+        new_file = not os.path.exists(self.path)
+        with open(self.path, 'a', encoding='utf_8', newline='') as file:
+            writer = csv.writer(file)
+            if new_file:
+                writer.writerow(['link', 'doc_id'])
+            writer.writerows(self.__pending)
+
+        self.__pending = []
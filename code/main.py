@@ -0,0 +1,137 @@
+# Imports
+from flask import Flask, render_template, request, abort, Response, jsonify
+from markupsafe import escape
+from charts import ChartCache, MEDIA_TYPES
+from fulltext import FullTextIndex
+from metrics import Metrics
+from search import QueryCache, SearchIndex
+from snapshot import current_version
+
+# Initialize flask
+app = Flask(__name__)
+
+# Create the cache of search results, which is shared by all the routes and cleared when the database changes.
+# Search the serving snapshot if one was published, which is memory-mapped instead of parsed
+if current_version() is not None:
+    query_cache = QueryCache(loader=SearchIndex.from_snapshot, version=current_version)
+else:
+    query_cache = QueryCache()
+
+# Create the cache of rendered charts, which renders each chart once per search and database version
+chart_cache = ChartCache(query_cache)
+
+# Open the full-text index of the judgments, which is opened again once a database build changes it
+fulltext_index = FullTextIndex()
+
+# Route 1: Home
+@app.route("/")
+
+# Define home function
+def index():
+        return render_template('index.html')
+
+@app.route('/submit')
+def submission():
+    """
+    Input: `input_string` as dtype string which is given from the search box in `form.html`.
+    Output: `results.html` with the information from the searches `mitigation rate` as `results2`, `aggravated rate` as `results1`, `search_results` as `results`
+    """
+    # Load in the form data from the incoming request
+    user_input = request.args
+
+    # Manipulate data into a format that we pass to our model
+    data = str(escape(user_input['input_string']))
+
+    # Perform the search once, or take it from the cache, and compute every output from the same result
+    result = query_cache.search(data)
+
+    # Show the error page if there are no results
+    if not result.found:
+        abort(500)
+
+    results = result.results
+    results1 = result.aggravating()
+    results2 = result.mitigating()
+
+    # Convert `input_string` to a suitable format for calling the plot to display as an image
+    query = str(data).replace(" ", "+")
+
+    # Render `results.html` as the resulting page containing the search results and statistical summary.
+    # Also makes a call to `/plot.png` to create a plot for the search results and display it.
+    return render_template("results.html", column_names=results.columns.values, row_data=list(results.values.tolist()),
+                           link_column="link", zip=zip, plot_name=f"Top citations for '{str.title(data)}':", url=f'/plot.png?input_string={query}', aggravating=results1, mitigating=results2)
+
+def chart_response(format):
+    """
+    Returns the top citations chart of the search in the request as a `format` ("png" or "svg") response,
+    or an empty 304 response if the client already has the chart of the current database.
+    """
+    # Input arguments
+    user_input = request.args
+
+    # Manipulate data into a format that we pass to our model
+    data = str(escape(user_input['input_string'])).replace("+", " ")
+
+    # Answer without rendering if the client's copy of the chart is still current
+    etag = chart_cache.etag(data, format)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        # Take the chart from the cache, rendering it if it is not cached
+        chart = chart_cache.get(data, format, etag)
+        if chart is None:
+            abort(500)
+        response = Response(chart, mimetype=MEDIA_TYPES[format])
+
+    # Let the client keep the chart, revalidating it once the database may have changed
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/plot.png')
+def plot_png():
+    return chart_response('png')
+
+@app.route('/plot.svg')
+def plot_svg():
+    return chart_response('svg')
+
+@app.route('/fulltext')
+def fulltext():
+    """
+    Returns the `n` judgments (at most 100) whose text best matches the `query` in the request, with their BM25 scores, as JSON.
+    """
+    global fulltext_index
+
+    # Open the index again if a database build changed it, replacing it in one step for the other threads
+    if fulltext_index.changed():
+        fulltext_index = FullTextIndex()
+
+    query = request.args.get('query', '')
+    n = min(request.args.get('n', 10, type=int), 100)
+    ranked = fulltext_index.search(query, n=n)
+    return jsonify({'query': query, 'results': ranked.to_dict(orient='records')})
+
+@app.route('/metrics')
+def metrics():
+    """
+    Returns the hits and misses of the search and chart caches in the Prometheus text format.
+    """
+    search_metrics = Metrics(path=None)
+    search_metrics.count('cache_hits', query_cache.hits, cache='search')
+    search_metrics.count('cache_misses', query_cache.misses, cache='search')
+    if query_cache.hits + query_cache.misses:
+        search_metrics.gauge('cache_hit_rate', query_cache.hits / (query_cache.hits + query_cache.misses), cache='search')
+
+    # Add the charts found in memory, found on disk and rendered
+    search_metrics.count('cache_hits', chart_cache.memory_hits, cache='chart', tier='memory')
+    search_metrics.count('cache_hits', chart_cache.disk_hits, cache='chart', tier='disk')
+    search_metrics.count('chart_renders', chart_cache.renders)
+    return Response(search_metrics.to_prometheus(), mimetype='text/plain')
+
+@app.errorhandler(500)
+def invalid_search(e):
+    return render_template('invalid_search.html'), 500
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=8080, debug=True)
@@ -0,0 +1,205 @@
+# Import the required packages/modules
+
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import threading
+import time
+
+# Set the prefix of the metric names in the Prometheus text format
+PREFIX = 'criminalcasedatabase_'
+
+# Create a class for the counters, timers and gauges of a run
+class Metrics:
+
+    def __init__(self, path='../logs/metrics.jsonl', events_path=None):
+        """
+        Creates an empty set of metrics which is written to `path` at the end of each run: as Prometheus text
+        if the path ends in ".prom" (replacing the file), or else as JSON lines (appended to the file), or not at all if None.
+        If `events_path` is set, an event such as each HTTP fetch or judgment is also appended there as a JSON line.
+        """
+        # Set the output files
+        self.path = path
+        self.events_path = events_path
+
+        # Guard the metrics with a lock so that the fetcher's threads can share them
+        self.__lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Clears the metrics.
+        """
+        with self.__lock:
+            # Keep the counters and gauges as values, and the timers as [count, total seconds, max seconds],
+            # each under its name and sorted labels
+            self.counters = {}
+            self.timers = {}
+            self.gauges = {}
+
+    def count(self, name, value=1, **labels):
+        """
+        Adds `value` to the counter `name` with `labels`.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """
+        Adds a duration of `seconds` to the timer `name` with `labels`.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            timer = self.timers.setdefault(key, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    def gauge(self, name, value, **labels):
+        """
+        Sets the gauge `name` with `labels` to `value`.
+        """
+        with self.__lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Times the block within the context to the timer `name` with `labels`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def event(self, name, **fields):
+        """
+        Appends the event `name` with `fields` to the events file, if it is set.
+        """
+        if self.events_path is None:
+            return
+        line = json.dumps({'time': datetime.now().isoformat(), 'event': name, **fields}) + '\n'
+        with self.__lock:
+            with open(self.events_path, 'a', encoding='utf_8') as file:
+                file.write(line)
+
+    def snapshot(self):
+        """
+        Returns the metrics as lists, e.g. to send them from a worker process to be merged.
+        """
+        with self.__lock:
+            return ([(key, value) for key, value in self.counters.items()],
+                    [(key, list(timer)) for key, timer in self.timers.items()],
+                    [(key, value) for key, value in self.gauges.items()])
+
+    def merge(self, snapshot):
+        """
+        Adds the metrics of a `snapshot` to these metrics.
+        """
+        counters, timers, gauges = snapshot
+        with self.__lock:
+            for key, value in counters:
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, (count, total, longest) in timers:
+                timer = self.timers.setdefault(key, [0, 0.0, 0.0])
+                timer[0] += count
+                timer[1] += total
+                timer[2] = max(timer[2], longest)
+            self.gauges.update(gauges)
+
+    def seconds(self, name, **labels):
+        """
+        Returns the total seconds of the timer `name` with `labels`, or 0 if it was never observed.
+        """
+        return self.timers.get((name, tuple(sorted(labels.items()))), [0, 0.0, 0.0])[1]
+
+    def records(self):
+        """
+        Returns each metric as a dictionary of its name, type, labels and values.
+        """
+        snapshot = self.snapshot()
+        records = [{'metric': name, 'type': 'counter', 'labels': dict(labels), 'value': value} for (name, labels), value in snapshot[0]]
+        records += [{'metric': name, 'type': 'timer', 'labels': dict(labels), 'count': count, 'seconds': total, 'max_seconds': longest}
+                    for (name, labels), (count, total, longest) in snapshot[1]]
+        records += [{'metric': name, 'type': 'gauge', 'labels': dict(labels), 'value': value} for (name, labels), value in snapshot[2]]
+        return records
+
+    def to_json_lines(self, **context):
+        """
+        Returns the metrics as JSON lines, each with the time and the `context` of the run (e.g. the command and court).
+        """
+        now = datetime.now().isoformat()
+        return ''.join(json.dumps({'time': now, **context, **record}) + '\n' for record in self.records())
+
+    def to_prometheus(self, **context):
+        """
+        Returns the metrics in the Prometheus text format, with the `context` of the run added to the labels of each metric.
+        Timers are written as summaries of seconds, together with a gauge of their longest duration.
+        """
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            # Declare the type of each metric once, before its first sample
+            if name not in declared:
+                declared.add(name)
+                lines.append(f'# TYPE {name} {kind}')
+
+        def sample(name, labels, value):
+            labels = {**context, **dict(labels)}
+            text = ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+            lines.append(f'{name}{{{text}}} {value}' if text else f'{name} {value}')
+
+        snapshot = self.snapshot()
+        for (name, labels), value in sorted(snapshot[0]):
+            declare(f'{PREFIX}{name}_total', 'counter')
+            sample(f'{PREFIX}{name}_total', labels, value)
+        for (name, labels), (count, total, longest) in sorted(snapshot[1]):
+            declare(f'{PREFIX}{name}_seconds', 'summary')
+            sample(f'{PREFIX}{name}_seconds_count', labels, count)
+            sample(f'{PREFIX}{name}_seconds_sum', labels, total)
+        for (name, labels), (count, total, longest) in sorted(snapshot[1]):
+            declare(f'{PREFIX}{name}_seconds_max', 'gauge')
+            sample(f'{PREFIX}{name}_seconds_max', labels, longest)
+        for (name, labels), value in sorted(snapshot[2]):
+            declare(f'{PREFIX}{name}', 'gauge')
+            sample(f'{PREFIX}{name}', labels, value)
+        return '\n'.join(lines) + '\n'
+
+    def write(self, **context):
+        """
+        Writes the metrics of the run to the output file with the `context` of the run, and clears them for the next run.
+        """
+        if self.path is not None:
+            # Replace the Prometheus text file in one step, so that a collector never reads it half written
+            if self.path.endswith('.prom'):
+                with open(self.path + '.tmp', 'w', encoding='utf_8') as file:
+                    file.write(self.to_prometheus(**context))
+                os.replace(self.path + '.tmp', self.path)
+
+            # Or append the JSON lines to the log of the runs
+            else:
+                with open(self.path, 'a', encoding='utf_8') as file:
+                    file.write(self.to_json_lines(**context))
+
+        self.reset()
+
+    def summary(self, n=10):
+        """
+        Returns the `n` timers with the most total seconds as lines of text, to see which stage dominates a run.
+        """
+        timers = sorted(self.snapshot()[1], key=lambda item: item[1][1], reverse=True)[:n]
+        lines = []
+        for (name, labels), (count, total, longest) in timers:
+            label = ','.join(f'{key}={value}' for key, value in labels)
+            lines.append(f'{name}{"{" + label + "}" if label else ""}: {total:.3f} s over {count} ({total / count * 1000:.1f} ms each, max {longest * 1000:.1f} ms)')
+        return '\n'.join(lines)
+
+def _escape(value):
+    """
+    Escapes a label value for the Prometheus text format.
+    """
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
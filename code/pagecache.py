@@ -0,0 +1,60 @@
+# Import the required packages/modules
+
+import hashlib
+import json
+import os
+
+# Create a class for the on-disk cache of fetched pages, which is revalidated with conditional requests
+class PageCache:
+
+    def __init__(self, directory):
+        """
+        Creates the page cache in `directory`. Each page is stored under the SHA-256 hash of its url, together with the
+        ETag and Last-Modified headers it was served with, so that it is only downloaded again if the server says it changed.
+        """
+        # Set the cache directory
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __path(self, url):
+        """
+        Returns the path of the cache entry for `url`.
+        """
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url):
+        """
+        Returns the cached page of `url` as a dictionary of its text and validators, or None if it was never cached.
+        """
+        try:
+            with open(self.__path(url), 'r', encoding='utf_8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def headers(self, entry):
+        """
+        Returns the headers of a conditional request for the cached page `entry`, which are empty if there is no entry.
+        """
+        headers = {}
+        if entry is not None and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry is not None and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, url, response):
+        """
+        Caches the text of `response` for `url` if it was served with an ETag or Last-Modified header.
+        """
+        # Skip pages which cannot be revalidated, as they would have to be downloaded again anyway
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+
+        # Move the entry into place once it is complete, as the fetcher's threads write the entries concurrently
+        path = self.__path(url)
+        with open(path + '.tmp', 'w', encoding='utf_8') as file:
+            json.dump({'url': url, 'etag': etag, 'last_modified': last_modified, 'text': response.text}, file)
+        os.replace(path + '.tmp', path)
@@ -0,0 +1,66 @@
+# Import the required packages/modules
+
+import sys
+
+# Create a class for a progress reporter which reports nothing, used when there is no one to read it
+class NullProgress:
+
+    def update(self, current, total, label=''):
+        """
+        Reports that `current` of `total` items (e.g. "page") are done.
+        """
+        pass
+
+    def message(self, text):
+        """
+        Reports a line of `text`.
+        """
+        pass
+
+# Create a class for a progress reporter which prints every update on its own line, e.g. for a terminal or a log
+class PrintProgress(NullProgress):
+
+    def update(self, current, total, label=''):
+        """
+        Prints that `current` of `total` items (e.g. "page") are done.
+        """
+        print(f'Current progress: {label + " " if label else ""}{current}/{total}.', flush=True)
+
+    def message(self, text):
+        """
+        Prints a line of `text`.
+        """
+        print(text, flush=True)
+
+# Create a class for a progress reporter which replaces the output of a notebook cell with each update
+class NotebookProgress(PrintProgress):
+
+    def __init__(self):
+        """
+        Creates the reporter. IPython is only imported here, as it is only needed in a notebook.
+        """
+        from IPython.display import clear_output
+        self.clear_output = clear_output
+
+    def update(self, current, total, label=''):
+        """
+        Clears the cell output and prints that `current` of `total` items (e.g. "page") are done.
+        """
+        self.clear_output(wait=True)
+        super().update(current, total, label)
+
+def in_notebook():
+    """
+    Returns True if the code runs in a notebook (an IPython kernel), without importing IPython when it is not loaded.
+    """
+    # Skip if IPython was never imported, as it always is in a notebook
+    if 'IPython' not in sys.modules:
+        return False
+    shell = sys.modules['IPython'].get_ipython()
+    return shell is not None and hasattr(shell, 'kernel')
+
+def default_progress():
+    """
+    Returns the notebook reporter in a notebook, and a reporter which reports nothing otherwise.
+    """
+    return NotebookProgress() if in_notebook() else NullProgress()
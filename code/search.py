@@ -0,0 +1,722 @@
+# Import the required packages/modules
+
+from bisect import bisect_left
+from citations import CitationGraph
+from collections import OrderedDict
+from snapshot import load_array, Snapshot, TextTable, write_texts
+from store import ColumnarStore
+import os
+import re
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+# Set the columns returned by a search, in order
+RESULT_COLUMNS = ['tribunal/court', 'case_name', 'decision_date', 'aggravation_discussed', 'mitigation_discussed',
+                  'citations', 'possible_titles', 'possible_statutes', 'link']
+
+# Set the columns which are indexed for searching
+SEARCH_COLUMNS = ('case_name', 'possible_titles', 'possible_statutes')
+
+# Set the message shown when a search has no results
+NO_RESULTS = '''No results found.
+                    Please ensure your search is in the following format:
+                    Case Name (e.g. John v Smith),
+                    Part of offence name (e.g. Forgery - try to avoid), or
+                    Statute name (e.g. Section 33 Criminal Procedure Code)'''
+
+# Compile the patterns used to classify a search
+STATUTE_SEARCH_RE = re.compile('[Aa]ct|[Cc]ode')
+SECTION_SEARCH_RE = re.compile(r'(([Ss](ection|)(s|) |)\d+)')
+SECTION_WORD_RE = re.compile('([Ss](ection|)(s|) )')
+# The statute name is a run of letters and spaces ending in `act` or `code`, matched without nested repeats,
+# which backtracked exponentially on long statute names such as the Corruption, Drug Trafficking and Other Serious Crimes Act
+STATUTE_NAME_RE = re.compile(r'[A-Za-z ]*([Aa]ct|[Cc]ode)')
+CASE_SEARCH_RE = re.compile(' [Vv] ')
+CASE_NAME_SEARCH_RE = re.compile(r'(([A-Za-z]*)(([A-Za-z]*)|(a\/l|a\/p|d\/o|s\/o| |bte|bin|and|another|anr|binti|de|the|for|other|matters))* v (([A-Za-z]*)|(s\/o| |bte|bin|and|another|anr|binti|de|the|for|other|matters))*(?=|))')
+
+# Compile the pattern of the tokens in the index
+TOKEN_RE = re.compile('[a-z0-9]+')
+
+# Set a character which sorts after every character of a token, which bounds the sorted tokens that start with a prefix
+TOKEN_END = '{'
+
+# Set the length of the n-grams of the tokens, through which the tokens containing a part of a token are found
+GRAM_SIZE = 3
+
+def _sorted_unique(values):
+    """
+    Returns the sorted distinct `values`, by sorting them and dropping the repeats next to each other,
+    which is much faster than np.unique for large arrays of integers.
+    """
+    values = np.sort(values)
+    if not len(values):
+        return values
+    return values[np.concatenate(([True], values[1:] != values[:-1]))]
+
+def _gram_code(gram):
+    """
+    Returns the n-gram `gram` as a number, with a digit in base 128 for each of its (ASCII) characters.
+    """
+    code = 0
+    for character in gram.encode('ascii'):
+        code = code * 128 + character
+    return code
+
+def classify_search(input_string):
+    """
+    Input: An `input_string` as dtype string
+    Output: The `input_string` in lowercase, with `section` or `s` removed from the section portion if available.
+    """
+    # Check if `input_string` contains `Act` or `Code`
+    if STATUTE_SEARCH_RE.search(input_string):
+        # Find the section number and remove the section or s portion, or leave it blank if there is none
+        section = SECTION_SEARCH_RE.search(input_string.lower())
+        section_num = SECTION_WORD_RE.sub("", section.group(0).strip()) if section else ""
+
+        # Lowercase the statute name
+        statute = STATUTE_NAME_RE.search(input_string.lower()).group(0).strip()
+
+        # Return section number and statute name combined
+        return section_num + " " + statute
+
+    # If input_string contains `v` within spaces, extract and lowercase the case name.
+    elif CASE_SEARCH_RE.search(input_string):
+        return CASE_NAME_SEARCH_RE.search(input_string.lower()).group(0).strip()
+
+    # If other input_string, just lowercase it
+    else:
+        return input_string.lower()
+
+def search_plan(search_string):
+    """
+    Returns the columns searched for the classified `search_string`, in the order they are tried until one has results,
+    each with whether only the rows without missing values are matched.
+    """
+    # Check if the search string contains `act` or `code` which classifies it as a statute search
+    if re.search('act|code', search_string):
+        return [('possible_statutes', True)]
+
+    # Check if the search string contains ` v ` which classifies it as a case_name search
+    elif re.search(' v ', search_string):
+        return [('case_name', False)]
+
+    # If it doesn't fit in the above, search the case names, then the offences and then the statutes
+    else:
+        return [('case_name', False), ('possible_titles', True), ('possible_statutes', True)]
+
+# Create a class for the index of one searched column, over the distinct lowercase texts of the column
+class ColumnIndex:
+
+    def __init__(self):
+        """
+        Creates an empty column index. Each row has the id of its text (or -1 if it is missing), so that a text which repeats
+        across judgments, as offences and statutes do, is tokenized, indexed and matched once. Each token maps to the
+        sorted ids of the texts which contain it.
+        """
+        # Keep the distinct texts and the id of each, the text id of each row and the text ids of each token
+        self.values = []
+        self.__ids = {}
+        self.codes = np.empty(0, dtype=np.int32)
+        self.__postings = {}
+
+        # Keep the sorted tokens and their text ids as one array once they are built,
+        # with the tokens sorted by their reversed text and the tokens of each n-gram
+        self.__vocabulary = None
+        self.__suffixes = None
+        self.__grams = None
+
+    @classmethod
+    def load(cls, base):
+        """
+        Loads the column index saved at `base` by `save`. The texts and arrays are memory-mapped, so that their pages are shared
+        by every process which loads the same index, and it cannot be updated.
+        """
+        index = cls()
+        index.values = TextTable(base + '.values')
+        index.__ids = None
+        index.codes = load_array(base + '.codes.npy')
+        index.__postings = None
+        index.__vocabulary = (TextTable(base + '.tokens').tolist(), load_array(base + '.indptr.npy'), load_array(base + '.ids.npy'))
+
+        # Map the suffix and n-gram indexes
+        index.__suffixes = load_array(base + '.suffixes.npy')
+        index.__grams = (load_array(base + '.grams.npy'), load_array(base + '.gramptr.npy'), load_array(base + '.gramkeys.npy'))
+        return index
+
+    def save(self, base):
+        """
+        Saves the texts, the text id of each row, the sorted tokens with their text ids, and the suffix and n-gram indexes at `base`.
+        """
+        tokens, indptr, ids = self.vocabulary()
+        write_texts(base + '.values', self.values)
+        np.save(base + '.codes.npy', self.codes)
+        write_texts(base + '.tokens', tokens)
+        np.save(base + '.indptr.npy', indptr)
+        np.save(base + '.ids.npy', ids)
+        np.save(base + '.suffixes.npy', self.suffixes())
+        codes, gramptr, keys = self.grams()
+        np.save(base + '.grams.npy', codes)
+        np.save(base + '.gramptr.npy', gramptr)
+        np.save(base + '.gramkeys.npy', keys)
+
+    def add(self, rows, texts):
+        """
+        Sets the text of each of `rows` to the lowercase of `texts`, where a missing text is not a string.
+        Row ids past the end of the index are appended.
+        """
+        # Raise an error for a loaded index, which is read-only
+        if self.__ids is None:
+            raise ValueError('A loaded column index cannot be updated')
+
+        codes = np.empty(len(rows), dtype=np.int32)
+        for position, text in enumerate(texts):
+            # Lowercase the text, where a missing value has no text
+            if not isinstance(text, str):
+                codes[position] = -1
+                continue
+            text = text.lower()
+
+            # Give a new text the next free id and add it to the postings of each of its tokens
+            code = self.__ids.get(text)
+            if code is None:
+                code = self.__ids[text] = len(self.values)
+                self.values.append(text)
+                for token in set(TOKEN_RE.findall(text)):
+                    self.__postings.setdefault(token, []).append(code)
+                self.__vocabulary = self.__suffixes = self.__grams = None
+            codes[position] = code
+
+        # Set the text id of each row, growing the rows if there are new ones
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) and rows.max() >= len(self.codes):
+            self.codes = np.concatenate([self.codes, np.full(rows.max() + 1 - len(self.codes), -1, dtype=np.int32)])
+        self.codes[rows] = codes
+
+    def vocabulary(self):
+        """
+        Returns the sorted tokens, with the offsets of the text ids of each token in one array of text ids.
+        """
+        if self.__vocabulary is None:
+            tokens = sorted(self.__postings)
+            lengths = [len(self.__postings[token]) for token in tokens]
+            indptr = np.zeros(len(tokens) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=indptr[1:])
+            ids = np.fromiter((code for token in tokens for code in self.__postings[token]), dtype=np.int32, count=indptr[-1])
+            self.__vocabulary = (tokens, indptr, ids)
+        return self.__vocabulary
+
+    def suffixes(self):
+        """
+        Returns the positions of the tokens in the vocabulary, sorted by the reversed text of each token,
+        so that the tokens which end with a suffix are next to each other.
+        """
+        if self.__suffixes is None:
+            tokens = self.vocabulary()[0]
+            self.__suffixes = np.array(sorted(range(len(tokens)), key=lambda key: tokens[key][::-1]), dtype=np.int32)
+        return self.__suffixes
+
+    def grams(self):
+        """
+        Returns the sorted codes (see `_gram_code`) of the n-grams of the tokens, of up to GRAM_SIZE characters, with the offsets
+        of the sorted positions of the tokens which contain each n-gram in one array of positions.
+        """
+        if self.__grams is None:
+            # Lay the characters of the tokens end to end, with the position and the end of the token of each character
+            tokens = self.vocabulary()[0]
+            lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+            characters = np.frombuffer(''.join(tokens).encode('ascii'), dtype=np.uint8).astype(np.int64)
+            owners = np.repeat(np.arange(len(tokens), dtype=np.int64), lengths)
+            ends = np.repeat(np.cumsum(lengths), lengths)
+
+            # Code the n-grams of each length which start at each character and fit within its token, paired with the token
+            pairs = []
+            for size in range(1, GRAM_SIZE + 1):
+                starts = np.flatnonzero(np.arange(len(characters)) + size <= ends)
+                codes = np.zeros(len(starts), dtype=np.int64)
+                for offset in range(size):
+                    codes = codes * 128 + characters[starts + offset]
+                pairs.append(codes * max(len(tokens), 1) + owners[starts])
+
+            # Sort the distinct pairs by n-gram and then by token, and split them into the n-grams and their tokens
+            pairs = _sorted_unique(np.concatenate(pairs))
+            grams = pairs // max(len(tokens), 1)
+            starts = np.flatnonzero(np.concatenate(([True], grams[1:] != grams[:-1]))) if len(grams) else np.empty(0, dtype=np.int64)
+            codes = grams[starts]
+            gramptr = np.append(starts, len(pairs)).astype(np.int64)
+            self.__grams = (codes, gramptr, (pairs % max(len(tokens), 1)).astype(np.int32))
+        return self.__grams
+
+    def __gram_keys(self, gram):
+        """
+        Returns the sorted positions of the tokens which contain the n-gram `gram`.
+        """
+        codes, gramptr, keys = self.grams()
+        code = _gram_code(gram)
+        position = np.searchsorted(codes, code)
+        if position < len(codes) and codes[position] == code:
+            return keys[gramptr[position]:gramptr[position + 1]]
+        return keys[:0]
+
+    def token_ids(self, token, open_start=False, open_end=False):
+        """
+        Returns the sorted ids of the texts which have `token`, or a token which ends with it if `open_start` is set,
+        starts with it if `open_end` is set, or contains it if both are set.
+        """
+        tokens, indptr, ids = self.vocabulary()
+
+        # Find the positions of the matching tokens in the vocabulary
+        if open_start and open_end:
+            # Find the tokens which have every n-gram of the token, and check that the token is within each of them
+            if len(token) <= GRAM_SIZE:
+                keys = self.__gram_keys(token)
+            else:
+                keys = self.__gram_keys(token[:GRAM_SIZE])
+                for start in range(1, len(token) - GRAM_SIZE + 1):
+                    keys = np.intersect1d(keys, self.__gram_keys(token[start:start + GRAM_SIZE]), assume_unique=True)
+                keys = [key for key in keys if token in tokens[key]]
+        elif open_start:
+            # Bisect the tokens sorted by their reversed text for the range which ends with the token
+            suffixes = self.suffixes()
+            reversed_token = token[::-1]
+            start = bisect_left(suffixes, reversed_token, key=lambda key: tokens[key][::-1])
+            end = bisect_left(suffixes, reversed_token + TOKEN_END, lo=start, key=lambda key: tokens[key][::-1])
+            keys = suffixes[start:end]
+        elif open_end:
+            # Bisect the sorted tokens for the range which starts with the token
+            start = bisect_left(tokens, token)
+            keys = range(start, bisect_left(tokens, token + TOKEN_END, lo=start))
+        else:
+            key = bisect_left(tokens, token)
+            keys = [key] if key < len(tokens) and tokens[key] == token else []
+
+        # Join the text ids of the matching tokens
+        if len(keys) == 1:
+            return np.asarray(ids[indptr[keys[0]]:indptr[keys[0] + 1]])
+        return _sorted_unique(np.concatenate([ids[indptr[key]:indptr[key + 1]] for key in keys])) if len(keys) else np.empty(0, dtype=np.int32)
+
+    def match(self, search_string, token_ids=None):
+        """
+        Returns the sorted ids of the texts which contain `search_string`. The candidates are the texts which have every token
+        of the search string, and each candidate is then checked for the whole search string.
+        `token_ids` keeps the text ids of each token across the searches of a batch, so that each token is looked up once.
+        """
+        candidates = None
+        for match in TOKEN_RE.finditer(search_string):
+            token = match.group(0)
+
+            # A token at the start or end of the search string may be part of a longer token in the text
+            key = (token, match.start() == 0, match.end() == len(search_string))
+            if token_ids is not None and key in token_ids:
+                ids = token_ids[key]
+            else:
+                ids = self.token_ids(*key)
+                if token_ids is not None:
+                    token_ids[key] = ids
+
+            # Keep the texts which have every token
+            candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+            if not len(candidates):
+                break
+
+        # Every text is a candidate if the search string has no tokens
+        if candidates is None:
+            candidates = range(len(self.values))
+
+        # Check that the search string is within each candidate
+        return np.array([code for code in candidates if search_string in self.values[code]], dtype=np.int32)
+
+    def rows(self, ids):
+        """
+        Returns the sorted row ids whose text is one of `ids`.
+        """
+        return np.flatnonzero(np.isin(self.codes, ids))
+
+# Create a class for the inverted index of the database
+class SearchIndex:
+
+    def __init__(self, database_df=None, snapshot=None):
+        """
+        Builds the search index of `database_df`, a database in the .csv layout, or loads the index of a `snapshot` (see snapshot.py).
+        Each searched column is indexed over its distinct lowercase texts (see ColumnIndex).
+        The index of a snapshot is memory-mapped from the arrays written with it, so that its pages are shared by every process
+        serving the snapshot, and the rows of each result are decoded from the snapshot when they are returned.
+        """
+        # Keep the database with the row ids as its index, or the snapshot which the rows are read from
+        self.snapshot = snapshot
+        self.database = None if snapshot is not None else database_df.reset_index(drop=True)
+
+        # Load the index of a snapshot
+        if snapshot is not None:
+            directory = os.path.join(snapshot.path, 'index')
+            self.rows = None
+            self.__columns = {column: ColumnIndex.load(os.path.join(directory, str(number))) for number, column in enumerate(SEARCH_COLUMNS)}
+            self.__complete = load_array(os.path.join(directory, 'complete.npy'))
+            self.citations = CitationGraph.load(os.path.join(directory, 'citations'))
+            return
+
+        # Instantiate the row id of each link and the index of each searched column
+        self.rows = {}
+        self.__columns = {column: ColumnIndex() for column in SEARCH_COLUMNS}
+
+        # Keep which rows have no missing values, as only those are searched for offences and statutes
+        self.__complete = np.empty(0, dtype=bool)
+
+        # Create the citation graph with the same row ids
+        self.citations = CitationGraph()
+
+        # Index every row
+        self.__index_rows(list(range(len(self.database))), self.database)
+
+    @classmethod
+    def from_store(cls):
+        """
+        Builds the search index of the database in its columnar store.
+        """
+        return cls(ColumnarStore.for_table('database').read(flat=True))
+
+    @classmethod
+    def from_snapshot(cls, directory='../data/snapshots'):
+        """
+        Loads the search index of the current serving snapshot of the database.
+        Raises a FileNotFoundError if the snapshot was published without its index.
+        """
+        snapshot = Snapshot(directory)
+        if not os.path.isdir(os.path.join(snapshot.path, 'index')):
+            raise FileNotFoundError(f'The snapshot {snapshot.version} has no search index; publish it again with build-db')
+        return cls(snapshot=snapshot)
+
+    def save(self, directory):
+        """
+        Saves the index of each searched column, the complete rows and the citation graph in `directory`.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for number, column in enumerate(SEARCH_COLUMNS):
+            self.__columns[column].save(os.path.join(directory, str(number)))
+        np.save(os.path.join(directory, 'complete.npy'), self.__complete)
+        self.citations.save(os.path.join(directory, 'citations'))
+
+    def __len__(self):
+        return len(self.__complete)
+
+    def frame(self, rows, columns=RESULT_COLUMNS):
+        """
+        Returns the `columns` of `rows` as a dataframe indexed by their row ids, from the database or decoded from the snapshot.
+        """
+        if self.snapshot is not None:
+            return self.snapshot.frame(rows, columns)
+        return self.database.loc[rows, columns]
+
+    def column(self, name):
+        """
+        Returns the values of the column `name` for every row as a series.
+        """
+        if self.snapshot is not None:
+            return pd.Series(self.snapshot.column(name))
+        return self.database[name]
+
+    def __index_rows(self, rows, frame):
+        """
+        Adds the text of each row of `frame` to the index as the row id in `rows`.
+        Row ids past the end of the index are appended.
+        """
+        # Set the row id of each link, and whether each row has no missing values
+        self.rows.update(zip(frame['link'].tolist(), rows))
+        complete = frame.notna().all(axis=1).to_numpy()
+        if len(rows) and max(rows) >= len(self.__complete):
+            self.__complete = np.concatenate([self.__complete, np.zeros(max(rows) + 1 - len(self.__complete), dtype=bool)])
+        self.__complete[rows] = complete
+
+        # Add the cases cited by each row to the citation graph
+        self.citations.update(rows, frame['citations'].tolist())
+
+        # Add the text of each searched column
+        for column in SEARCH_COLUMNS:
+            self.__columns[column].add(rows, frame[column].tolist())
+
+    def update(self, database):
+        """
+        Updates the index with the rows of `database`, which are new or replace the row with the same link.
+        """
+        # Raise an error for the index of a snapshot, as a snapshot is read-only
+        if self.snapshot is not None:
+            raise ValueError('The search index of a snapshot cannot be updated')
+
+        database = database.reindex(columns=self.database.columns)
+
+        # Find the row id of each row, where a new link is given the next free row id
+        rows = []
+        next_row = len(self.database)
+        for link in database['link'].tolist():
+            row = self.rows.get(link)
+            if row is None:
+                row = next_row
+                next_row += 1
+            rows.append(row)
+
+        # Replace the changed rows in place and append the new ones
+        database.index = rows
+        changed = database[database.index < len(self.database)]
+        self.database.loc[changed.index] = changed
+        self.database = pd.concat([self.database, database[database.index >= len(self.database)]])
+        self.__index_rows(rows, database)
+
+    def __match(self, column, search_string, complete=False, token_ids=None):
+        """
+        Returns the sorted row ids which contain `search_string` in `column` as an array.
+        If `complete` is set, only the rows without missing values are matched.
+        """
+        index = self.__columns[column]
+        rows = index.rows(index.match(search_string, token_ids))
+        if complete:
+            rows = rows[self.__complete[rows]]
+        return rows
+
+    def match(self, column, search_string, complete=False):
+        """
+        Returns the sorted row ids which contain `search_string` in `column`.
+        If `complete` is set, only the rows without missing values are matched.
+        """
+        return self.__match(column, search_string, complete).tolist()
+
+    def match_many(self, column, search_strings, complete=False):
+        """
+        Returns a dictionary of each of `search_strings` to the sorted row ids which contain it in `column`, as an array.
+        The texts of each token are looked up once for the whole batch.
+        If `complete` is set, only the rows without missing values are matched.
+        """
+        token_ids = {}
+        return {search_string: self.__match(column, search_string, complete, token_ids) for search_string in dict.fromkeys(search_strings)}
+
+    def search(self, input_string):
+        """
+        Input: An `input_string` as dtype string
+        Output: A dataframe of rows from the database which contain the `input_string` in the relevant column,
+        or None if an unclassified search has no results, where the caller decides what to show (e.g. NO_RESULTS).
+        """
+        # Call the classify_search function to convert the `input_string`
+        search_string = classify_search(input_string)
+
+        # Search the columns of the search string in turn until one has results
+        plan = search_plan(search_string)
+        for column, complete in plan:
+            rows = self.match(column, search_string, complete=complete)
+            if rows:
+                break
+
+        # If no column of an unclassified search has results, return None
+        if not rows and len(plan) > 1:
+            return None
+
+        return self.frame(rows)
+
+    def search_many(self, input_strings, n=10):
+        """
+        Searches each of `input_strings` as `search` does and returns a BatchResult with the results and statistics of every search.
+        The searches are classified together and each column is searched once for all of them, so that a batch of many statutes or offences
+        shares the lookups of their common tokens and texts. The `n` most cited cases of each search are counted in one pass.
+        """
+        # Classify each distinct search once
+        input_strings = list(input_strings)
+        search_strings = {input_string: classify_search(input_string) for input_string in dict.fromkeys(input_strings)}
+        plans = {search_string: search_plan(search_string) for search_string in search_strings.values()}
+
+        # Search each column for the searches which have no results yet, in the order of their plans
+        rows = {}
+        for step in range(max((len(plan) for plan in plans.values()), default=0)):
+            pending = {}
+            for search_string, plan in plans.items():
+                if step < len(plan) and (search_string not in rows or not len(rows[search_string])):
+                    pending.setdefault(plan[step], []).append(search_string)
+            for (column, complete), pending_strings in pending.items():
+                rows.update(self.match_many(column, pending_strings, complete=complete))
+
+        # Leave unclassified searches without results unfound, as `search` does
+        found = {search_string: rows[search_string] if len(rows[search_string]) or len(plans[search_string]) == 1 else None
+                 for search_string in plans}
+        return BatchResult(input_strings, [search_strings[input_string] for input_string in input_strings],
+                           [found[search_strings[input_string]] for input_string in input_strings], self, n)
+
+# Create a class for the result of a search, which is shared by the results table, the statistics and the plot
+class SearchResult:
+
+    def __init__(self, search_string, results, citation_graph):
+        """
+        Creates the result of a search for `search_string`, where `results` are the matching rows or None if there are none.
+        The citations of the results are counted in `citation_graph`, whose row ids are the index of `results`.
+        """
+        self.search_string = search_string
+        self.citation_graph = citation_graph
+        self.rows = [] if results is None else results.index.tolist()
+        self.results = None if results is None else results.reset_index(drop=True)
+
+        # Keep the top citations once they are counted
+        self.__citations = None
+
+    @property
+    def found(self):
+        return self.results is not None
+
+    @property
+    def mitigation_rate(self):
+        return self.results.mitigation_discussed.mean()
+
+    @property
+    def aggravated_rate(self):
+        return self.results.aggravation_discussed.mean()
+
+    def mitigating(self):
+        """
+        Returns the mitigation rate of the search as a sentence.
+        """
+        return f'Mitigating factors were discussed in {round(self.mitigation_rate*100,1)}% of the cases for this search.'
+
+    def aggravating(self):
+        """
+        Returns the aggravated rate of the search as a sentence.
+        """
+        return f'Aggravating factors were discussed in {round(self.aggravated_rate*100,1)}% of the cases for this search.'
+
+    def citations(self):
+        """
+        Returns the number of results citing each case, from the most to the least cited.
+        """
+        if self.__citations is None:
+            self.__citations = self.citation_graph.top_cited(self.rows, n=None)
+        return self.__citations
+
+    def top_citations(self, n=10):
+        """
+        Returns the `n` most cited cases of the search.
+        """
+        return self.citations().head(n)
+
+# Create a class for the results of a batch of searches, with the statistics of every search in one table
+class BatchResult:
+
+    def __init__(self, input_strings, search_strings, rows, search_index, n=10):
+        """
+        Creates the results of the searches for `input_strings`, classified as `search_strings`, where `rows` are the sorted row ids
+        of `search_index` matching each search, or None if it has no results. The rates and the `n` most cited cases of every search
+        are computed together from the rows of all the searches.
+        """
+        self.input_strings = input_strings
+        self.search_strings = search_strings
+        self.rows = rows
+        self.search_index = search_index
+
+        # Join the rows of every search, keeping the position of the search of each row
+        groups = [np.empty(0, dtype=np.int64) if row_ids is None else row_ids for row_ids in rows]
+        all_rows = np.concatenate(groups) if groups else np.empty(0, dtype=np.int64)
+        positions = np.repeat(np.arange(len(groups)), [len(group) for group in groups])
+
+        # Set the table of the number of results and the rates of each search, where the rates skip missing values
+        self.statistics = pd.DataFrame({'input_string': input_strings, 'search_string': search_strings,
+                                        'found': [row_ids is not None for row_ids in rows],
+                                        'results': [len(group) for group in groups]})
+        for rate, column in (('aggravated_rate', 'aggravation_discussed'), ('mitigation_rate', 'mitigation_discussed')):
+            values = pd.to_numeric(search_index.column(column), errors='coerce').to_numpy(dtype=float)[all_rows]
+            valid = ~np.isnan(values)
+            sums = np.bincount(positions[valid], weights=values[valid], minlength=len(groups))
+            counts = np.bincount(positions[valid], minlength=len(groups))
+            self.statistics[rate] = np.divide(sums, counts, out=np.full(len(groups), np.nan), where=counts > 0)
+
+        # Set the table of the most cited cases of each search
+        top_citations = search_index.citations.top_cited_groups(groups, n)
+        self.top_citations = pd.DataFrame({'input_string': np.array(input_strings, dtype=object)[top_citations['group'].to_numpy()],
+                                           'cited': top_citations['cited'], 'count': top_citations['count']})
+
+    def __len__(self):
+        return len(self.input_strings)
+
+    def result(self, position):
+        """
+        Returns the SearchResult of the search at `position`, e.g. to show its results table.
+        """
+        row_ids = self.rows[position]
+        results = None if row_ids is None else self.search_index.frame(row_ids)
+        return SearchResult(self.search_strings[position], results, self.search_index.citations)
+
+# Create a class for the cache of search results
+class QueryCache:
+
+    def __init__(self, loader=SearchIndex.from_store, version=None, maxsize=256, ttl=600):
+        """
+        Creates a least recently used cache of up to `maxsize` search results, each kept for up to `ttl` seconds.
+        Results are keyed by the classified search string, so searches which only differ in case share a result.
+        `loader` builds the search index, and `version` returns a token of the database which is checked on each search;
+        when it changes, the cache is cleared and the index is built again.
+        """
+        # Set the cache settings
+        self.loader = loader
+        self.version = version or ColumnarStore.for_table('database').version
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        # Count the cache hits and misses
+        self.hits = 0
+        self.misses = 0
+
+        # Lock the cache so that it can be shared by the threads of the app
+        self.__lock = threading.Lock()
+        self.__results = OrderedDict()
+        self.__version = None
+        self.index = None
+
+    def __check_version(self):
+        """
+        Clears the cache and builds the index again if the database has changed.
+        """
+        version = self.version()
+        if version != self.__version:
+            self.index = self.loader()
+            self.__results.clear()
+            self.__version = version
+
+    def search(self, input_string):
+        """
+        Returns the SearchResult of `input_string`, from the cache if it was searched recently.
+        """
+        search_string = classify_search(input_string)
+        with self.__lock:
+            self.__check_version()
+
+            # Return the cached result if it has not expired
+            cached = self.__results.get(search_string)
+            if cached is not None and time.monotonic() - cached[0] < self.ttl:
+                self.__results.move_to_end(search_string)
+                self.hits += 1
+                return cached[1]
+
+            # Count the miss while holding the lock, as the app's threads miss at the same time
+            self.misses += 1
+            index = self.index
+
+        # Search outside the lock so that other searches are not blocked
+        result = SearchResult(search_string, index.search(input_string), index.citations)
+
+        # Cache the result, dropping the least recently used results if the cache is full
+        with self.__lock:
+            if self.index is index:
+                self.__results[search_string] = (time.monotonic(), result)
+                self.__results.move_to_end(search_string)
+                while len(self.__results) > self.maxsize:
+                    self.__results.popitem(last=False)
+
+        return result
+
+    def current_index(self):
+        """
+        Returns the search index of the current version of the database.
+        """
+        with self.__lock:
+            self.__check_version()
+            return self.index
+
+    def clear(self):
+        """
+        Clears the cached results.
+        """
+        with self.__lock:
+            self.__results.clear()
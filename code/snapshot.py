@@ -0,0 +1,248 @@
+# Import the required packages/modules
+
+from datetime import datetime
+import json
+import mmap
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+# Set the columns which are stored as codes into a table of their few distinct values
+CATEGORY_COLUMNS = ('tribunal/court', 'court_tag')
+
+# Set the columns which are stored as integer flags
+FLAG_COLUMNS = ('mitigation_discussed', 'aggravation_discussed')
+
+# Set the byte which ends each value of a text column
+SEPARATOR = b'\x00'
+
+def write_texts(base, values):
+    """
+    Writes the strings `values` as one blob of separated values at `base`.bin, with the byte offset of each value at `base`.offsets.npy.
+    """
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) + 1 for value in encoded], out=offsets[1:])
+    with open(base + '.bin', 'wb') as file:
+        file.write(SEPARATOR.join(encoded) + (SEPARATOR if encoded else b''))
+    np.save(base + '.offsets.npy', offsets)
+
+def publish_snapshot(database_df, directory='../data/snapshots', keep=2):
+    """
+    Writes `database_df`, a database in the .csv layout, as a new read-only snapshot in `directory` and makes it current.
+    Returns the version of the snapshot. Only the `keep` latest snapshots are kept.
+    Text columns are written as one blob of separated values with the byte offset of each value,
+    and the other columns as arrays, so that a snapshot is opened with `mmap` instead of being parsed.
+    The search index of the database is written with it as arrays (see search.py), which the app's workers map instead of building.
+    """
+    # Import the search index here, as the search module opens snapshots
+    from search import SearchIndex
+
+    # Name the snapshot after the time it was published
+    version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    path = os.path.join(directory, version)
+    os.makedirs(path + '.tmp')
+
+    columns = []
+    for number, column in enumerate(database_df.columns):
+        values = database_df[column]
+        base = os.path.join(path + '.tmp', str(number))
+
+        # Store the few distinct values of a category as a table, with a code into it for each row
+        if column in CATEGORY_COLUMNS:
+            codes, table = pd.factorize(values)
+            np.save(base + '.codes.npy', codes.astype(np.int16))
+            columns.append({'name': column, 'kind': 'category', 'values': list(table)})
+
+        # Store the flags as small integers
+        elif column in FLAG_COLUMNS:
+            np.save(base + '.npy', values.fillna(0).to_numpy(dtype=np.int8))
+            columns.append({'name': column, 'kind': 'flag'})
+
+        # Store the text of each row followed by the separator, with the byte offset of each row
+        else:
+            missing = values.isna().to_numpy()
+            write_texts(base, ['' if is_missing else str(value) for value, is_missing in zip(values.tolist(), missing)])
+            np.save(base + '.missing.npy', missing)
+            columns.append({'name': column, 'kind': 'text'})
+
+    # Write the search index
+    SearchIndex(database_df).save(os.path.join(path + '.tmp', 'index'))
+
+    # Write the metadata and move the complete snapshot into place
+    with open(os.path.join(path + '.tmp', 'meta.json'), 'w', encoding='utf_8') as file:
+        json.dump({'version': version, 'rows': len(database_df), 'columns': columns}, file)
+    os.replace(path + '.tmp', path)
+
+    # Point to the new snapshot, replacing the pointer in one step so that readers never see a partial update
+    with open(os.path.join(directory, 'CURRENT.tmp'), 'w', encoding='utf_8') as file:
+        file.write(version)
+    os.replace(os.path.join(directory, 'CURRENT.tmp'), os.path.join(directory, 'CURRENT'))
+
+    # Remove the older snapshots. A snapshot maps all of its files when it is opened, so workers which still serve
+    # a removed snapshot keep reading its unlinked files until they switch to the new one
+    versions = sorted(name for name in os.listdir(directory) if name.isdigit())
+    for name in versions[:-keep]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    return version
+
+def current_version(directory='../data/snapshots'):
+    """
+    Returns the version of the current snapshot in `directory`, or None if there is none.
+    """
+    try:
+        with open(os.path.join(directory, 'CURRENT'), 'r', encoding='utf_8') as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+def _map(path):
+    """
+    Memory-maps the file at `path` read-only, or reads it if it is empty as an empty file cannot be mapped.
+    """
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def load_array(path):
+    """
+    Memory-maps the array saved at `path`, or loads it if it is empty as an empty file cannot be mapped.
+    """
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        return np.load(path)
+
+# Create a class for a read-only table of strings written by `write_texts`
+class TextTable:
+
+    def __init__(self, base):
+        """
+        Memory-maps the strings at `base`, which are decoded one at a time when they are read.
+        """
+        self.__blob = _map(base + '.bin')
+        self.__offsets = load_array(base + '.offsets.npy')
+
+    def __len__(self):
+        return len(self.__offsets) - 1
+
+    def __getitem__(self, position):
+        return self.__blob[self.__offsets[position]:self.__offsets[position + 1] - 1].decode('utf-8')
+
+    def tolist(self):
+        """
+        Returns every string, decoding the whole blob at once.
+        """
+        return bytes(self.__blob[:]).decode('utf-8').split('\x00')[:-1]
+
+# Create a class for a read-only serving snapshot of the database
+class Snapshot:
+
+    def __init__(self, directory='../data/snapshots', version=None):
+        """
+        Opens the snapshot `version` in `directory`, or the current one. Nothing is parsed when it is opened:
+        the columns are memory-mapped, so their pages are only read when used and are shared by every process
+        which opens the same snapshot. Every file is mapped at once, so that the snapshot stays readable
+        after a later publish removes it.
+        """
+        self.version = version or current_version(directory)
+        if self.version is None:
+            raise FileNotFoundError(f'There is no snapshot in {directory}')
+        self.path = os.path.join(directory, self.version)
+
+        # Load the metadata of the columns
+        with open(os.path.join(self.path, 'meta.json'), 'r', encoding='utf_8') as file:
+            meta = json.load(file)
+        self.rows = meta['rows']
+        self.columns = [column['name'] for column in meta['columns']]
+        self.__meta = {column['name']: (number, column) for number, column in enumerate(meta['columns'])}
+
+        # Map the files of every column
+        self.__mapped = {}
+        for name in self.columns:
+            self.__files(name)
+
+    def __len__(self):
+        return self.rows
+
+    def __files(self, name):
+        """
+        Returns the mapped files of the column `name`, opening them on first use.
+        """
+        if name not in self.__mapped:
+            number, column = self.__meta[name]
+            base = os.path.join(self.path, str(number))
+            if column['kind'] == 'category':
+                self.__mapped[name] = (load_array(base + '.codes.npy'),)
+            elif column['kind'] == 'flag':
+                self.__mapped[name] = (load_array(base + '.npy'),)
+            else:
+                self.__mapped[name] = (_map(base + '.bin'), load_array(base + '.offsets.npy'), load_array(base + '.missing.npy'))
+        return self.__mapped[name]
+
+    def complete(self):
+        """
+        Returns whether each row has no missing values, from the mapped columns without decoding them.
+        """
+        complete = np.ones(self.rows, dtype=bool)
+        for name in self.columns:
+            kind = self.__meta[name][1]['kind']
+            if kind == 'category':
+                complete &= np.asarray(self.__files(name)[0]) >= 0
+            elif kind == 'text':
+                complete &= ~np.asarray(self.__files(name)[2])
+        return complete
+
+    def column(self, name, rows=None):
+        """
+        Returns the values of the column `name` as a list or array, for every row or only for `rows`.
+        """
+        kind = self.__meta[name][1]['kind']
+        files = self.__files(name)
+
+        # Look up the value of each code, where a missing value has the code -1
+        if kind == 'category':
+            codes = files[0] if rows is None else files[0][rows]
+            table = np.array(self.__meta[name][1]['values'] + [np.nan], dtype=object)
+            return table[codes].tolist()
+
+        # Widen the flags to the integers of the .csv layout
+        if kind == 'flag':
+            return np.asarray(files[0] if rows is None else files[0][rows], dtype=np.int64)
+
+        blob, offsets, missing = files
+
+        # Decode the whole blob at once, or only the bytes of the given rows
+        if rows is None:
+            values = bytes(blob[:]).decode('utf-8').split('\x00')[:-1]
+        else:
+            values = [blob[offsets[row]:offsets[row + 1] - 1].decode('utf-8') for row in rows]
+            missing = missing[rows]
+
+        # Set the missing values
+        if missing.any():
+            values = [np.nan if is_missing else value for value, is_missing in zip(values, missing.tolist())]
+        return values
+
+    def frame(self, rows=None, columns=None):
+        """
+        Returns the snapshot as a dataframe in the .csv layout, for every row or only for `rows`,
+        and for every column or only for `columns`.
+        """
+        rows = None if rows is None else list(rows)
+        frame = pd.DataFrame({name: self.column(name, rows) for name in (columns or self.columns)})
+        if rows is not None:
+            frame.index = rows
+        return frame
+
+    def close(self):
+        """
+        Closes the mapped files of the snapshot.
+        """
+        for files in self.__mapped.values():
+            if isinstance(files[0], mmap.mmap):
+                files[0].close()
+        self.__mapped = {}
@@ -0,0 +1,209 @@
+# Import the required packages/modules
+
+import glob
+import os
+import re
+import pandas as pd
+import numpy as np
+
+# Set the columns which are stored as lists instead of comma-joined strings
+LIST_COLUMNS = ('possible_titles', 'possible_statutes', 'citations')
+
+# Set the columns which are stored as dates, with the format they have in the .csv files,
+# where "{day}" is the day of the month without zero-padding, as the judgments write it
+DATE_COLUMNS = {'decision_date': '{day} %B %Y', 'date': '%Y-%m-%d'}
+
+# Set the date columns whose text is kept alongside the parsed date, as it is taken from the judgments as written,
+# so that a date which does not parse is not lost and the .csv layout gives back the text which was stored
+TEXT_DATE_COLUMNS = ('decision_date',)
+
+# Set the columns which are stored as integer flags
+FLAG_COLUMNS = ('mitigation_discussed', 'aggravation_discussed')
+
+# Set the pattern of the partition file names
+PART_RE = re.compile(r'part-(\d+)\.parquet$')
+
+def _to_list(value):
+    """
+    Returns a comma-joined string, or a list which is already split, as a list.
+    """
+    if isinstance(value, str):
+        return value.split(',') if value else []
+    if isinstance(value, float) or value is None:
+        return []
+    return list(value)
+
+def _format_date(value, format):
+    """
+    Returns the date `value` in the `format` of DATE_COLUMNS, or a missing value if it is missing.
+    """
+    if pd.isna(value):
+        return np.nan
+    return value.strftime(format).replace('{day}', str(value.day))
+
+def to_typed(df):
+    """
+    Converts a dataframe in the .csv layout to typed columns: parsed dates, integer flags and lists.
+    The text of each date of TEXT_DATE_COLUMNS is kept in a "_text" column, e.g. "decision_date_text".
+    """
+    df = df.copy()
+    for column in df.columns:
+        # Split the comma-joined strings into lists, where a missing value is an empty list
+        if column in LIST_COLUMNS:
+            df[column] = [_to_list(value) for value in df[column]]
+
+        # Parse the dates in the format of the .csv files, or keep dates which are already parsed
+        elif column in DATE_COLUMNS:
+            # Keep the text of the dates taken from the judgments, before a date in another format is parsed as missing
+            if column in TEXT_DATE_COLUMNS and not pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[f'{column}_text'] = df[column].astype('string')
+            df[column] = pd.to_datetime(df[column], format=DATE_COLUMNS[column].replace('{day}', '%d'), errors='coerce')
+
+        # Store the flags as small integers
+        elif column in FLAG_COLUMNS:
+            df[column] = df[column].fillna(0).astype('int8')
+
+    return df
+
+def to_flat(df):
+    """
+    Converts a dataframe with typed columns back to the .csv layout of comma-joined strings and formatted dates.
+    """
+    df = df.copy()
+    for column in df.columns:
+        # Join the lists, where an empty list is a missing value as when the .csv file is read
+        if column in LIST_COLUMNS:
+            df[column] = [','.join(value) if len(value) else np.nan for value in df[column]]
+
+        # Format the dates, or give back the text they were parsed from if it was kept
+        elif column in DATE_COLUMNS:
+            text = df[f'{column}_text'] if f'{column}_text' in df.columns else pd.Series(np.nan, index=df.index)
+            dates = text.astype(object).where(text.notna(), np.nan)
+            missing = text.isna().to_numpy()
+            dates[missing] = [_format_date(value, DATE_COLUMNS[column]) for value in df[column][missing]]
+            df[column] = dates
+
+        elif column in FLAG_COLUMNS:
+            df[column] = df[column].astype('int64')
+
+    # Drop the kept text of the dates, which is in the date columns again
+    return df.drop(columns=[f'{column}_text' for column in TEXT_DATE_COLUMNS if f'{column}_text' in df.columns])
+
+# Create a class for a table stored as partitioned Parquet files
+class ColumnarStore:
+
+    def __init__(self, directory, key='link', csv_path=None, max_parts=32):
+        """
+        Creates the store of a table in `directory`, where each write appends a new Parquet partition
+        instead of rewriting the whole table. The latest row for each `key` wins when the table is read.
+        A store which is empty is seeded from the .csv file at `csv_path` if it exists.
+        Once there are more than `max_parts` partitions they are compacted into one.
+        """
+        # Set the store settings
+        self.directory = directory
+        self.key = key
+        self.csv_path = csv_path
+        self.max_parts = max_parts
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def for_table(cls, name, key='link'):
+        """
+        Loads the store of the table `name`, e.g. "database" or "supremecourt_compiled", seeded from its .csv file.
+        """
+        return cls(f'../data/{name}', key=key, csv_path=f'../data/{name}.csv')
+
+    def parts(self):
+        """
+        Returns the paths of the partitions in the order they were written.
+        """
+        paths = [path for path in glob.glob(os.path.join(self.directory, 'part-*.parquet')) if PART_RE.search(path)]
+        return sorted(paths, key=lambda path: int(PART_RE.search(path).group(1)))
+
+    def version(self):
+        """
+        Returns a token which changes whenever the table is written, from the names and modification times of its partitions.
+        """
+        return tuple((os.path.basename(path), os.stat(path).st_mtime_ns) for path in self.parts())
+
+    def __write_part(self, df, number):
+        """
+        Writes `df` as the partition `number`, moving it into place once it is complete.
+        """
+        path = os.path.join(self.directory, f'part-{number:06d}.parquet')
+        df.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+    def __next_number(self):
+        """
+        Returns the number of the next partition.
+        """
+        parts = self.parts()
+        return int(PART_RE.search(parts[-1]).group(1)) + 1 if parts else 0
+
+    def __seeded_parts(self):
+        """
+        Returns the paths of the partitions, after seeding an empty store from its .csv file.
+        """
+        parts = self.parts()
+        if not parts and self.csv_path and os.path.exists(self.csv_path):
+            self.__write_part(to_typed(pd.read_csv(self.csv_path)), 0)
+            parts = self.parts()
+        return parts
+
+    def read(self, flat=False):
+        """
+        Reads the table with typed columns, where lists are read back as arrays, or in the .csv layout if `flat` is set.
+        """
+        # Seed an empty store from the .csv file
+        parts = self.__seeded_parts()
+
+        # Return an empty dataframe if there is nothing stored yet
+        if not parts:
+            return pd.DataFrame()
+
+        # Read the partitions in order and keep the latest row for each key
+        df = pd.concat([pd.read_parquet(path) for path in parts], ignore_index=True)
+        df = df.drop_duplicates(subset=self.key, keep='last').reset_index(drop=True)
+
+        return to_flat(df) if flat else df
+
+    def keys(self):
+        """
+        Returns the set of keys in the table, reading only the key column of each partition.
+        """
+        keys = set()
+        for path in self.__seeded_parts():
+            keys.update(pd.read_parquet(path, columns=[self.key])[self.key])
+        return keys
+
+    def append(self, df):
+        """
+        Appends the rows of `df`, in the .csv layout or with typed columns, as a new partition.
+        Rows with the key of an existing row replace it.
+        """
+        # Skip if there is nothing to append
+        if df.empty:
+            return
+
+        self.__write_part(to_typed(df), self.__next_number())
+
+        # Compact the partitions once there are too many of them
+        if len(self.parts()) > self.max_parts:
+            self.compact()
+
+    def compact(self):
+        """
+        Rewrites the table as a single partition without the rows which were replaced.
+        """
+        # Write the compacted table before removing the old partitions, so that an interruption loses nothing
+        parts = self.parts()
+        self.__write_part(self.read(), self.__next_number())
+        for path in parts:
+            os.remove(path)
+
+    def export_csv(self, path=None):
+        """
+        Exports the table in the .csv layout to `path`, or to the .csv file it was seeded from.
+        """
+        self.read(flat=True).to_csv(path_or_buf=path or self.csv_path, index=False)
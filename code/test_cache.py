@@ -0,0 +1,85 @@
+# Import the required packages/modules
+
+import os
+import re
+from benchmarks import scratch_tree
+from cache import ExtractionCache
+from corpus import StubServer, SyntheticCorpus
+from criminalcasedatabase import Court, Database
+from judgmentarchive import open_archive
+from linkindex import LinkIndex
+from metrics import Metrics
+from progress import NullProgress
+
+def _update_database(version=None):
+    """
+    Updates the database from the archived judgments of the supreme court and returns it, with the extractions cached
+    under the extractor `version` if given.
+    """
+    database = Database(progress=NullProgress(), metrics=Metrics(path=None))
+    if version is not None:
+        database.cache.version = version
+    database.create_database('supreme')
+    return database
+
+def test_rearchived_judgment_is_extracted_again(monkeypatch):
+    """
+    Updating the database again extracts nothing, except a judgment which was archived again with other html,
+    whose row is replaced by the new extraction.
+    """
+    # Run from the code folder, as the scratch tree copies the repository's data relative to it
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+    corpus = SyntheticCorpus(10)
+
+    with scratch_tree(), StubServer(corpus) as server:
+        court = Court('supreme', requests_per_second=None, base_url=server.url, progress=NullProgress(), metrics=Metrics(path=None))
+        court.pull_urls()
+        court.archive()
+        first = _update_database()
+        unchanged = _update_database()
+
+        # Archive the first judgment again with another decision date
+        link = first.database_df['link'][0]
+        archive = open_archive('supreme', LinkIndex.for_court('supreme'))
+        html = re.sub(r'Decision Date : [^<]*', 'Decision Date : 1 January 1999 ', archive.read(link))
+        archive.write(link, [html.encode('utf-8')])
+        rearchived = _update_database()
+
+    assert (first.cache.hits, first.cache.misses) == (0, 10)
+    assert (unchanged.cache.hits, unchanged.cache.misses) == (10, 0)
+    assert (rearchived.cache.hits, rearchived.cache.misses) == (9, 1)
+    assert len(rearchived.database_df) == 10
+    assert rearchived.database_df.loc[rearchived.database_df['link'] == link, 'decision_date'].tolist() == ['1 January 1999']
+
+def test_extractor_version_bump_extracts_again(monkeypatch):
+    """
+    Updating the database with a new version of the extractors extracts every judgment again.
+    """
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+    corpus = SyntheticCorpus(10)
+
+    with scratch_tree(), StubServer(corpus) as server:
+        court = Court('supreme', requests_per_second=None, base_url=server.url, progress=NullProgress(), metrics=Metrics(path=None))
+        court.pull_urls()
+        court.archive()
+        first = _update_database()
+        bumped = _update_database(version=first.cache.version + ',date=2')
+        unchanged = _update_database(version=first.cache.version + ',date=2')
+
+    assert (bumped.cache.hits, bumped.cache.misses) == (0, 10)
+    assert (unchanged.cache.hits, unchanged.cache.misses) == (10, 0)
+    assert bumped.database_df.sort_values('link').to_dict('records') == first.database_df.sort_values('link').to_dict('records')
+
+def test_cache_entry_of_other_version_is_a_miss(tmp_path):
+    """
+    An extraction cached by one version of the extractors is a hit for the same version and a miss for another.
+    """
+    digest = '0' * 64
+    ExtractionCache(str(tmp_path), version='date=1').put(digest, {'case_name': 'Public Prosecutor v Tan'})
+
+    same = ExtractionCache(str(tmp_path), version='date=1')
+    other = ExtractionCache(str(tmp_path), version='date=2')
+
+    assert same.get(digest) == {'case_name': 'Public Prosecutor v Tan'}
+    assert other.get(digest) is None
+    assert (same.hits, same.misses, other.hits, other.misses) == (1, 0, 0, 1)
@@ -0,0 +1,49 @@
+# Import the required packages/modules
+
+from citations import CitationResolver
+
+def test_longest_variant_is_resolved():
+    """
+    A citation with its neutral citation resolves to the judgment with that citation only,
+    and not also to a judgment whose case name is the start of it.
+    """
+    resolver = CitationResolver(['full', 'short'], ['Public Prosecutor v Tan Ah Kow [2021] SGHC 13', 'Public Prosecutor v Tan'])
+
+    assert resolver.resolve('As held in Public Prosecutor v Tan Ah Kow [2021] SGHC 13, the sentence stands.') == ['full']
+    assert resolver.resolve('As held in Public Prosecutor v Tan Ah Kow, the sentence stands.') == ['full']
+    assert resolver.resolve('As held in Public Prosecutor v Tan, the sentence stands.') == ['short']
+
+def test_leftmost_of_overlapping_variants_is_resolved():
+    """
+    Of two case names which overlap in the text, the one which starts first is resolved and the other is not.
+    """
+    resolver = CitationResolver(['left', 'right'], ['Lim Bee Hoon v Tan', 'Tan v Public Prosecutor'])
+
+    assert resolver.resolve('In Lim Bee Hoon v Tan v Public Prosecutor the appeal failed.') == ['left']
+    assert resolver.resolve('In Tan v Public Prosecutor the appeal failed.') == ['right']
+
+def test_ambiguous_variant_is_left_unresolved():
+    """
+    A case name which names more than one judgment is counted as ambiguous and not resolved,
+    while the same name with a neutral citation still resolves to its judgment.
+    """
+    resolver = CitationResolver(['2020', '2021'], ['Public Prosecutor v Tan [2020] SGHC 1', 'Public Prosecutor v Tan [2021] SGHC 2'])
+
+    assert resolver.resolve('See Public Prosecutor v Tan, where the charge was withdrawn.') == []
+    assert resolver.ambiguous == 1
+    assert resolver.resolve('See Public Prosecutor v Tan [2021] SGHC 2, where the charge was withdrawn.') == ['2021']
+    assert resolver.ambiguous == 1
+
+def test_citations_are_resolved_in_order_without_the_citing_judgment():
+    """
+    The judgments cited are returned once each in the order they are first cited, without the judgment citing them,
+    and a judgment which is added again is resolved by its new case name.
+    """
+    resolver = CitationResolver(['a', 'b', 'c'], ['Public Prosecutor v Goh', 'Lee v Public Prosecutor', 'Public Prosecutor v Ong'])
+    text = 'Public Prosecutor v Ong was applied, unlike Lee v Public Prosecutor. Public Prosecutor v Ong also held so.'
+
+    assert resolver.resolve(text) == ['c', 'b']
+    assert resolver.resolve(text, exclude='c') == ['b']
+
+    resolver.add(['b'], ['Lee Kim Seng v Public Prosecutor'])
+    assert resolver.resolve(text) == ['c']
@@ -0,0 +1,36 @@
+# Import the required packages/modules
+
+import os
+from benchmarks import scratch_tree
+from corpus import StubServer, SyntheticCorpus
+from criminalcasedatabase import Court
+from metrics import Metrics
+from progress import NullProgress
+
+def _fetch_listings(server, workers):
+    """
+    Returns the listings which a court fetches from every listing page of the stub `server` with `workers` concurrent requests,
+    in a scratch tree of its own so that no page is answered from an earlier run's page cache.
+    """
+    with scratch_tree():
+        court = Court('supreme', workers=workers, requests_per_second=None, base_url=server.url, progress=NullProgress(), metrics=Metrics(path=None))
+        court._Court__set_soup()
+        court._Court__get_num_pages()
+        court._Court__fetch_urls()
+        return court.results_list
+
+def test_concurrent_fetch_matches_serial(monkeypatch):
+    """
+    Fetching the listing pages concurrently gives the same listings in the same order as fetching them one at a time.
+    """
+    # Run from the code folder, as the scratch tree copies the repository's data relative to it
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+    corpus = SyntheticCorpus(30 * 7, per_page=7)
+
+    with StubServer(corpus, latency=0.01) as server:
+        serial = _fetch_listings(server, workers=1)
+        concurrent = _fetch_listings(server, workers=4)
+
+    assert len(serial) == len(corpus)
+    assert [listing['link'] for listing in concurrent] == [listing['link'] for listing in serial]
+    assert concurrent == serial
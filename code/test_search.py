@@ -0,0 +1,117 @@
+# Import the required packages/modules
+
+import math
+import os
+import random
+import pandas as pd
+from search import classify_search, ColumnIndex, SEARCH_COLUMNS, SearchIndex, SearchResult
+
+def _database(monkeypatch):
+    """
+    Returns the repository's database in the .csv layout, running from the code folder which its path is relative to.
+    """
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+    return pd.read_csv('../data/database.csv')
+
+def _sample_strings(database, column, count=40, seed=0):
+    """
+    Returns `count` lowercase substrings of the texts of `column`, which start and end anywhere in a word,
+    together with some short, spanning and missing strings.
+    """
+    rng = random.Random(seed)
+    texts = database[column].dropna().str.lower().tolist()
+    strings = ['v', 'of', 'public prosecutor', 'r v pub', ', ', 'zzzz', '376 penal code', '33 misuse of drugs act']
+    for _ in range(count):
+        text = rng.choice(texts)
+        start = rng.randrange(len(text))
+        strings.append(text[start:start + rng.randint(1, 30)])
+    return strings
+
+def _scan(database, column, search_string, complete=False):
+    """
+    Returns the row ids which contain `search_string` in `column` by scanning every text, as the search did before it was indexed.
+    """
+    matched = database[column].str.lower().str.contains(search_string, regex=False, na=False)
+    if complete:
+        matched &= database.notna().all(axis=1)
+    return database.index[matched].tolist()
+
+def test_index_matches_substring_scan(monkeypatch):
+    """
+    The index finds the same rows as scanning each text of a column for the search string, with and without the incomplete rows.
+    """
+    database = _database(monkeypatch)
+    index = SearchIndex(database)
+
+    for column in SEARCH_COLUMNS:
+        for search_string in _sample_strings(database, column):
+            assert index.match(column, search_string) == _scan(database, column, search_string), (column, search_string)
+            assert index.match(column, search_string, complete=True) == _scan(database, column, search_string, complete=True), (column, search_string)
+
+def test_updated_index_matches_substring_scan(monkeypatch):
+    """
+    An index which was updated with new rows and rows whose texts changed finds the same rows as scanning the updated database.
+    """
+    database = _database(monkeypatch)
+    index = SearchIndex(database.iloc[:60])
+    index.update(database.iloc[60:])
+
+    # Change the case names of two rows, which replaces them in the index by their links
+    changed = database.iloc[10:12].copy()
+    changed['case_name'] = ['Zed v Public Prosecutor', 'Yak Kim Seng v Public Prosecutor']
+    index.update(changed)
+    database.loc[10:11, 'case_name'] = changed['case_name'].tolist()
+
+    for column in SEARCH_COLUMNS:
+        for search_string in _sample_strings(database, column, seed=1) + ['zed v', 'yak kim', 'kim seng v pub']:
+            assert index.match(column, search_string) == _scan(database, column, search_string), (column, search_string)
+
+def test_loaded_column_index_matches_substring_scan(monkeypatch, tmp_path):
+    """
+    A column index which was saved and memory-mapped again finds the same rows as scanning the texts of its column.
+    """
+    database = _database(monkeypatch)
+
+    for number, column in enumerate(SEARCH_COLUMNS):
+        built = ColumnIndex()
+        built.add(range(len(database)), database[column].tolist())
+        built.save(str(tmp_path / str(number)))
+        loaded = ColumnIndex.load(str(tmp_path / str(number)))
+
+        for search_string in _sample_strings(database, column, seed=2):
+            assert loaded.rows(loaded.match(search_string)).tolist() == _scan(database, column, search_string), (column, search_string)
+
+def _same_rate(single, batch):
+    """
+    Checks that the rate of a single search equals the rate of the batch, where a rate of no values is not a number.
+    """
+    return (math.isnan(single) and math.isnan(batch)) or math.isclose(single, batch)
+
+def test_search_many_matches_search(monkeypatch):
+    """
+    Searching a batch of case names, offences and statutes gives the same results, rates and most cited cases
+    as searching each of them on its own.
+    """
+    database = _database(monkeypatch)
+    index = SearchIndex(database)
+    statutes = pd.read_csv('../data/statutes_crimes.csv')['section_statute'].sample(40, random_state=0).tolist()
+    input_strings = statutes + ['Penal Code', 'Section 33 Criminal Procedure Code', 'misuse of drugs act', 'forgery', 'cheating',
+                                'Public Prosecutor v', 'Tang Keng Lai v Public Prosecutor', 'zzzz', 'cheating']
+    batch = index.search_many(input_strings)
+
+    for position, input_string in enumerate(input_strings):
+        single = SearchResult(classify_search(input_string), index.search(input_string), index.citations)
+        statistics = batch.statistics.iloc[position]
+        assert statistics['found'] == single.found, input_string
+        assert statistics['results'] == len(single.rows), input_string
+        if not single.found:
+            continue
+
+        # Compare the rows and rates, and the most cited cases of the searches which are in the batch once
+        assert batch.result(position).results.equals(single.results), input_string
+        assert _same_rate(single.aggravated_rate, statistics['aggravated_rate']), input_string
+        assert _same_rate(single.mitigation_rate, statistics['mitigation_rate']), input_string
+        if input_strings.count(input_string) == 1:
+            top = batch.top_citations[batch.top_citations['input_string'] == input_string]
+            assert top['cited'].tolist() == single.top_citations(10).index.tolist(), input_string
+            assert top['count'].tolist() == single.top_citations(10).tolist(), input_string
@@ -0,0 +1,68 @@
+# Import the required packages/modules
+
+import os
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from store import ColumnarStore
+
+def _rows(links, case_names, decision_dates):
+    """
+    Returns rows of the database in the .csv layout with the given `links`, `case_names` and `decision_dates`.
+    """
+    return pd.DataFrame({'case_name': case_names, 'decision_date': decision_dates,
+                         'possible_statutes': ['376 Penal Code,33 Misuse of Drugs Act'] + [np.nan] * (len(links) - 1),
+                         'mitigation_discussed': [1] * len(links), 'link': links})
+
+def test_csv_round_trip(monkeypatch, tmp_path):
+    """
+    A store seeded from the repository's database.csv reads back the same table in the .csv layout,
+    and exports the same .csv file.
+    """
+    # Run from the code folder, which the path of the database is relative to
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+    expected = pd.read_csv('../data/database.csv')
+    store = ColumnarStore(str(tmp_path / 'database'), csv_path='../data/database.csv')
+
+    assert_frame_equal(store.read(flat=True), expected, check_dtype=False)
+
+    store.export_csv(str(tmp_path / 'exported.csv'))
+    assert_frame_equal(pd.read_csv(tmp_path / 'exported.csv'), expected)
+
+def test_upsert_keeps_latest_row_of_each_link(tmp_path):
+    """
+    Appending rows whose links are already stored replaces the earlier rows, before and after the partitions are compacted.
+    """
+    store = ColumnarStore(str(tmp_path / 'database'), max_parts=3)
+    store.append(_rows(['a', 'b', 'c'], ['A v PP', 'B v PP', 'C v PP'], ['1 January 2021'] * 3))
+    store.append(_rows(['b', 'd'], ['B v PP (amended)', 'D v PP'], ['2 February 2022'] * 2))
+    store.append(_rows(['a', 'a'], ['A v PP (first)', 'A v PP (last)'], ['3 March 2023'] * 2))
+
+    table = store.read(flat=True).set_index('link')
+    assert sorted(table.index) == ['a', 'b', 'c', 'd']
+    assert table['case_name'].to_dict() == {'a': 'A v PP (last)', 'b': 'B v PP (amended)', 'c': 'C v PP', 'd': 'D v PP'}
+    assert store.keys() == {'a', 'b', 'c', 'd'}
+
+    # Compact the partitions by appending past `max_parts`, which keeps the same table in one partition
+    store.append(_rows(['e'], ['E v PP'], ['4 April 2024']))
+    assert len(store.parts()) == 1
+    compacted = store.read(flat=True).set_index('link')
+    assert_frame_equal(compacted.drop(index='e'), table)
+
+def test_decision_date_round_trip(tmp_path):
+    """
+    The decision dates are read back typed as dates, and in the .csv layout as the text they were written with,
+    including dates which cannot be parsed and missing dates.
+    """
+    dates = ['5 January 2021', '05 January 2021', 'January 2021', np.nan]
+    store = ColumnarStore(str(tmp_path / 'database'))
+    store.append(_rows(['a', 'b', 'c', 'd'], ['A v PP', 'B v PP', 'C v PP', 'D v PP'], dates))
+
+    typed = store.read()
+    assert typed['decision_date'].tolist()[:2] == [pd.Timestamp('2021-01-05')] * 2
+    assert typed['decision_date'][2:].isna().all()
+
+    flat = store.read(flat=True)
+    assert flat['decision_date'].tolist()[:3] == dates[:3]
+    assert pd.isna(flat['decision_date'][3])
+    assert 'decision_date_text' not in flat.columns